@@ -0,0 +1,103 @@
+# Shared patient loaders for CrisisLink.cv
+
+from datetime import date
+from typing import Optional, Tuple
+
+from sqlalchemy import Integer, case, cast, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.models import EmergencyAccess, EmergencyAccessDaily, MedicalProfile, User
+
+# =============================================================================
+# PATIENT LOADERS
+# =============================================================================
+
+def _patient_query():
+    """User select with profile and priority-ordered contacts eager-loaded"""
+    return select(User).options(
+        joinedload(User.profile),
+        joinedload(User.contacts),
+    )
+
+async def _first_patient(db: AsyncSession, query) -> Optional[User]:
+    # Joined collections repeat the user row once per contact
+    result = await db.execute(query)
+    return result.unique().scalars().first()
+
+async def load_patient_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    Load a user, their medical profile and emergency contacts in one statement.
+    Access user.profile and user.contacts without further queries.
+    """
+    return await _first_patient(db, _patient_query().where(User.username == username))
+
+async def load_patient_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
+    """Same as load_patient_by_username, keyed by user id"""
+    return await _first_patient(db, _patient_query().where(User.id == user_id))
+
+async def profile_version(db: AsyncSession, username: str):
+    """
+    Row with the profile's updated_at, or None without a profile.
+    One indexed lookup: enough to tell whether a cached view is current.
+    """
+    result = await db.execute(
+        select(MedicalProfile.updated_at).join(User, User.id == MedicalProfile.user_id).where(User.username == username)
+    )
+    return result.first()
+
+# =============================================================================
+# PATIENT SEARCH
+# =============================================================================
+
+def _age_years(today: date):
+    """Whole years since date_of_birth (YYYY-MM-DD text); NULL when unset or malformed"""
+    dob = MedicalProfile.date_of_birth
+    birthday_pending = case((func.substr(dob, 6, 5) > today.strftime("%m-%d"), 1), else_=0)
+    return case(
+        (dob.regexp_match(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$"), today.year - cast(func.substr(dob, 1, 4), Integer) - birthday_pending),
+        else_=None
+    )
+
+def _last_accessed():
+    """Latest scan from the raw log, else from the daily rollups once it has aged out"""
+    raw = select(func.max(EmergencyAccess.accessed_at)).where(
+        EmergencyAccess.user_id == MedicalProfile.user_id
+    ).scalar_subquery()
+    rolled_up = select(func.max(EmergencyAccessDaily.last_accessed_at)).where(
+        EmergencyAccessDaily.user_id == MedicalProfile.user_id
+    ).scalar_subquery()
+    return func.coalesce(raw, rolled_up)
+
+def patient_search_query(search: str, limit: int, after: Optional[Tuple[str, str]] = None, today: Optional[date] = None):
+    """
+    One page of patients with profiles in (full_name, profile id) order.
+    search matches anywhere in the name, case-insensitively (the trigram
+    index on PostgreSQL); after is the sort key of the previous page's last
+    row. Age and last access are computed by the database, with the last
+    access read through the (user_id, accessed_at) index.
+    """
+    query = select(
+        MedicalProfile.user_id,
+        MedicalProfile.id,
+        MedicalProfile.full_name,
+        MedicalProfile.blood_type,
+        _age_years(today or date.today()).label("age"),
+        _last_accessed().label("last_accessed_at")
+    )
+    if search:
+        query = query.where(func.lower(MedicalProfile.full_name).contains(search.lower(), autoescape=True))
+    if after:
+        query = query.where(tuple_(MedicalProfile.full_name, MedicalProfile.id) > tuple_(*after))
+    return query.order_by(MedicalProfile.full_name, MedicalProfile.id).limit(limit)
+
+async def search_patients(db: AsyncSession, search: str, limit: int, after: Optional[Tuple[str, str]] = None) -> list:
+    """Rows of patient_search_query: user_id, id, full_name, blood_type, age, last_accessed_at"""
+    return (await db.execute(patient_search_query(search, limit, after))).all()
+
+async def count_patients(db: AsyncSession, search: str) -> int:
+    """Number of profiles whose name matches search"""
+    return await db.scalar(
+        select(func.count(MedicalProfile.id))
+        .where(func.lower(MedicalProfile.full_name).contains(search.lower(), autoescape=True))
+    )
@@ -1,15 +1,393 @@
 # PostgreSQL connection
 
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, exc, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.config import settings
+from app.models import ReplicationHeartbeat
+from app.utils.cache import LRUCache
+
+# =============================================================================
+# POOL METRICS
+# =============================================================================
+
+class PoolMetrics:
+    """
+    Checkout wait times (cumulative histogram), checkin and overflow/timeout
+    counts for one engine's pool, to tell pool exhaustion apart from slow
+    queries (and checkouts that are never returned).
+    """
+    WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bucket_counts = [0] * len(self.WAIT_BUCKETS_MS)
+        self.waits = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.checkins = 0
+
+    def observe(self, wait_seconds: float, overflowed: bool = False, timed_out: bool = False) -> None:
+        wait_ms = wait_seconds * 1000
+        with self._lock:
+            self.waits += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            for i, bound in enumerate(self.WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self.bucket_counts[i] += 1
+            if overflowed:
+                self.overflow_events += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def checked_in(self) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            stats = {
+                "checkouts": self.waits - self.timeouts,
+                "checkins": self.checkins,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.total_wait_ms / self.waits, 2) if self.waits else 0.0,
+                "wait_ms_max": round(self.max_wait_ms, 2),
+                "wait_ms_histogram": {
+                    **{f"le_{bound}": count for bound, count in zip(self.WAIT_BUCKETS_MS, self.bucket_counts)},
+                    "le_inf": self.waits
+                }
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0)
+            )
+        else:
+            stats["mode"] = "pgbouncer"
+        return stats
+
+def metered_pool(base, metrics: PoolMetrics):
+    """Subclass of a pool class that records every checkout and checkin in metrics"""
+    class MeteredPool(base):
+        def connect(self):
+            queued = isinstance(self, QueuePool)
+            overflow_before = self.overflow() if queued else 0
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                metrics.observe(time.perf_counter() - started, timed_out=True)
+                raise
+            overflow_after = self.overflow() if queued else 0
+            metrics.observe(
+                time.perf_counter() - started,
+                overflowed=overflow_after > max(overflow_before, 0)
+            )
+            return connection
+
+        def _do_return_conn(self, record):
+            # Every pool class returns connections through here
+            metrics.checked_in()
+            super()._do_return_conn(record)
+
+    MeteredPool.__name__ = f"Metered{base.__name__}"
+    return MeteredPool
+
+pool_metrics = {"request": PoolMetrics(), "background": PoolMetrics()}
+
+def _pool_options(url: str, queue_pool, metrics: PoolMetrics) -> dict:
+    """Engine keyword arguments from the DB_POOL_* settings"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if settings.DB_PGBOUNCER_MODE:
+        # PgBouncer does the pooling; under transaction pooling a server
+        # connection may differ per transaction, so asyncpg must not cache
+        # prepared statements
+        options["poolclass"] = metered_pool(NullPool, metrics)
+        if make_url(url).get_driver_name() == "asyncpg":
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    options.update(
+        poolclass=metered_pool(queue_pool, metrics),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
+    )
+    return options
 
-engine = create_engine(settings.DATABASE_URL)
+# =============================================================================
+# ENGINES
+# =============================================================================
+
+# Blocking engine for scripts, seeds and background threads
+engine = create_engine(settings.DATABASE_URL, **_pool_options(settings.DATABASE_URL, QueuePool, pool_metrics["background"]))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Non-blocking driver for each backend DATABASE_URL may point at
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "postgres": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    """Same database, reached through its asyncio driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'; set ASYNC_DATABASE_URL")
+    backend = "postgresql" if backend == "postgres" else backend
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+# Request path
+ASYNC_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_URL, **_pool_options(ASYNC_URL, AsyncAdaptedQueuePool, pool_metrics["request"]))
+
+# Objects stay usable after commit: lazy refreshes are not possible without
+# awaiting, and responses are built from rows the request just wrote
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+# =============================================================================
+# READ REPLICAS
+# =============================================================================
+
+class Replica:
+    """One read replica: its engine, sessions and last measured lag"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = make_url(url).render_as_string(hide_password=True)
+        async_url = async_database_url(url)
+        self.metrics = PoolMetrics()
+        self.engine = create_async_engine(async_url, **_pool_options(async_url, AsyncAdaptedQueuePool, self.metrics))
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        # Out of rotation until the first check shows it keeping up
+        self.in_rotation = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[str] = None
+        self.reads = 0
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "in_rotation": self.in_rotation,
+            "lag_seconds": self.lag_seconds,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            "reads": self.reads
+        }
+
+class ReplicaRouter:
+    """
+    Picks the database for read-only request sessions.
+
+    Lag is measured with a heartbeat: every check_interval_seconds the
+    primary's replication_heartbeat row is set to the current time, and a
+    replica's lag is how far its copy of the row trails that. This works
+    for any replication method (streaming, logical, a copied SQLite file)
+    and keeps measuring while the primary is otherwise idle. A replica that
+    falls more than max_lag_seconds behind or cannot be reached leaves
+    rotation until a check shows it caught up; with none in rotation, reads
+    go to the primary.
+
+    Keys written through this instance (usernames, user ids) are pinned to
+    the primary for the longest a replica in rotation can trail it, so a
+    client reading right after its own write sees it. Other instances only
+    have the lag bound.
+    """
+    HEARTBEAT_ID = 1
+
+    def __init__(self, urls: Iterable[str], max_lag_seconds: float, check_interval_seconds: float):
+        self.replicas = [Replica(f"replica_{i}", url) for i, url in enumerate(urls, start=1)]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._written = LRUCache(max_entries=100000, ttl_seconds=max_lag_seconds + check_interval_seconds)
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.pinned_reads = 0
+
+    # -------------------------------------------------------------------------
+    # Routing
+    # -------------------------------------------------------------------------
+
+    def mark_written(self, *keys: str) -> None:
+        """Keep reads naming any of keys on the primary for a while"""
+        if not self.replicas:
+            return
+        for key in keys:
+            if key:
+                self._written.set(key, True)
+
+    def pick(self, keys: Iterable[str] = ()) -> Optional[Replica]:
+        """Next replica in rotation (round robin), or None for the primary"""
+        if not self.replicas:
+            return None
+        if any(self._written.get(key) for key in keys if key):
+            self.pinned_reads += 1
+            return None
+        candidates = [replica for replica in self.replicas if replica.in_rotation]
+        if not candidates:
+            self.primary_reads += 1
+            return None
+        replica = candidates[next(self._turn) % len(candidates)]
+        replica.reads += 1
+        return replica
+
+    # -------------------------------------------------------------------------
+    # Lag checks
+    # -------------------------------------------------------------------------
+
+    async def _beat(self) -> datetime:
+        beat = datetime.utcnow()
+        async with async_engine.begin() as conn:
+            insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+            statement = insert(ReplicationHeartbeat).values(id=self.HEARTBEAT_ID, beat_at=beat)
+            await conn.execute(statement.on_conflict_do_update(
+                index_elements=["id"],
+                set_={"beat_at": statement.excluded.beat_at}
+            ))
+        return beat
+
+    async def _replayed_beat(self, replica: Replica) -> Optional[datetime]:
+        async with replica.engine.connect() as conn:
+            return await conn.scalar(
+                select(ReplicationHeartbeat.beat_at).where(ReplicationHeartbeat.id == self.HEARTBEAT_ID)
+            )
+
+    async def _measure(self, replica: Replica, beat: datetime) -> None:
+        try:
+            replayed = await asyncio.wait_for(self._replayed_beat(replica), self.max_lag_seconds)
+            # Another instance's clock may run slightly ahead of ours
+            replica.lag_seconds = round(max((beat - replayed).total_seconds(), 0.0), 3) if replayed else None
+            replica.last_error = None if replayed else "no heartbeat replicated yet"
+        except Exception as e:
+            replica.lag_seconds = None
+            replica.last_error = str(e) or type(e).__name__
+        replica.checked_at = beat.isoformat()
+
+        in_rotation = replica.lag_seconds is not None and replica.lag_seconds <= self.max_lag_seconds
+        if in_rotation != replica.in_rotation:
+            state = "back in rotation" if in_rotation else "out of rotation"
+            print(f"Read replica {replica.name} {state} (lag {replica.lag_seconds}s, {replica.last_error or 'ok'})")
+        replica.in_rotation = in_rotation
+
+    async def check(self) -> None:
+        """Stamp the heartbeat on the primary and measure every replica against it"""
+        if not self.replicas:
+            return
+        beat = await self._beat()
+        await asyncio.gather(*(self._measure(replica, beat) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                # Primary unreachable: keep the last known rotation
+                print(f"Replica lag check failed: {e}")
+            await asyncio.sleep(self.check_interval_seconds)
+
+    def start(self) -> None:
+        """Check lag on the running event loop (no-op without replicas)"""
+        if not self.replicas or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "max_lag_seconds": self.max_lag_seconds,
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+            "replicas": {replica.name: replica.stats() for replica in self.replicas}
+        }
+
+replica_router = ReplicaRouter(
+    urls=[url.strip() for url in settings.DB_REPLICA_URLS.split(",") if url.strip()],
+    max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=settings.DB_REPLICA_CHECK_INTERVAL_SECONDS
+)
+
+# Request parameters naming the patient or account a read is about
+READ_YOUR_WRITES_PARAMS = ("username", "user_id")
+
+async def get_read_db(request: Request):
+    """
+    Session for read-only endpoints: a replica in rotation, else the primary.
+    Never write through it. Reads about a username or user_id written
+    moments ago stay on the primary.
+    """
+    keys = [
+        params.get(name)
+        for params in (request.path_params, request.query_params)
+        for name in READ_YOUR_WRITES_PARAMS
+    ]
+    replica = replica_router.pick(keys)
+    async with (replica.sessions if replica else AsyncSessionLocal)() as db:
+        yield db
+
+def pool_stats() -> dict:
+    """Live pool state and checkout metrics for every engine"""
+    return {
+        "request": pool_metrics["request"].stats(async_engine.pool),
+        "background": pool_metrics["background"].stats(engine.pool),
+        **{replica.name: replica.metrics.stats(replica.engine.pool) for replica in replica_router.replicas}
+    }
+
+# =============================================================================
+# QUERY COUNTER
+# =============================================================================
+
+_active_counter: ContextVar[Optional["QueryCounter"]] = ContextVar("query_counter", default=None)
+
+class QueryCounter:
+    """
+    Counts SQL statements executed while active.
+    Used per request by the X-Query-Count middleware and directly in tests.
+    """
+    def __init__(self):
+        self.count = 0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active_counter.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active_counter.reset(self._token)
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _active_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+for _engine in (engine, async_engine.sync_engine, *(replica.engine.sync_engine for replica in replica_router.replicas)):
+    event.listen(_engine, "before_cursor_execute", _count_statement)
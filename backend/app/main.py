@@ -1,20 +1,74 @@
 # FastAPI entry point for CrisisLink.cv
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
 from app.config import settings
+from app.database import QueryCounter, async_engine, pool_stats, replica_router
 from app.routes import profiles, emergency, auth, dashboard, reference, qr
+from app.services.access_log_maintenance import access_log_maintenance
+from app.services.audit_log import access_log_buffer
+from app.services.dashboard_counters import dashboard_counter_reconciler
+from app.services.emergency_cache import emergency_view_cache
+from app.services.http_clients import http_clients
+from app.services.notifications import notification_dispatcher
+from app.services.qr_batch import qr_batch_runner
+from app.services.reference_index import reference_search
+from app.services.tts_cache import tts_audio_cache
+from app.utils.passwords import shutdown_hash_executor
+
+# =============================================================================
+# DATABASE BOOTSTRAP
+# =============================================================================
+
+def migrate_database() -> None:
+    """Apply pending schema migrations (blocking; seeding is scripts/bootstrap_db.py --seed)"""
+    # Imported here so that importing the app stays free of alembic and the database
+    from app.migrate import upgrade_database
+    
+    try:
+        upgrade_database()
+        print("Database migrations applied")
+    except Exception as e:
+        print(f"Database migration failed: {e}")
 
 # =============================================================================
 # APP CONFIGURATION
 # =============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bring the schema up to date, start background workers and flush them on shutdown"""
+    # Only migrate when DATABASE_URL is available
+    if settings.DB_MIGRATE_ON_STARTUP and os.getenv("DATABASE_URL"):
+        await asyncio.to_thread(migrate_database)
+    await http_clients.start()
+    access_log_buffer.start()
+    notification_dispatcher.start()
+    access_log_maintenance.start()
+    dashboard_counter_reconciler.start()
+    replica_router.start()
+    reference_search.start()
+    yield
+    reference_search.stop()
+    await replica_router.stop()
+    dashboard_counter_reconciler.stop()
+    access_log_maintenance.stop()
+    await notification_dispatcher.stop()
+    access_log_buffer.stop()
+    qr_batch_runner.shutdown()
+    shutdown_hash_executor()
+    await http_clients.close()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="CrisisLink.cv API",
     description="Emergency medical information system API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -26,31 +80,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# =============================================================================
-# DATABASE INITIALIZATION (OPTIONAL)
-# =============================================================================
-
-# Only initialize database if DATABASE_URL is available
-if os.getenv("DATABASE_URL"):
-    try:
-        from app.database import engine
-        from app.models import Base
-        
-        # Create all database tables
-        Base.metadata.create_all(bind=engine)
-        
-        from app.database import SessionLocal
-        from app.seeds.medical_data import seed_data
-        
-        # Auto-seed database
-        db = SessionLocal()
-        seed_data()
-        db.close()
-        print("Database initialized successfully")
-    except Exception as e:
-        print(f"Database initialization failed: {e}")
-else:
-    print("No DATABASE_URL found, skipping database initialization")
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    """Expose the number of SQL statements each request issued"""
+    with QueryCounter() as counter:
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(counter.count)
+    return response
 
 # =============================================================================
 # ROUTER REGISTRATION
@@ -90,4 +126,19 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics")
+async def metrics():
+    """In-process cache, background worker and connection pool metrics"""
+    return {
+        "db_pool": pool_stats(),
+        "db_replicas": replica_router.stats(),
+        "emergency_cache": emergency_view_cache.stats(),
+        "tts_cache": tts_audio_cache.stats(),
+        "audit_log": access_log_buffer.stats(),
+        "access_log_maintenance": access_log_maintenance.stats(),
+        "dashboard_counters": dashboard_counter_reconciler.stats(),
+        "reference_index": reference_search.stats(),
+        "notifications": notification_dispatcher.stats()
+    }
\ No newline at end of file
@@ -0,0 +1,70 @@
+# Schema migrations (Alembic; revisions live in backend/migrations/versions)
+
+import os
+import time
+from contextlib import contextmanager
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from app.database import engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Revision matching the schema create_all produced before migrations existed
+BASELINE_REVISION = "0001_baseline"
+
+# One upgrade at a time across workers and hosts (PostgreSQL)
+ADVISORY_LOCK_ID = 74_016
+LOCK_POLL_SECONDS = 1.0
+
+@contextmanager
+def migration_lock(connection):
+    """
+    Hold a session advisory lock for the duration of an upgrade (PostgreSQL).
+    Waiters poll pg_try_advisory_lock outside any transaction rather than
+    blocking in pg_advisory_lock: a blocked statement keeps its snapshot open,
+    and CREATE INDEX CONCURRENTLY in the running upgrade would wait for it.
+    """
+    if connection.dialect.name != "postgresql":
+        yield
+        return
+    
+    waiting = False
+    while not connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID}).scalar():
+        connection.commit()
+        if not waiting:
+            print("Another process is migrating the database; waiting for it to finish")
+            waiting = True
+        time.sleep(LOCK_POLL_SECONDS)
+    connection.commit()
+    try:
+        yield
+    finally:
+        connection.rollback()
+        connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+        connection.commit()
+
+def alembic_config() -> Config:
+    return Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+
+def upgrade_database(revision: str = "head") -> None:
+    """
+    Migrate the schema to revision.
+    A database built by create_all (tables but no alembic_version) is
+    stamped at the baseline first, so only later revisions run against it.
+    Concurrent callers (every worker runs this at startup) take turns; the
+    ones that get the lock after the first find nothing left to do.
+    """
+    config = alembic_config()
+    with engine.connect() as connection, migration_lock(connection):
+        tables = inspect(connection).get_table_names()
+        # Alembic manages its own transactions on this connection
+        connection.commit()
+        
+        config.attributes["connection"] = connection
+        if "users" in tables and "alembic_version" not in tables:
+            print(f"Existing schema without migration history; stamping {BASELINE_REVISION}")
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
@@ -1,6 +1,6 @@
 # SQLAlchemy models for CrisisLink.cv
 
-from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, Text, Boolean, Date, DateTime, ForeignKey, JSON, Integer, BigInteger, UniqueConstraint, LargeBinary, Index, DDL, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -43,7 +43,7 @@ class User(Base):
     
     # Relationships
     profile = relationship("MedicalProfile", back_populates="user", uselist=False)
-    contacts = relationship("EmergencyContact", back_populates="user")
+    contacts = relationship("EmergencyContact", back_populates="user", order_by="EmergencyContact.priority")
     doctor_profile = relationship("Doctor", back_populates="user", uselist=False)
 
 # =============================================================================
@@ -61,7 +61,7 @@ class Doctor(Base):
     user_id = Column(String, ForeignKey("users.id"), unique=True, nullable=False)
     
     # Professional Info
-    hospital_id = Column(String, nullable=False)  # References HOSPITALS list
+    hospital_id = Column(String, nullable=False, index=True)  # References HOSPITALS list
     hospital_name = Column(String, nullable=False)
     specialty = Column(String, nullable=True)
     license_number = Column(String, nullable=True)
@@ -85,6 +85,16 @@ class MedicalProfile(Base):
     Contains encrypted sensitive medical data.
     """
     __tablename__ = "medical_profiles"
+    # Doctor patient lookup: name order for keyset pages, and substring
+    # search through a trigram index (PostgreSQL, needs pg_trgm)
+    __table_args__ = (
+        Index("ix_medical_profiles_full_name_id", "full_name", "id"),
+        Index(
+            "ix_medical_profiles_full_name_trgm",
+            text("lower(full_name) gin_trgm_ops"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), unique=True)
@@ -95,9 +105,10 @@ class MedicalProfile(Base):
     blood_type = Column(String)
     
     # Medical Info (encrypted)
-    allergies = Column(Text)  # JSON encrypted
-    medications = Column(Text)  # JSON encrypted
-    medical_conditions = Column(Text)  # JSON encrypted
+    medical_data = Column(Text)  # Single envelope: allergies, medications, conditions
+    allergies = Column(Text)  # Legacy per-field JSON encrypted
+    medications = Column(Text)  # Legacy per-field JSON encrypted
+    medical_conditions = Column(Text)  # Legacy per-field JSON encrypted
     
     # Emergency Instructions
     dnr_status = Column(Boolean, default=False)
@@ -107,7 +118,7 @@ class MedicalProfile(Base):
     # Languages spoken
     languages = Column(JSON)  # ["English", "Spanish"]
     
-    # QR Code
+    # QR Code (reference to a QRAsset, e.g. /api/qr/assets/<id>.png)
     qr_code_url = Column(String)
     emergency_url = Column(String)  # username.cv
     
@@ -116,6 +127,29 @@ class MedicalProfile(Base):
     # Relationship
     user = relationship("User", back_populates="profile")
 
+# gin_trgm_ops comes from pg_trgm, which create_all would otherwise lack
+event.listen(
+    MedicalProfile.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+# =============================================================================
+# QR ASSET MODEL
+# =============================================================================
+
+class QRAsset(Base):
+    """
+    Rendered QR code image, addressed by a hash of its encoded content.
+    Kept out of medical_profiles so profile reads stay small.
+    """
+    __tablename__ = "qr_assets"
+    
+    id = Column(String(64), primary_key=True)  # sha256 of render version, format and data
+    media_type = Column(String, nullable=False)
+    content = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # =============================================================================
 # EMERGENCY CONTACT MODEL
 # =============================================================================
@@ -126,6 +160,8 @@ class EmergencyContact(Base):
     Ordered by priority for notification sequence.
     """
     __tablename__ = "emergency_contacts"
+    # Serves the emergency view's contacts-by-patient in priority order
+    __table_args__ = (Index("ix_emergency_contacts_user_id_priority", "user_id", "priority"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"))
@@ -147,14 +183,75 @@ class EmergencyAccess(Base):
     """
     Logs every access to a patient's emergency profile.
     Used for audit and notification purposes.
+    On PostgreSQL the table is range-partitioned by month on accessed_at,
+    which every unique key of a partitioned table must include, hence the
+    (id, accessed_at) primary key (migrated SQLite tables key on id alone).
+    Expired months are rolled up into EmergencyAccessDaily and dropped by
+    the access log maintenance job.
     """
     __tablename__ = "emergency_access_logs"
+    # Per-patient audit history / last access, and time-window dashboard counts
+    __table_args__ = (
+        Index("ix_emergency_access_logs_user_id_accessed_at", "user_id", "accessed_at"),
+        Index("ix_emergency_access_logs_accessed_at", "accessed_at"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"))
-    accessed_at = Column(DateTime, default=datetime.utcnow)
+    accessed_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     responder_info = Column(Text)  # IP, location, etc.
     access_type = Column(String)  # "qr_scan", "url_access"
+    hospital_id = Column(String, nullable=True)  # Responding hospital, when the scan came through one
+
+class EmergencyAccessDaily(Base):
+    """
+    Per-patient, per-day scan counts.
+    Written when raw access logs pass the retention window, so long-range
+    history survives after the raw rows are gone.
+    """
+    __tablename__ = "emergency_access_daily"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    access_count = Column(Integer, nullable=False, default=0)
+    first_accessed_at = Column(DateTime)
+    last_accessed_at = Column(DateTime)
+
+
+# =============================================================================
+# DASHBOARD COUNTER MODEL
+# =============================================================================
+
+class DashboardCounter(Base):
+    """
+    Running totals behind the dashboard statistics.
+    scope is "global" or "hospital:<id>"; bucket is "all" or a UTC day
+    (YYYY-MM-DD). Writers add to the rows in the same transaction as the
+    data they count; a reconciliation job recomputes them from the source
+    tables to correct drift.
+    """
+    __tablename__ = "dashboard_counters"
+
+    scope = Column(String, primary_key=True)
+    bucket = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# =============================================================================
+# REPLICATION HEARTBEAT MODEL
+# =============================================================================
+
+class ReplicationHeartbeat(Base):
+    """
+    Single row the primary stamps with the current time.
+    Read replicas measure their lag by how far their copy trails it.
+    """
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    beat_at = Column(DateTime, nullable=False)
 
 
 # =============================================================================
@@ -168,6 +265,8 @@ class ReferenceData(Base):
     category = Column(String, index=True)  # "Allergies", "Medications", "Conditions"
     subcategory = Column(String, nullable=True) # e.g., "Foods", "Environmental"
     name = Column(String, unique=True, index=True)
+    usage_count = Column(Integer, nullable=False, default=0, server_default="0")  # Profiles listing this term; ranks search results
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Name/category edits; versions the reference ETag
 
     def to_dict(self):
         return {
@@ -175,4 +274,43 @@ class ReferenceData(Base):
             "category": self.category,
             "subcategory": self.subcategory,
             "name": self.name
-        }
\ No newline at end of file
+        }
+
+# =============================================================================
+# TRANSLATION MEMORY MODEL
+# =============================================================================
+
+class TranslationMemory(Base):
+    """
+    Previously translated reference vocabulary terms, shared by all workers.
+    Patient free text is never stored here (it would be plaintext PHI).
+    Looked up by a hash of the source text so long strings stay indexable.
+    """
+    __tablename__ = "translation_memory"
+    __table_args__ = (UniqueConstraint("source_hash", "target_language"),)
+
+    id = Column(Integer, primary_key=True)
+    source_hash = Column(String(64), nullable=False)
+    target_language = Column(String, nullable=False)
+    source_text = Column(Text, nullable=False)
+    translated_text = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# =============================================================================
+# BACKGROUND JOB MODEL
+# =============================================================================
+
+class BackgroundJob(Base):
+    """
+    Progress of a QR batch or patient import, shared by every worker process:
+    the worker running a job writes it, and a status poll or download that
+    reaches any other worker reads it from here.
+    """
+    __tablename__ = "background_jobs"
+
+    id = Column(String, primary_key=True)
+    job_type = Column(String, nullable=False)  # "qr_batch", "patient_import"
+    progress = Column(JSON, nullable=False)  # The job's progress() dict
+    path = Column(String)  # Output file (QR batches; on storage every worker can read)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, index=True)
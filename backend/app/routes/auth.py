@@ -1,12 +1,15 @@
 # Authentication routes for CrisisLink.cv
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt
 from datetime import datetime, timedelta
+from typing import Literal, Optional
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db, replica_router
 from app.models import User, Doctor, HOSPITALS
 from app.schemas import (
     UserCreate, 
@@ -14,9 +17,12 @@ from app.schemas import (
     LoginRequest, 
     TokenResponse, 
     UserResponse,
-    DoctorResponse
+    UserListItem,
+    UserListResponse
 )
 from app.config import settings
+from app.utils.passwords import hash_password_async, verify_and_rehash
+from app.utils.pagination import encode_cursor, decode_cursor
 
 # =============================================================================
 # CONFIGURATION
@@ -24,21 +30,14 @@ from app.config import settings
 
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# User listing: largest JSON page, and rows fetched per round-trip when streaming
+USER_PAGE_MAX = 500
+USER_STREAM_CHUNK = 1000
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
-def hash_password(password: str) -> str:
-    """Hash a plain text password using bcrypt"""
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
-
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -46,6 +45,12 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
+def duplicate_user_detail(error: IntegrityError) -> str:
+    """Which unique field a failed user insert collided on"""
+    if "email" in str(error.orig).lower():
+        return "Email already registered"
+    return "Username already registered"
+
 def get_hospital_name(hospital_id: str) -> str:
     """Get hospital name from ID"""
     for hospital in HOSPITALS:
@@ -58,52 +63,29 @@ def get_hospital_name(hospital_id: str) -> str:
 # =============================================================================
 
 @router.post("/register/patient", response_model=TokenResponse)
-async def register_patient(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_patient(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Register a new patient account.
     Returns JWT token on successful registration.
     """
+    hashed_password = await hash_password_async(user_data.password)
+    
     try:
-        # Test database connection first
-        db.execute("SELECT 1")
-        
-        # Check if username exists
-        existing_user = db.query(User).filter(User.username == user_data.username).first()
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered"
-            )
-        
-        # Check if email exists
-        existing_email = db.query(User).filter(User.email == user_data.email).first()
-        if existing_email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        
-        # Create new user
+        # Single insert; the unique constraints reject duplicates
         new_user = User(
             username=user_data.username,
             email=user_data.email,
-            hashed_password=hash_password(user_data.password),
+            hashed_password=hashed_password,
             user_type="patient"
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-        
-        # Generate token
-        access_token = create_access_token(data={"sub": new_user.id, "type": "patient"})
-        
-        print(f"Successfully registered user: {new_user.username} with ID: {new_user.id}")
-        
-        return TokenResponse(
-            access_token=access_token,
-            user_type="patient",
-            user_id=new_user.id
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_user_detail(e)
         )
     except Exception as e:
         print(f"Database registration failed: {e}")
@@ -119,73 +101,63 @@ async def register_patient(user_data: UserCreate, db: Session = Depends(get_db))
             user_type="patient",
             user_id=mock_user_id
         )
+    
+    # The dashboard is read right after registration
+    replica_router.mark_written(new_user.id, new_user.username)
+    
+    # Generate token
+    access_token = create_access_token(data={"sub": new_user.id, "type": "patient"})
+    
+    print(f"Successfully registered user: {new_user.username} with ID: {new_user.id}")
+    
+    return TokenResponse(
+        access_token=access_token,
+        user_type="patient",
+        user_id=new_user.id
+    )
 
 @router.post("/register/doctor", response_model=TokenResponse)
-async def register_doctor(doctor_data: DoctorCreate, db: Session = Depends(get_db)):
+async def register_doctor(doctor_data: DoctorCreate, db: AsyncSession = Depends(get_db)):
     """
     Register a new doctor account with hospital affiliation.
     Returns JWT token on successful registration.
     """
+    # Validate hospital_id
+    valid_hospital_ids = [h["id"] for h in HOSPITALS]
+    if doctor_data.hospital_id not in valid_hospital_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid hospital_id. Valid options: {valid_hospital_ids}"
+        )
+    
+    hashed_password = await hash_password_async(doctor_data.password)
+    
     try:
-        # Validate hospital_id
-        valid_hospital_ids = [h["id"] for h in HOSPITALS]
-        if doctor_data.hospital_id not in valid_hospital_ids:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid hospital_id. Valid options: {valid_hospital_ids}"
-            )
-        
-        # Check if username exists
-        existing_user = db.query(User).filter(User.username == doctor_data.username).first()
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already registered"
-            )
-        
-        # Check if email exists
-        existing_email = db.query(User).filter(User.email == doctor_data.email).first()
-        if existing_email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-        
-        # Create new user with doctor type
+        # User and doctor profile are written in one transaction
         new_user = User(
             username=doctor_data.username,
             email=doctor_data.email,
-            hashed_password=hash_password(doctor_data.password),
+            hashed_password=hashed_password,
             user_type="doctor"
         )
-        
-        db.add(new_user)
-        db.flush()  # Get user ID before creating doctor profile
-        
-        # Create doctor profile
-        hospital_name = get_hospital_name(doctor_data.hospital_id)
-        new_doctor = Doctor(
-            user_id=new_user.id,
+        new_user.doctor_profile = Doctor(
             hospital_id=doctor_data.hospital_id,
-            hospital_name=hospital_name,
+            hospital_name=get_hospital_name(doctor_data.hospital_id),
             specialty=doctor_data.specialty,
             license_number=doctor_data.license_number,
             is_verified=False
         )
         
-        db.add(new_doctor)
-        db.commit()
-        db.refresh(new_user)
-        
-        # Generate token
-        access_token = create_access_token(data={"sub": new_user.id, "type": "doctor"})
-        
-        return TokenResponse(
-            access_token=access_token,
-            user_type="doctor",
-            user_id=new_user.id
+        db.add(new_user)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_user_detail(e)
         )
     except Exception as e:
+        print(f"Database registration failed: {e}")
         # Fallback to mock if database fails
         import uuid
         mock_user_id = str(uuid.uuid4())
@@ -196,28 +168,49 @@ async def register_doctor(doctor_data: DoctorCreate, db: Session = Depends(get_d
             user_type="doctor",
             user_id=mock_user_id
         )
+    
+    # The dashboard is read right after registration
+    replica_router.mark_written(new_user.id, new_user.username)
+    
+    # Generate token
+    access_token = create_access_token(data={"sub": new_user.id, "type": "doctor"})
+    
+    return TokenResponse(
+        access_token=access_token,
+        user_type="doctor",
+        user_id=new_user.id
+    )
 
 # =============================================================================
 # LOGIN ENDPOINT
 # =============================================================================
 
 @router.post("/login", response_model=TokenResponse)
-async def login(login_data: LoginRequest):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """
     Authenticate user and return JWT token.
     Works for both patients and doctors.
     """
-    # For now, always return success with mock data
-    import uuid
-    mock_user_id = str(uuid.uuid4())
+    user = await db.scalar(select(User).where(User.email == login_data.email))
+    
+    valid, new_hash = await verify_and_rehash(login_data.password, user.hashed_password) if user else (False, None)
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password"
+        )
     
-    # Create a simple token (not secure, just for demo)
-    access_token = f"mock_token_{mock_user_id}"
+    # Stored hash predates the current cost: replace it while we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
+    access_token = create_access_token(data={"sub": user.id, "type": user.user_type})
     
     return TokenResponse(
         access_token=access_token,
-        user_type="patient",
-        user_id=mock_user_id
+        user_type=user.user_type,
+        user_id=user.id
     )
 
 # =============================================================================
@@ -225,12 +218,12 @@ async def login(login_data: LoginRequest):
 # =============================================================================
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(user_id: str, db: Session = Depends(get_db)):
+async def get_current_user(user_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get current user information.
     In production, user_id would come from JWT token validation.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     
     if not user:
         raise HTTPException(
@@ -247,21 +240,71 @@ async def get_current_user(user_id: str, db: Session = Depends(get_db)):
     )
 
 # =============================================================================
-# HOSPITALS LIST ENDPOINT
+# USER LISTING ENDPOINTS
 # =============================================================================
 
-@router.get("/users")
-async def list_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    return [{"user_id": u.id, "username": u.username, "email": u.email} for u in users]
+def _user_listing_query(after: Optional[str]):
+    """Users in primary key order, starting after the given id"""
+    query = select(User.id, User.username, User.email, User.user_type, User.created_at).order_by(User.id)
+    if after:
+        query = query.where(User.id > after)
+    return query
+
+def _user_item(row) -> UserListItem:
+    return UserListItem(
+        user_id=row.id,
+        username=row.username,
+        email=row.email,
+        user_type=row.user_type,
+        created_at=row.created_at
+    )
+
+async def _stream_users(after: Optional[str]):
+    """
+    NDJSON lines read through a server-side cursor, one chunk per fetch.
+    Uses its own session: the response body outlives the request's session.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_user_listing_query(after).execution_options(yield_per=USER_STREAM_CHUNK))
+        async for rows in result.partitions():
+            yield "".join(_user_item(row).model_dump_json() + "\n" for row in rows)
+
+@router.get("/users", response_model=UserListResponse)
+async def list_users(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    List users in id order, a page at a time; pass next_cursor back as cursor.
+    format=ndjson instead streams every user from the cursor on, one JSON
+    object per line, with memory use independent of the table size.
+    """
+    after = decode_cursor(cursor, 1)[0] if cursor else None
+    if format == "ndjson":
+        return StreamingResponse(_stream_users(after), media_type="application/x-ndjson")
+    
+    limit = max(1, min(limit, USER_PAGE_MAX))
+    # One extra row tells us whether another page follows
+    rows = (await db.execute(_user_listing_query(after).limit(limit + 1))).all()
+    page = rows[:limit]
+    return UserListResponse(
+        users=[_user_item(row) for row in page],
+        next_cursor=encode_cursor(page[-1].id) if len(rows) > limit else None
+    )
 
 @router.get("/user/{username}")
-async def get_user_by_username(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
+async def get_user_by_username(username: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == username))
     if not user:
         raise HTTPException(404, "User not found")
     return {"user_id": user.id, "username": user.username, "email": user.email}
 
+# =============================================================================
+# HOSPITALS LIST ENDPOINT
+# =============================================================================
+
 @router.get("/hospitals")
 async def get_hospitals():
     """
@@ -1,14 +1,17 @@
 # Dashboard data routes for CrisisLink.cv
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime
+from typing import Optional
 
-from app.database import get_db
-from app.models import User, MedicalProfile, Doctor, EmergencyAccess
+from app.database import get_read_db
+from app.crud import load_patient_by_id, search_patients, count_patients
+from app.models import User, Doctor
 from app.schemas import DashboardStats, PatientListItem, PatientListResponse
-from app.utils.encryption import decrypt_data
+from app.services.dashboard_counters import read_stats
+from app.utils.pagination import encode_cursor, decode_cursor
 
 # =============================================================================
 # CONFIGURATION
@@ -16,22 +19,13 @@ from app.utils.encryption import decrypt_data
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# Largest patient search page
+PATIENT_PAGE_MAX = 100
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
-def calculate_age(date_of_birth: str) -> int:
-    """Calculate age from date of birth string (YYYY-MM-DD)"""
-    if not date_of_birth:
-        return None
-    try:
-        dob = datetime.strptime(date_of_birth, "%Y-%m-%d")
-        today = datetime.today()
-        age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-        return age
-    except ValueError:
-        return None
-
 def format_last_accessed(accessed_at: datetime) -> str:
     """Format datetime to human-readable relative time"""
     if not accessed_at:
@@ -56,15 +50,19 @@ def format_last_accessed(accessed_at: datetime) -> str:
 # =============================================================================
 
 @router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats():
+async def get_dashboard_stats(hospital_id: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
     """
     Get dashboard statistics for medical professionals.
     Returns total accesses, active profiles, and emergency alerts.
+    Read from the dashboard counters, so the cost does not grow with the
+    access log; pass hospital_id for scans made through one hospital.
     """
+    stats = await read_stats(db, hospital_id)
     return DashboardStats(
-        total_accesses=42,
-        active_profiles=15,
-        emergency_alerts=0
+        total_accesses=stats["total_accesses"],
+        active_profiles=stats["active_profiles"],
+        emergency_alerts=0,
+        accesses_today=stats["accesses_today"]
     )
 
 # =============================================================================
@@ -72,31 +70,42 @@ async def get_dashboard_stats():
 # =============================================================================
 
 @router.get("/patients", response_model=PatientListResponse)
-async def get_patients(search: str = "", limit: int = 50):
+async def get_patients(
+    search: str = "",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
     """
     Get list of patients with profiles for doctor's patient lookup.
-    Supports search by name.
+    Supports search by name. Results are in name order; pass next_cursor
+    back as cursor for the following page.
     """
-    mock_patients = [
-        PatientListItem(
-            id="patient1",
-            name="John Doe",
-            age=35,
-            blood_type="A+",
-            last_accessed="2 hours ago"
-        ),
-        PatientListItem(
-            id="patient2",
-            name="Jane Smith",
-            age=28,
-            blood_type="O-",
-            last_accessed="1 day ago"
-        )
-    ]
+    limit = max(1, min(limit, PATIENT_PAGE_MAX))
+    search = search.strip()
+    after = decode_cursor(cursor, 2) if cursor else None
+    
+    # One extra row tells us whether another page follows
+    rows = await search_patients(db, search, limit + 1, after)
+    page = rows[:limit]
+    
+    total_count = None
+    if not cursor:
+        total_count = await count_patients(db, search) if search else (await read_stats(db))["active_profiles"]
     
     return PatientListResponse(
-        patients=mock_patients,
-        total_count=2
+        patients=[
+            PatientListItem(
+                id=row.user_id,
+                name=row.full_name,
+                age=row.age,
+                blood_type=row.blood_type,
+                last_accessed=format_last_accessed(row.last_accessed_at)
+            )
+            for row in page
+        ],
+        total_count=total_count,
+        next_cursor=encode_cursor(page[-1].full_name, page[-1].id) if len(rows) > limit else None
     )
 
 # =============================================================================
@@ -104,13 +113,13 @@ async def get_patients(search: str = "", limit: int = 50):
 # =============================================================================
 
 @router.get("/profile/{user_id}")
-async def get_patient_dashboard_profile(user_id: str, db: Session = Depends(get_db)):
+async def get_patient_dashboard_profile(user_id: str, db: AsyncSession = Depends(get_read_db)):
     """
     Get patient's own profile data for their dashboard.
     """
     try:
-        # Get user from database
-        user = db.query(User).filter(User.id == user_id).first()
+        # Get user and profile from database in one round-trip
+        user = await load_patient_by_id(db, user_id)
         if not user:
             # Create mock user if not found
             user_data = {
@@ -127,17 +136,16 @@ async def get_patient_dashboard_profile(user_id: str, db: Session = Depends(get_
                 "user_type": user.user_type
             }
         
-        # Get profile from database
-        profile = db.query(MedicalProfile).filter(MedicalProfile.user_id == user_id).first()
+        profile = user.profile if user else None
         if profile:
             # Calculate completion percentage
             fields_to_check = [
                 profile.full_name,
                 profile.date_of_birth,
                 profile.blood_type,
-                profile.allergies,
-                profile.medications,
-                profile.medical_conditions,
+                profile.medical_data or profile.allergies,
+                profile.medical_data or profile.medications,
+                profile.medical_data or profile.medical_conditions,
                 profile.languages,
                 profile.qr_code_url
             ]
@@ -179,13 +187,13 @@ async def get_patient_dashboard_profile(user_id: str, db: Session = Depends(get_
 # =============================================================================
 
 @router.get("/doctor/{user_id}")
-async def get_doctor_dashboard_profile(user_id: str, db: Session = Depends(get_db)):
+async def get_doctor_dashboard_profile(user_id: str, db: AsyncSession = Depends(get_read_db)):
     """
     Get doctor's profile data for their dashboard header.
     """
     try:
         # Get user
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             # Return mock doctor data
             return {
@@ -202,7 +210,7 @@ async def get_doctor_dashboard_profile(user_id: str, db: Session = Depends(get_d
             }
         
         # Get doctor profile
-        doctor = db.query(Doctor).filter(Doctor.user_id == user_id).first()
+        doctor = await db.scalar(select(Doctor).where(Doctor.user_id == user_id))
         
         return {
             "user": {
@@ -1,87 +1,180 @@
 # Emergency access endpoint
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User, MedicalProfile, EmergencyContact, EmergencyAccess
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_read_db
+from app.crud import load_patient_by_username, profile_version
 from app.schemas import EmergencyView
-from app.utils.encryption import decrypt_data
-from app.services.notifications import notify_emergency_contacts
+from app.utils.encryption import decrypt_medical_data
+from app.utils.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
+from app.services.notifications import notification_dispatcher
 from app.services.ai_voice import generate_emergency_speech
-from datetime import datetime
+from app.services.translator import translate_emergency_view
+from app.services.emergency_cache import get_cached_view, cache_view, invalidate_view, is_current, view_etag
+from app.services.audit_log import access_log_buffer
+from app.services.tts_cache import tts_audio_cache
+from app.models import HOSPITALS
+from typing import Optional
 
 router = APIRouter(prefix="/api/emergency", tags=["emergency"])
 
-@router.get("/{username}", response_model=EmergencyView)
-async def get_emergency_profile(
-    username: str,
-    request: Request,
-    language: str = "en",
-    db: Session = Depends(get_db)
-):
-    # Find user
-    user = db.query(User).filter_by(username=username).first()
-    if not user:
-        raise HTTPException(404, "User not found")
-    
-    # Get profile
-    profile = db.query(MedicalProfile).filter_by(user_id=user.id).first()
-    if not profile:
-        raise HTTPException(404, "Emergency profile not found")
-    
-    # Log access
-    access_log = EmergencyAccess(
-        user_id=user.id,
+# Emergency data is PHI: never store in shared caches, always revalidate
+EMERGENCY_CACHE_CONTROL = "private, no-cache"
+# A translation that fell back to English must not be revalidated later
+UNTRANSLATED_CACHE_CONTROL = "private, no-store"
+
+# Profiles are stored in English; other languages are translated on read
+DEFAULT_LANGUAGE = "en"
+
+# Scans attributed to anything else are counted globally only
+KNOWN_HOSPITAL_IDS = {h["id"] for h in HOSPITALS}
+
+def _localized_etag(etag: str, language: str) -> str:
+    """Distinct validator per response language"""
+    return etag if language == DEFAULT_LANGUAGE else make_etag(etag, language)
+
+def _record_scan(request: Request, user_id: str, patient_name: str, contacts: list, hospital_id: str = None):
+    """Log the access and alert contacts, both off the request path"""
+    access_log_buffer.record(
+        user_id=user_id,
         responder_info=str(request.client.host),
-        access_type="url_access"
+        access_type="url_access",
+        hospital_id=hospital_id if hospital_id in KNOWN_HOSPITAL_IDS else None
     )
-    db.add(access_log)
     
-    # Get emergency contacts
-    contacts = db.query(EmergencyContact).filter_by(user_id=user.id).order_by(EmergencyContact.priority).all()
+    # Notify contacts in the background (deduplicated per patient)
+    notification_dispatcher.submit(user_id, contacts, patient_name)
+
+async def _load_patient(db: AsyncSession, username: str):
+    """User with profile and contacts, or 404"""
+    # Find user, profile and contacts in one round-trip
+    user = await load_patient_by_username(db, username)
+    if not user:
+        raise HTTPException(404, "User not found")
     
-    # Notify contacts (async in background in real app)
-    contact_list = [{"name": c.name, "phone": c.phone, "priority": c.priority} for c in contacts]
-    # await notify_emergency_contacts(contact_list, profile.full_name)
+    if not user.profile:
+        raise HTTPException(404, "Emergency profile not found")
     
-    db.commit()
+    return user
+
+def _build_view(username: str, user):
+    """Decrypt once and keep the result for subsequent scans"""
+    profile = user.profile
+    contact_list = [{"name": c.name, "phone": c.phone, "priority": c.priority} for c in user.contacts]
+    medical = decrypt_medical_data(profile)
     
-    # Return decrypted data
-    return EmergencyView(
+    return cache_view(username, user.id, view_etag(user), EmergencyView(
         full_name=profile.full_name,
         blood_type=profile.blood_type,
-        allergies=decrypt_data(profile.allergies),
-        medications=decrypt_data(profile.medications),
-        medical_conditions=decrypt_data(profile.medical_conditions),
+        allergies=medical["allergies"],
+        medications=medical["medications"],
+        medical_conditions=medical["medical_conditions"],
         dnr_status=profile.dnr_status,
         special_instructions=profile.special_instructions,
         emergency_contacts=contact_list,
-        languages=profile.languages
-    )
+        languages=profile.languages,
+        medical_data_unreadable=medical["unreadable"]
+    ), profile.updated_at)
+
+async def _current_cached_view(db: AsyncSession, username: str):
+    """
+    Cached view if the profile has not changed since it was built.
+    Another worker may have saved it: one indexed lookup of updated_at
+    decides, instead of loading and decrypting the whole profile.
+    """
+    cached = get_cached_view(username)
+    if cached is None:
+        return None
+    row = await profile_version(db, username)
+    if row is None or not is_current(cached, row.updated_at):
+        invalidate_view(username)
+        return None
+    return cached
+
+async def _get_view(db: AsyncSession, username: str):
+    """Current cached emergency view, building it on a miss"""
+    return await _current_cached_view(db, username) or _build_view(username, await _load_patient(db, username))
+
+@router.get("/{username}", response_model=EmergencyView)
+async def get_emergency_profile(
+    username: str,
+    request: Request,
+    response: Response,
+    language: str = "en",
+    hospital_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Serve from the materialized view cache when it is still current
+    cached = await _current_cached_view(db, username)
+    if cached is None:
+        user = await _load_patient(db, username)
+        
+        # Revalidation succeeds without decrypting anything
+        etag = _localized_etag(view_etag(user), language)
+        if etag_matches(request, etag):
+            contact_list = [{"name": c.name, "phone": c.phone, "priority": c.priority} for c in user.contacts]
+            _record_scan(request, user.id, user.profile.full_name, contact_list, hospital_id)
+            return not_modified(etag, EMERGENCY_CACHE_CONTROL)
+        
+        cached = _build_view(username, user)
+    
+    _record_scan(request, cached.user_id, cached.view.full_name, cached.view.emergency_contacts, hospital_id)
+    
+    etag = _localized_etag(cached.etag, language)
+    if etag_matches(request, etag):
+        return not_modified(etag, EMERGENCY_CACHE_CONTROL)
+    
+    if language == DEFAULT_LANGUAGE:
+        set_cache_headers(response, etag, EMERGENCY_CACHE_CONTROL)
+        return cached.view
+    
+    # Translation memory is written on a miss, so it uses its own primary session
+    view, complete = await translate_emergency_view(cached.view, language)
+    if complete:
+        set_cache_headers(response, etag, EMERGENCY_CACHE_CONTROL)
+    else:
+        # No validator: the next request retries the translation
+        response.headers["Cache-Control"] = UNTRANSLATED_CACHE_CONTROL
+    return view
 
 @router.get("/{username}/voice")
 async def get_voice_emergency(
     username: str,
     language: str = "en",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Generate voice reading of emergency info"""
-    user = db.query(User).filter_by(username=username).first()
-    if not user:
-        raise HTTPException(404, "User not found")
-    
-    profile = db.query(MedicalProfile).filter_by(user_id=user.id).first()
+    cached = await _get_view(db, username)
+    speech_text = generate_emergency_speech(cached.view.model_dump(), language)
     
-    profile_data = {
-        "full_name": profile.full_name,
-        "blood_type": profile.blood_type,
-        "allergies": decrypt_data(profile.allergies),
-        "medications": decrypt_data(profile.medications),
-        "medical_conditions": decrypt_data(profile.medical_conditions),
-        "dnr_status": profile.dnr_status,
-        "special_instructions": profile.special_instructions
+    return {
+        "text": speech_text,
+        "audio_url": f"/api/emergency/{username}/voice/audio?language={language}"
     }
+
+@router.get("/{username}/voice/audio")
+async def get_voice_audio(
+    username: str,
+    language: str = "en",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Stream the synthesized emergency reading.
+    Audio is cached per profile version and language, and served with
+    Range support so players can seek without re-downloading.
+    """
+    cached = await _get_view(db, username)
+    speech_text = generate_emergency_speech(cached.view.model_dump(), language)
     
-    speech_text = generate_emergency_speech(profile_data, language)
+    try:
+        path = await tts_audio_cache.get_or_synthesize(cached.etag, language, speech_text)
+    except Exception as e:
+        print(f"Speech synthesis failed: {e}")
+        raise HTTPException(502, "Speech synthesis unavailable")
     
-    return {"text": speech_text, "audio_url": "generated_audio_url"}
\ No newline at end of file
+    return FileResponse(
+        path,
+        media_type="audio/mpeg",
+        headers={"Cache-Control": EMERGENCY_CACHE_CONTROL}
+    )
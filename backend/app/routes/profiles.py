@@ -1,46 +1,64 @@
 # User profile CRUD
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User, MedicalProfile, EmergencyContact
-from app.schemas import MedicalProfileCreate, MedicalProfileResponse, MedicalProfileFull, EmergencyContactCreate
-from typing import List
-from app.utils.encryption import encrypt_data, decrypt_data
-from app.utils.qr_generator import generate_qr_code
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, replica_router
+from app.crud import load_patient_by_id
+from app.models import MedicalProfile
+from app.schemas import MedicalProfileCreate, MedicalProfileResponse, MedicalProfileFull
+from typing import Literal, Optional
+from app.utils.encryption import encrypt_medical_data, decrypt_medical_data, keyring
+from app.services.qr_assets import ensure_emergency_qr, public_qr_url
+from app.utils.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
+from app.services.emergency_cache import invalidate_view
+from app.services.dashboard_counters import increment_statement, profile_deltas
+from app.services.patient_import import patient_import_runner
+from app.services.background_jobs import PATIENT_IMPORT, load_job
+from app.services.reference_index import USAGE_STATEMENT, profile_terms, usage_params
 from app.config import settings
 
 router = APIRouter(prefix="/api/profiles", tags=["profiles"])
 
+# Profiles are PHI: browser-only caching, always revalidated
+PROFILE_CACHE_CONTROL = "private, no-cache"
+
+def _profile_response(db_profile: MedicalProfile) -> MedicalProfileResponse:
+    """Summary response with the QR reference expanded to a public URL"""
+    return MedicalProfileResponse(
+        id=db_profile.id,
+        full_name=db_profile.full_name,
+        date_of_birth=db_profile.date_of_birth,
+        blood_type=db_profile.blood_type,
+        emergency_url=db_profile.emergency_url,
+        qr_code_url=public_qr_url(db_profile.qr_code_url),
+        updated_at=db_profile.updated_at
+    )
+
 @router.post("/", response_model=MedicalProfileResponse)
 async def create_profile(
     profile: MedicalProfileCreate,
     user_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        # Check if profile exists
-        existing = db.query(MedicalProfile).filter_by(user_id=user_id).first()
-        if existing:
-            raise HTTPException(400, "Profile already exists")
-        
-        # Get user
-        user = db.query(User).filter_by(id=user_id).first()
+        # Get user and any existing profile in one round-trip
+        user = await load_patient_by_id(db, user_id)
         if not user:
             raise HTTPException(404, "User not found")
         
+        # Check if profile exists
+        if user.profile:
+            raise HTTPException(400, "Profile already exists")
+        
         # Create emergency URL
         emergency_url = f"https://crisislink.cv/emergency/{user.username}"
         
-        # Generate QR code
-        from app.utils.qr_generator import generate_qr_code
-        qr_code = generate_qr_code(user.username)
+        # Render (or reuse) the QR images; the row keeps only the PNG reference
+        qr_code = await ensure_emergency_qr(db, user.username)
+        await ensure_emergency_qr(db, user.username, "svg")
         
         # Encrypt sensitive data
-        from app.utils.encryption import encrypt_data
-        allergies_encrypted = encrypt_data(profile.allergies or [])
-        medications_encrypted = encrypt_data(profile.medications or [])
-        conditions_encrypted = encrypt_data(profile.medical_conditions or [])
+        medical_data = encrypt_medical_data(profile.allergies, profile.medications, profile.medical_conditions)
         
         # Create profile
         db_profile = MedicalProfile(
@@ -48,9 +66,7 @@ async def create_profile(
             full_name=profile.full_name,
             date_of_birth=profile.date_of_birth,
             blood_type=profile.blood_type,
-            allergies=allergies_encrypted,
-            medications=medications_encrypted,
-            medical_conditions=conditions_encrypted,
+            medical_data=medical_data,
             dnr_status=profile.dnr_status,
             organ_donor=profile.organ_donor,
             special_instructions=profile.special_instructions,
@@ -60,10 +76,15 @@ async def create_profile(
         )
         
         db.add(db_profile)
-        db.commit()
-        db.refresh(db_profile)
+        await db.execute(increment_statement(db.bind.dialect.name, profile_deltas()))
+        usage = usage_params((), profile_terms(profile.allergies, profile.medications, profile.medical_conditions))
+        if usage:
+            await db.execute(USAGE_STATEMENT, usage)
+        await db.commit()
+        await db.refresh(db_profile)
+        replica_router.mark_written(user_id, user.username)
         
-        return db_profile
+        return _profile_response(db_profile)
     except Exception as e:
         # Fallback to mock if database fails
         import uuid
@@ -79,10 +100,48 @@ async def create_profile(
             "updated_at": "2024-01-01T00:00:00Z"
         }
 
+# =============================================================================
+# BULK IMPORT
+# =============================================================================
+
+@router.post("/import", status_code=202)
+async def import_patients(request: Request, format: Optional[Literal["csv", "ndjson"]] = None):
+    """
+    Create many patients (account, profile, contacts) from a CSV or NDJSON body.
+    The body is spooled to disk as it arrives and imported on a background
+    thread; poll the status URL for progress and per-row errors.
+    The format defaults from the Content-Type (text/csv, else NDJSON).
+    """
+    import_format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    job = patient_import_runner.create_job(import_format)
+    
+    received = 0
+    with open(job.path, "wb") as f:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > settings.PATIENT_IMPORT_MAX_BYTES:
+                break
+            f.write(chunk)
+    if received > settings.PATIENT_IMPORT_MAX_BYTES:
+        patient_import_runner.discard(job)
+        raise HTTPException(413, f"Import body larger than {settings.PATIENT_IMPORT_MAX_BYTES} bytes")
+    
+    patient_import_runner.start(job)
+    return {**job.progress(), "status_url": f"/api/profiles/import/{job.id}"}
+
+@router.get("/import/{job_id}")
+async def get_patient_import(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Progress and per-row errors of an import"""
+    job = await load_job(db, PATIENT_IMPORT, job_id)
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return job.progress
+
 @router.get("/{user_id}", response_model=MedicalProfileFull)
-async def get_profile(user_id: str, db: Session = Depends(get_db)):
+async def get_profile(user_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     try:
-        profile = db.query(MedicalProfile).filter_by(user_id=user_id).first()
+        user = await load_patient_by_id(db, user_id)
+        profile = user.profile if user else None
         if not profile:
             # Return mock profile if not found
             return MedicalProfileFull(
@@ -101,20 +160,28 @@ async def get_profile(user_id: str, db: Session = Depends(get_db)):
                 qr_code_url="data:image/png;base64,mock_qr_code"
             )
         
+        # Unchanged since the client's copy: skip decryption entirely
+        etag = make_etag(profile.id, profile.updated_at.isoformat() if profile.updated_at else "")
+        if etag_matches(request, etag):
+            return not_modified(etag, PROFILE_CACHE_CONTROL)
+        set_cache_headers(response, etag, PROFILE_CACHE_CONTROL)
+        
+        medical = decrypt_medical_data(profile)
         return MedicalProfileFull(
             id=profile.id,
             full_name=profile.full_name,
             date_of_birth=profile.date_of_birth,
             blood_type=profile.blood_type,
-            allergies=decrypt_data(profile.allergies) if profile.allergies else [],
-            medications=decrypt_data(profile.medications) if profile.medications else [],
-            medical_conditions=decrypt_data(profile.medical_conditions) if profile.medical_conditions else [],
+            allergies=medical["allergies"],
+            medications=medical["medications"],
+            medical_conditions=medical["medical_conditions"],
             dnr_status=profile.dnr_status,
             organ_donor=profile.organ_donor,
             special_instructions=profile.special_instructions,
             languages=profile.languages or ["English"],
             emergency_url=profile.emergency_url,
-            qr_code_url=profile.qr_code_url
+            qr_code_url=public_qr_url(profile.qr_code_url),
+            medical_data_unreadable=medical["unreadable"]
         )
     except Exception as e:
         # Return mock profile on any error
@@ -135,53 +202,74 @@ async def get_profile(user_id: str, db: Session = Depends(get_db)):
         )
 
 @router.get("/debug/{user_id}")
-async def debug_profile(user_id: str, db: Session = Depends(get_db)):
-    profile = db.query(MedicalProfile).filter_by(user_id=user_id).first()
+async def debug_profile(user_id: str, db: AsyncSession = Depends(get_db)):
+    user = await load_patient_by_id(db, user_id)
+    profile = user.profile if user else None
     if not profile:
         raise HTTPException(404, "Profile not found")
     
+    medical = decrypt_medical_data(profile)
     return {
         "id": profile.id,
         "full_name": profile.full_name,
         "blood_type": profile.blood_type,
+        "medical_data_encrypted": profile.medical_data,
+        "key_id": keyring.key_id_of(profile.medical_data) if profile.medical_data else None,
         "allergies_encrypted": profile.allergies,
         "medications_encrypted": profile.medications,
         "conditions_encrypted": profile.medical_conditions,
-        "allergies_decrypted": decrypt_data(profile.allergies) if profile.allergies else [],
-        "medications_decrypted": decrypt_data(profile.medications) if profile.medications else [],
-        "conditions_decrypted": decrypt_data(profile.medical_conditions) if profile.medical_conditions else []
+        "allergies_decrypted": medical["allergies"],
+        "medications_decrypted": medical["medications"],
+        "conditions_decrypted": medical["medical_conditions"],
+        "unreadable": medical["unreadable"]
     }
 @router.put("/{user_id}", response_model=MedicalProfileResponse)
 async def update_profile(
     user_id: str,
     profile: MedicalProfileCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    existing = db.query(MedicalProfile).filter_by(user_id=user_id).first()
-    if not existing:
-        raise HTTPException(404, "Profile not found")
-    
-    # Get user for QR code generation
-    user = db.query(User).filter_by(id=user_id).first()
+    # Get user (for QR code generation) and profile in one round-trip
+    user = await load_patient_by_id(db, user_id)
     if not user:
         raise HTTPException(404, "User not found")
     
-    # Generate QR code if not exists
-    if not existing.qr_code_url:
-        existing.qr_code_url = generate_qr_code(user.username)
+    existing = user.profile
+    if not existing:
+        raise HTTPException(404, "Profile not found")
+    
+    # Generate QR code if not exists (or still an inline data URI)
+    if not existing.qr_code_url or existing.qr_code_url.startswith("data:"):
+        existing.qr_code_url = await ensure_emergency_qr(db, user.username)
+        await ensure_emergency_qr(db, user.username, "svg")
         existing.emergency_url = f"https://crisislink.cv/emergency/{user.username}"
     
+    # Reference search ranks terms by how many profiles list them
+    # (an unreadable profile's old terms are unknown; scripts/rebuild_reference_usage.py fixes them)
+    before = decrypt_medical_data(existing)
+    usage = usage_params(
+        () if before["unreadable"] else profile_terms(before["allergies"], before["medications"], before["medical_conditions"]),
+        profile_terms(profile.allergies, profile.medications, profile.medical_conditions)
+    )
+    if usage:
+        await db.execute(USAGE_STATEMENT, usage)
+    
     existing.full_name = profile.full_name
     existing.date_of_birth = profile.date_of_birth
     existing.blood_type = profile.blood_type
-    existing.allergies = encrypt_data(profile.allergies)
-    existing.medications = encrypt_data(profile.medications)
-    existing.medical_conditions = encrypt_data(profile.medical_conditions)
+    existing.medical_data = encrypt_medical_data(profile.allergies, profile.medications, profile.medical_conditions)
+    existing.allergies = None
+    existing.medications = None
+    existing.medical_conditions = None
     existing.dnr_status = profile.dnr_status
     existing.organ_donor = profile.organ_donor
     existing.special_instructions = profile.special_instructions
     existing.languages = profile.languages
     
-    db.commit()
-    db.refresh(existing)
-    return existing
\ No newline at end of file
+    await db.commit()
+    await db.refresh(existing)
+    
+    # Responders must never see the pre-update view
+    invalidate_view(user.username)
+    replica_router.mark_written(user_id, user.username)
+    return _profile_response(existing)
\ No newline at end of file
@@ -1,24 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+from app.config import settings
 from app.database import get_db
 from app.models import User
-from app.utils.qr_generator import generate_qr_code
+from app.schemas import QRBatchRequest
+from app.services.background_jobs import QR_BATCH, load_job
+from app.services.qr_assets import ensure_emergency_qr, find_emergency_qr, load_qr_asset, public_qr_url
+from app.services.qr_batch import KINDS, OUTPUT_FORMATS, qr_batch_runner
+from app.utils.qr_generator import QR_MEDIA_TYPES
 
 router = APIRouter()
 
+# Asset ids are content hashes, so a given URL never changes meaning
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+async def _render_qr_links(db: AsyncSession, username: str) -> dict:
+    """Render (or reuse) the PNG and SVG emergency QR code; returns their URLs"""
+    return {
+        "qr_code": public_qr_url(await ensure_emergency_qr(db, username, "png")),
+        "qr_code_svg": public_qr_url(await ensure_emergency_qr(db, username, "svg"))
+    }
+
+async def _stored_qr_links(db: AsyncSession, username: str) -> dict:
+    """URLs of the already rendered emergency QR code; GETs never render or write"""
+    png = await find_emergency_qr(db, username, "png")
+    if not png:
+        raise HTTPException(status_code=404, detail=f"QR code not generated yet; POST /api/qr/generate/{username}")
+    return {
+        "qr_code": public_qr_url(png),
+        "qr_code_svg": public_qr_url(await find_emergency_qr(db, username, "svg"))
+    }
+
+@router.post("/generate/{username}")
+async def generate_qr_for_user(username: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == username))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return await _render_qr_links(db, username)
+
 @router.get("/generate/{username}")
-async def generate_qr_for_user(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
+async def get_qr_for_user(username: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == username))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    qr_code = generate_qr_code(username)
-    return {"qr_code": qr_code}
+    return await _stored_qr_links(db, username)
 
 @router.get("/my-qr")
-async def get_my_qr(user_id: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_my_qr(user_id: str, db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    qr_code = generate_qr_code(user.username)
-    return {"qr_code": qr_code}
\ No newline at end of file
+    return await _stored_qr_links(db, user.username)
+
+@router.get("/assets/{asset_file}")
+async def get_qr_asset(asset_file: str, db: AsyncSession = Depends(get_db)):
+    """Serve a rendered QR image by its content address (<id>.png or <id>.svg)"""
+    asset_id, _, suffix = asset_file.partition(".")
+    asset = await load_qr_asset(db, asset_id) if suffix in QR_MEDIA_TYPES else None
+    # The id alone names the image, so a suffix for the other format must not serve it
+    if not asset or asset[0] != QR_MEDIA_TYPES[suffix]:
+        raise HTTPException(status_code=404, detail="QR asset not found")
+
+    media_type, content = asset
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Cache-Control": ASSET_CACHE_CONTROL, "ETag": f'"{asset_id}"'}
+    )
+
+# =============================================================================
+# BATCH GENERATION
+# =============================================================================
+
+@router.post("/batch", status_code=202)
+async def create_qr_batch(batch: QRBatchRequest):
+    """
+    Start rendering QR codes or wallet cards for many patients.
+    Poll the status URL for progress, then fetch the zip/PDF from the download URL.
+    """
+    if batch.kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid kind. Valid options: {list(KINDS)}")
+    if batch.format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Valid options: {list(OUTPUT_FORMATS)}")
+    if not batch.usernames:
+        raise HTTPException(status_code=400, detail="No usernames given")
+    if len(batch.usernames) > settings.QR_BATCH_MAX_USERNAMES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.QR_BATCH_MAX_USERNAMES} usernames per batch")
+
+    job = qr_batch_runner.create_job(batch.usernames, batch.kind, batch.format)
+    qr_batch_runner.start(job)
+
+    return {
+        **job.progress(),
+        "status_url": f"/api/qr/batch/{job.id}",
+        "download_url": f"/api/qr/batch/{job.id}/download"
+    }
+
+@router.get("/batch/{job_id}")
+async def get_qr_batch(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Progress of a batch job"""
+    job = await load_job(db, QR_BATCH, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.progress
+
+@router.get("/batch/{job_id}/download")
+async def download_qr_batch(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Stream the finished zip/PDF"""
+    job = await load_job(db, QR_BATCH, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    status, kind, output_format = job.progress["status"], job.progress["kind"], job.progress["format"]
+    if status != "completed":
+        raise HTTPException(status_code=409, detail=f"Batch job is {status}")
+    if not os.path.exists(job.path):
+        raise HTTPException(status_code=404, detail="Batch produced no images")
+
+    return FileResponse(
+        job.path,
+        media_type=OUTPUT_FORMATS[output_format],
+        filename=f"crisislink-{kind}s-{job.id[:8]}.{output_format}"
+    )
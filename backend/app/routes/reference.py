@@ -1,23 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import ReferenceData
 from app.schemas import UserResponse
+from app.services.reference_index import reference_search
+from app.utils.http_cache import make_etag, etag_matches, not_modified, set_cache_headers
 
 router = APIRouter(
     prefix="/api/reference",
     tags=["reference"]
 )
 
+# Reference vocabulary is public and changes rarely: let a CDN or reverse
+# proxy serve it and revalidate in the background
+REFERENCE_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+SEARCH_CACHE_CONTROL = "public, max-age=300"
+SEARCH_LIMIT = 20
+
+async def reference_version(db: AsyncSession) -> tuple:
+    """
+    Cheap version stamp of the reference table: row count and highest id
+    catch additions and deletions, the latest updated_at catches edits
+    """
+    count, max_id, last_edit = (await db.execute(select(
+        func.count(ReferenceData.id),
+        func.max(ReferenceData.id),
+        func.max(ReferenceData.updated_at)
+    ))).one()
+    return count, max_id or 0, last_edit.isoformat() if last_edit else ""
+
 @router.get("/", response_model=Dict[str, Any])
-def get_all_reference_data(db: Session = Depends(get_db)):
+async def get_all_reference_data(request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
     """
     Get all reference data grouped by category.
     Returns: { "Allergies": [...], "Medications": [...], "Conditions": [...] }
     """
-    references = db.query(ReferenceData).all()
+    etag = make_etag("reference", *(await reference_version(db)))
+    if etag_matches(request, etag):
+        return not_modified(etag, REFERENCE_CACHE_CONTROL)
+    set_cache_headers(response, etag, REFERENCE_CACHE_CONTROL)
+    
+    references = (await db.scalars(select(ReferenceData))).all()
     
     result = {
         "Allergies": [],
@@ -41,54 +67,60 @@ def get_all_reference_data(db: Session = Depends(get_db)):
     return result
 
 @router.get("/search", response_model=Dict[str, List[Dict[str, Any]]])
-def search_references(
+async def search_references(
+    response: Response,
     q: str = "",
     category: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Search reference data.
     q: Search query (matches name or subcategory)
     category: Optional filter (Allergies, Medications, Conditions)
+    Ranked and typo tolerant from the in-memory index; the database is
+    queried only until the index has loaded.
     """
-    # Base query
-    query = db.query(ReferenceData)
+    response.headers["Cache-Control"] = SEARCH_CACHE_CONTROL
     
-    # Filter by category if provided
-    if category:
-        query = query.filter(ReferenceData.category == category)
+    results = reference_search.search(q, category, SEARCH_LIMIT)
+    if results is None:
+        # Base query
+        query = select(ReferenceData)
         
-    # Filter by search string (name or subcategory) if query provided
-    if q.strip():
-        search_term = f"%{q}%"
-        query = query.filter(
-            (ReferenceData.name.ilike(search_term)) | 
-            (ReferenceData.subcategory.ilike(search_term))
-        )
-    
-    # Limit results
-    results = query.limit(20).all()
+        # Filter by category if provided
+        if category:
+            query = query.where(ReferenceData.category == category)
+            
+        # Filter by search string (name or subcategory) if query provided
+        if q.strip():
+            search_term = f"%{q}%"
+            query = query.where(
+                (ReferenceData.name.ilike(search_term)) | 
+                (ReferenceData.subcategory.ilike(search_term))
+            )
+        
+        results = [item.to_dict() for item in (await db.scalars(query.limit(SEARCH_LIMIT))).all()]
     
-    # Group results
+    # Group results (in rank order)
     grouped = {}
     
     for item in results:
-        group_key = item.subcategory if item.subcategory else item.category
+        group_key = item["subcategory"] if item["subcategory"] else item["category"]
         if not group_key:
             group_key = "General"
             
         if group_key not in grouped:
             grouped[group_key] = []
             
-        grouped[group_key].append(item.to_dict())
+        grouped[group_key].append(item)
         
     return grouped
 
-def populate_reference_data(db: Session):
+async def populate_reference_data(db: AsyncSession):
     """
     Core seeding logic that can be called from endpoint or startup.
     """
-    if db.query(ReferenceData).first():
+    if await db.scalar(select(ReferenceData.id).limit(1)):
         return {"message": "Reference data already seeded"}
         
     initial_data = [
@@ -160,16 +192,21 @@ def populate_reference_data(db: Session):
         {"category": "Conditions", "name": "Heart Attack History"},
     ]
     
+    # Names are unique; an entry listed under two categories keeps the first
+    seen = set()
     for item in initial_data:
-        db_item = ReferenceData(**item)
-        db.add(db_item)
+        if item["name"] not in seen:
+            seen.add(item["name"])
+            db.add(ReferenceData(**item))
     
-    db.commit()
-    return {"message": "Reference data seeded successfully", "count": len(initial_data)}
+    await db.commit()
+    return {"message": "Reference data seeded successfully", "count": len(seen)}
 
 @router.post("/seed", status_code=status.HTTP_201_CREATED)
-def seed_reference_data(db: Session = Depends(get_db)):
+async def seed_reference_data(db: AsyncSession = Depends(get_db)):
     """
     Seed initial reference data.
     """
-    return populate_reference_data(db)
+    result = await populate_reference_data(db)
+    reference_search.request_reload()
+    return result
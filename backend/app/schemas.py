@@ -44,6 +44,19 @@ class UserResponse(BaseModel):
     user_type: str
     created_at: datetime
 
+class UserListItem(BaseModel):
+    """One user in the user listing"""
+    user_id: str
+    username: str
+    email: str
+    user_type: str
+    created_at: Optional[datetime]
+
+class UserListResponse(BaseModel):
+    """A page of the user listing"""
+    users: List[UserListItem]
+    next_cursor: Optional[str] = None
+
 # =============================================================================
 # DOCTOR SCHEMAS
 # =============================================================================
@@ -100,6 +113,7 @@ class MedicalProfileFull(BaseModel):
     languages: List[str]
     emergency_url: Optional[str]
     qr_code_url: Optional[str]
+    medical_data_unreadable: bool = False
 
 # =============================================================================
 # EMERGENCY CONTACT SCHEMAS
@@ -137,6 +151,29 @@ class EmergencyView(BaseModel):
     special_instructions: Optional[str]
     emergency_contacts: List[dict]
     languages: List[str]
+    medical_data_unreadable: bool = False  # lists hold a warning, not the patient's data
+
+# =============================================================================
+# BULK IMPORT SCHEMAS
+# =============================================================================
+
+class PatientImportRecord(BaseModel):
+    """One patient in a bulk import: account, profile and contacts"""
+    username: str
+    email: EmailStr
+    password: Optional[str] = None  # Without one the account cannot log in until a reset
+    profile: MedicalProfileCreate
+    contacts: List[EmergencyContactCreate] = []
+
+# =============================================================================
+# QR BATCH SCHEMAS
+# =============================================================================
+
+class QRBatchRequest(BaseModel):
+    """Schema for bulk QR code / wallet card generation"""
+    usernames: List[str]
+    kind: str = "qr"  # "qr" or "card"
+    format: str = "zip"  # "zip" or "pdf"
 
 # =============================================================================
 # DASHBOARD SCHEMAS
@@ -147,6 +184,7 @@ class DashboardStats(BaseModel):
     total_accesses: int
     active_profiles: int
     emergency_alerts: int  # Set to 0 for now
+    accesses_today: int = 0
 
 class PatientListItem(BaseModel):
     """Patient item for doctor's patient lookup"""
@@ -159,4 +197,5 @@ class PatientListItem(BaseModel):
 class PatientListResponse(BaseModel):
     """Response for patient list endpoint"""
     patients: List[PatientListItem]
-    total_count: int
\ No newline at end of file
+    total_count: Optional[int]  # First page only
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -1,11 +1,10 @@
-from sqlalchemy.orm import Session
-from app.models import ReferenceData, Base, User, MedicalProfile
-from app.database import engine, SessionLocal
-from app.routes.auth import hash_password
-import uuid
+# Demo and reference data; run through scripts/bootstrap_db.py --seed
+# (the schema itself comes from migrations)
 
-# Init DB
-Base.metadata.create_all(bind=engine)
+from app.models import ReferenceData, User
+from app.database import SessionLocal
+from app.utils.passwords import hash_password
+import uuid
 
 def seed_data():
     db = SessionLocal()
@@ -61,9 +60,13 @@ def seed_data():
             {"category": "Conditions", "name": "Cancer"},
         ]
 
+        # Names are unique; an entry listed under two categories keeps the first
+        seen = set()
         for item in data:
-            db.add(ReferenceData(**item))
-        print(f"Seeded {len(data)} reference items.")
+            if item["name"] not in seen:
+                seen.add(item["name"])
+                db.add(ReferenceData(**item))
+        print(f"Seeded {len(seen)} reference items.")
     else:
         print(f"Reference data already exists ({existing_count} items).")
     
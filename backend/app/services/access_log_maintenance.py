@@ -0,0 +1,279 @@
+# Access log partitions, rollups and retention
+
+import gzip
+import json
+import os
+import re
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.config import settings
+from app.database import engine
+from app.models import EmergencyAccess, EmergencyAccessDaily
+
+PARENT_TABLE = "emergency_access_logs"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+# Shared by every app instance, so only one runs maintenance at a time
+ADVISORY_LOCK_ID = 74_017
+
+def add_months(month: date, count: int) -> date:
+    index = month.month - 1 + count
+    return date(month.year + index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+class AccessLogMaintenance:
+    """
+    Keeps emergency_access_logs bounded.
+
+    On PostgreSQL the table is range-partitioned by month. Each run creates
+    the upcoming partitions, then takes every partition that lies wholly
+    before the retention cutoff, rolls it up into emergency_access_daily,
+    optionally archives its rows to a gzip NDJSON file, and drops it.
+    Other databases get the same treatment by whole days, with DELETE.
+
+    Rollups replace (not add to) the summary rows for the days they cover,
+    so a run interrupted before the drop can simply be repeated.
+    """
+
+    def __init__(self, retention_days: int, partitions_ahead: int, archive_dir: str, interval_seconds: int):
+        self.retention_days = retention_days
+        self.partitions_ahead = partitions_ahead
+        self.archive_dir = archive_dir
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[str] = None
+        self.last_result: Optional[dict] = None
+
+    # -------------------------------------------------------------------------
+    # Rollup and archive
+    # -------------------------------------------------------------------------
+
+    def _rollup(self, conn, start: datetime, end: datetime) -> int:
+        """Summarize [start, end) into per-patient, per-day rows; returns rows written"""
+        accessed_at = EmergencyAccess.accessed_at
+        day = func.date(accessed_at)
+        source = select(
+            EmergencyAccess.user_id,
+            day,
+            func.count(),
+            func.min(accessed_at),
+            func.max(accessed_at)
+        ).where(
+            EmergencyAccess.user_id.isnot(None),
+            accessed_at >= start,
+            accessed_at < end
+        ).group_by(EmergencyAccess.user_id, day)
+
+        dialect_insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+        statement = dialect_insert(EmergencyAccessDaily).from_select(
+            ["user_id", "day", "access_count", "first_accessed_at", "last_accessed_at"], source
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={
+                "access_count": statement.excluded.access_count,
+                "first_accessed_at": statement.excluded.first_accessed_at,
+                "last_accessed_at": statement.excluded.last_accessed_at
+            }
+        )
+        return conn.execute(statement).rowcount
+
+    def _archive(self, conn, start: datetime, end: datetime) -> Optional[str]:
+        """Write the raw rows of [start, end) to a gzip NDJSON file"""
+        if not self.archive_dir:
+            return None
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{PARENT_TABLE}_{start:%Y%m%d}_{end:%Y%m%d}.ndjson.gz")
+        tmp = f"{path}.tmp"
+
+        query = select(EmergencyAccess.__table__).where(
+            EmergencyAccess.accessed_at >= start,
+            EmergencyAccess.accessed_at < end
+        ).order_by(EmergencyAccess.accessed_at)
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            result = conn.execution_options(stream_results=True, yield_per=1000).execute(query)
+            for row in result.mappings():
+                f.write(json.dumps(dict(row), default=str) + "\n")
+        os.replace(tmp, path)
+        return path
+
+    # -------------------------------------------------------------------------
+    # PostgreSQL: monthly partitions
+    # -------------------------------------------------------------------------
+
+    def _partitions(self, conn) -> List[str]:
+        rows = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent"
+        ), {"parent": PARENT_TABLE})
+        return [name for (name,) in rows]
+
+    def _create_partition(self, conn, month: date) -> int:
+        """
+        Create the partition for a month; returns how many rows it took over.
+        PostgreSQL refuses to create a partition while the default partition
+        holds rows in its range, so those rows are moved into it in the same
+        transaction (the default is detached meanwhile; writers wait).
+        """
+        name, start, end = partition_name(month), month, add_months(month, 1)
+        bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        in_range = f"accessed_at >= '{start}' AND accessed_at < '{end}'"
+
+        stranded = conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_range}")).scalar()
+        if not stranded:
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {bounds}"))
+            conn.commit()
+            return 0
+
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} {bounds}"))
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+        conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        conn.commit()
+        return stranded
+
+    def _maintain_partitions(self, conn, today: date, cutoff: date) -> dict:
+        existing = set(self._partitions(conn))
+
+        created, moved, errors = [], {}, {}
+        for offset in range(self.partitions_ahead + 1):
+            month = add_months(today.replace(day=1), offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            try:
+                stranded = self._create_partition(conn, month)
+            except Exception as e:
+                # Leave this month in the default partition; retention still runs
+                conn.rollback()
+                errors[name] = str(e)
+                print(f"Could not create access log partition {name}: {e}")
+                continue
+            created.append(name)
+            if stranded:
+                moved[name] = stranded
+                print(f"Moved {stranded} access log rows from {DEFAULT_PARTITION} into {name}")
+
+        dropped, rolled_up, archives = [], 0, []
+        for name in sorted(existing):
+            match = PARTITION_NAME.match(name)
+            if not match:
+                continue  # the default partition
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if add_months(month, 1) > cutoff:
+                continue
+
+            start, end = _midnight(month), _midnight(add_months(month, 1))
+            rolled_up += self._rollup(conn, start, end)
+            conn.commit()
+            archive = self._archive(conn, start, end)
+            if archive:
+                archives.append(archive)
+            conn.execute(text(f"DROP TABLE {name}"))
+            conn.commit()
+            dropped.append(name)
+
+        result = {"created": created, "dropped": dropped, "rolled_up": rolled_up, "archives": archives}
+        if moved:
+            result["moved_from_default"] = moved
+        if errors:
+            result["errors"] = errors
+        return result
+
+    # -------------------------------------------------------------------------
+    # Other databases: whole days
+    # -------------------------------------------------------------------------
+
+    def _maintain_rows(self, conn, cutoff: date) -> dict:
+        end = _midnight(cutoff)
+        oldest = conn.execute(select(func.min(EmergencyAccess.accessed_at))).scalar()
+        if oldest is None or oldest >= end:
+            return {"deleted": 0, "rolled_up": 0, "archives": []}
+
+        start = _midnight(oldest.date())
+        rolled_up = self._rollup(conn, start, end)
+        conn.commit()
+        archive = self._archive(conn, start, end)
+        deleted = conn.execute(delete(EmergencyAccess).where(EmergencyAccess.accessed_at < end)).rowcount
+        conn.commit()
+        return {"deleted": deleted, "rolled_up": rolled_up, "archives": [archive] if archive else []}
+
+    # -------------------------------------------------------------------------
+    # Entry points
+    # -------------------------------------------------------------------------
+
+    def run_once(self, now: Optional[datetime] = None) -> dict:
+        """One maintenance pass; safe to run from several instances at once"""
+        now = now or datetime.utcnow()
+        cutoff = (now - timedelta(days=self.retention_days)).date()
+
+        with engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                result = self._maintain_rows(conn, cutoff)
+            elif not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID}).scalar():
+                conn.commit()
+                result = {"skipped": "maintenance already running elsewhere"}
+            else:
+                try:
+                    result = self._maintain_partitions(conn, now.date(), cutoff)
+                finally:
+                    conn.rollback()
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+                    conn.commit()
+
+        result["cutoff"] = cutoff.isoformat()
+        self.last_run = now.isoformat()
+        self.last_result = result
+        return result
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                result = self.run_once()
+                print(f"Access log maintenance: {result}")
+            except Exception as e:
+                print(f"Access log maintenance failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        """Run every interval_seconds on a background thread (no-op when the interval is 0)"""
+        if not self.interval_seconds or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="access-log-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "retention_days": self.retention_days,
+            "interval_seconds": self.interval_seconds,
+            "last_run": self.last_run,
+            "last_result": self.last_result
+        }
+
+
+access_log_maintenance = AccessLogMaintenance(
+    retention_days=settings.ACCESS_LOG_RETENTION_DAYS,
+    partitions_ahead=settings.ACCESS_LOG_PARTITIONS_AHEAD,
+    archive_dir=settings.ACCESS_LOG_ARCHIVE_DIR,
+    interval_seconds=settings.ACCESS_LOG_MAINTENANCE_INTERVAL_SECONDS
+)
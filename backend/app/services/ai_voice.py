@@ -1,21 +1,21 @@
 # Text-to-speech via API
 
-import httpx
 from app.config import settings
+from app.services.http_clients import http_clients
 
 async def text_to_speech(text: str, language: str = "en") -> bytes:
     """Convert text to speech using AI/ML API"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.aimlapi.com/tts",  # Replace with actual endpoint
-            headers={"Authorization": f"Bearer {settings.AIML_API_KEY}"},
-            json={
-                "text": text,
-                "language": language,
-                "voice": "emergency_clear"  # Hypothetical voice
-            }
-        )
-        return response.content
+    response = await http_clients.get("tts").post(
+        settings.TTS_API_URL,
+        headers={"Authorization": f"Bearer {settings.AIML_API_KEY}"},
+        json={
+            "text": text,
+            "language": language,
+            "voice": "emergency_clear"  # Hypothetical voice
+        }
+    )
+    response.raise_for_status()
+    return response.content
 
 def generate_emergency_speech(profile_data: dict, language: str = "en") -> str:
     """Generate emergency speech text"""
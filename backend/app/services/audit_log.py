@@ -0,0 +1,189 @@
+# Write-behind buffer for emergency access logging
+
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import EmergencyAccess
+from app.services.dashboard_counters import increment_statement, scan_deltas
+
+
+class AccessLogBuffer:
+    """
+    Bounded in-process queue of EmergencyAccess rows.
+    A background thread flushes them in multi-row inserts once batch_size rows
+    are waiting or flush_interval seconds have passed, so scans never wait on
+    the audit write. Rows are dropped (and counted) when the queue is full.
+    A batch the database refuses is kept at the head of the buffer and
+    retried with exponential backoff; only after max_attempts writes are its
+    rows dropped (counted as failed). The app lifespan starts the thread;
+    scripts call stop() to write out what they recorded.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, max_attempts: int = 5, retry_backoff: float = 0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the flush thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the flush thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        self._stop.set()
+        if thread:
+            thread.join(timeout)
+        # Anything enqueued after the thread exited
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+
+    # -------------------------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------------------------
+
+    def record(self, user_id: str, responder_info: str, access_type: str, hospital_id: str = None) -> bool:
+        """Queue an access row. Returns False if it had to be dropped."""
+        row = {
+            "user_id": user_id,
+            "responder_info": responder_info,
+            "access_type": access_type,
+            "hospital_id": hospital_id,
+            "accessed_at": datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+
+    # -------------------------------------------------------------------------
+    # Consumer side
+    # -------------------------------------------------------------------------
+
+    def _drain(self, limit) -> list:
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            batch = []
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            self._write(batch)
+
+        # Shutdown: write out the backlog
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+
+    def _write(self, rows: list) -> None:
+        """Flush rows, retrying with backoff; newer rows wait in the queue meanwhile"""
+        for attempt in range(1, self.max_attempts + 1):
+            if self._flush(rows):
+                return
+            if attempt == self.max_attempts:
+                break
+            with self._stats_lock:
+                self.retries += 1
+            # Cut short on stop(): the backlog is still tried max_attempts times
+            self._stop.wait(min(self.retry_backoff * 2 ** (attempt - 1), 30.0))
+        with self._stats_lock:
+            self.failed += len(rows)
+        print(f"Access log rows dropped after {self.max_attempts} failed writes: {len(rows)}")
+
+    def _flush(self, rows: list) -> bool:
+        """One insert of rows and their counter deltas; returns whether it committed"""
+        if not rows:
+            return True
+        db = SessionLocal()
+        try:
+            db.execute(insert(EmergencyAccess), rows)
+            # Dashboard counters move in the same transaction as the rows they count
+            deltas = scan_deltas(rows)
+            if deltas:
+                db.execute(increment_statement(db.get_bind().dialect.name, deltas))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Access log flush failed ({len(rows)} rows): {e}")
+            return False
+        finally:
+            db.close()
+        with self._stats_lock:
+            self.written += len(rows)
+            self.batches += 1
+        return True
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Queue depth and row counters"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+        }
+
+
+access_log_buffer = AccessLogBuffer(
+    max_queue=settings.AUDIT_LOG_QUEUE_SIZE,
+    batch_size=settings.AUDIT_LOG_BATCH_SIZE,
+    flush_interval=settings.AUDIT_LOG_FLUSH_INTERVAL_SECONDS,
+    max_attempts=settings.AUDIT_LOG_MAX_ATTEMPTS,
+    retry_backoff=settings.AUDIT_LOG_RETRY_BACKOFF_SECONDS,
+)
@@ -0,0 +1,57 @@
+# Background job state shared by every worker process
+
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+from app.models import BackgroundJob
+
+QR_BATCH = "qr_batch"
+PATIENT_IMPORT = "patient_import"
+
+# Running jobs write their progress at most this often; the final state always
+PROGRESS_SAVE_SECONDS = 1.0
+
+def record_job(job_type: str, job_id: str, progress: dict, path: Optional[str] = None) -> None:
+    """Row for a newly created job"""
+    with engine.begin() as conn:
+        conn.execute(insert(BackgroundJob).values(
+            id=job_id, job_type=job_type, progress=progress, path=path, created_at=datetime.utcnow()
+        ))
+
+def save_progress(job, force: bool = False) -> None:
+    """
+    Write a job's progress() to its row. Throttled through job.saved_at
+    unless forced; a finished job (finished_at set) is always written.
+    """
+    now = time.time()
+    if not force and not job.finished_at and now - job.saved_at < PROGRESS_SAVE_SECONDS:
+        return
+    job.saved_at = now
+    finished_at = datetime.utcfromtimestamp(job.finished_at) if job.finished_at else None
+    with engine.begin() as conn:
+        conn.execute(
+            update(BackgroundJob).where(BackgroundJob.id == job.id).values(progress=job.progress(), finished_at=finished_at)
+        )
+
+def delete_job(job_id: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(BackgroundJob).where(BackgroundJob.id == job_id))
+
+def expire_jobs(job_type: str, retention_seconds: int) -> List[Optional[str]]:
+    """Delete jobs finished longer than retention_seconds ago; returns their paths"""
+    cutoff = datetime.utcnow() - timedelta(seconds=retention_seconds)
+    expired = (BackgroundJob.job_type == job_type) & (BackgroundJob.finished_at < cutoff)
+    with engine.begin() as conn:
+        paths = conn.scalars(select(BackgroundJob.path).where(expired)).all()
+        conn.execute(delete(BackgroundJob).where(expired))
+    return paths
+
+async def load_job(db: AsyncSession, job_type: str, job_id: str) -> Optional[BackgroundJob]:
+    """A job's row, as written by whichever worker runs it"""
+    job = await db.get(BackgroundJob, job_id)
+    return job if job and job.job_type == job_type else None
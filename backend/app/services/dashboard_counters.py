@@ -0,0 +1,300 @@
+# Incrementally maintained dashboard statistics
+
+import threading
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.config import settings
+from app.database import engine
+from app.models import DashboardCounter, EmergencyAccess, EmergencyAccessDaily, MedicalProfile
+
+GLOBAL_SCOPE = "global"
+ALL_TIME = "all"
+
+TOTAL_ACCESSES = "total_accesses"
+ACTIVE_PROFILES = "active_profiles"
+
+# Shared by every app instance, so only one reconciles at a time
+ADVISORY_LOCK_ID = 74_018
+
+CounterKey = Tuple[str, str, str]  # (scope, bucket, metric)
+
+def hospital_scope(hospital_id: str) -> str:
+    return f"hospital:{hospital_id}"
+
+def day_bucket(value) -> str:
+    """Bucket for a datetime, date, or the string SQLite's date() returns"""
+    return value[:10] if isinstance(value, str) else value.strftime("%Y-%m-%d")
+
+def _dialect_insert(dialect_name: str):
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+# =============================================================================
+# WRITE PATH
+# =============================================================================
+
+def scan_deltas(rows: Iterable[dict]) -> Dict[CounterKey, int]:
+    """Counter increments for a batch of access log rows (rows without a patient are not scans)"""
+    deltas = Counter()
+    for row in rows:
+        if not row.get("user_id"):
+            continue
+        bucket = day_bucket(row["accessed_at"])
+        scopes = [GLOBAL_SCOPE]
+        if row.get("hospital_id"):
+            scopes.append(hospital_scope(row["hospital_id"]))
+        for scope in scopes:
+            deltas[(scope, ALL_TIME, TOTAL_ACCESSES)] += 1
+            deltas[(scope, bucket, TOTAL_ACCESSES)] += 1
+    return deltas
+
+def profile_deltas(count: int = 1) -> Dict[CounterKey, int]:
+    """Counter increments for newly created profiles"""
+    return {(GLOBAL_SCOPE, ALL_TIME, ACTIVE_PROFILES): count}
+
+def increment_statement(dialect_name: str, deltas: Dict[CounterKey, int]):
+    """
+    Single upsert adding each delta to its counter row.
+    Keys are sorted so concurrent writers lock rows in the same order.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"scope": scope, "bucket": bucket, "metric": metric, "value": value, "updated_at": now}
+        for (scope, bucket, metric), value in sorted(deltas.items())
+    ]
+    statement = _dialect_insert(dialect_name)(DashboardCounter).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=["scope", "bucket", "metric"],
+        set_={
+            "value": DashboardCounter.value + statement.excluded.value,
+            "updated_at": statement.excluded.updated_at
+        }
+    )
+
+def _replace_statement(dialect_name: str, rows: list):
+    """Upsert setting counter rows to the given values"""
+    statement = _dialect_insert(dialect_name)(DashboardCounter).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=["scope", "bucket", "metric"],
+        set_={"value": statement.excluded.value, "updated_at": statement.excluded.updated_at}
+    )
+
+# =============================================================================
+# READ PATH
+# =============================================================================
+
+def counters_query(keys: Iterable[CounterKey]):
+    """
+    Counter rows by primary key.
+    Spelled as OR'd equalities: SQLite answers a row-value IN with a full scan.
+    """
+    return select(DashboardCounter.scope, DashboardCounter.bucket, DashboardCounter.metric, DashboardCounter.value).where(
+        or_(*(
+            and_(DashboardCounter.scope == scope, DashboardCounter.bucket == bucket, DashboardCounter.metric == metric)
+            for scope, bucket, metric in keys
+        ))
+    )
+
+async def read_stats(db, hospital_id: Optional[str] = None, today: Optional[date] = None) -> dict:
+    """Dashboard figures from a fixed number of counter rows (primary key lookups)"""
+    scope = hospital_scope(hospital_id) if hospital_id else GLOBAL_SCOPE
+    keys = {
+        "total_accesses": (scope, ALL_TIME, TOTAL_ACCESSES),
+        "accesses_today": (scope, day_bucket(today or datetime.utcnow()), TOTAL_ACCESSES),
+        # Profiles belong to patients, not hospitals, so this one is always global
+        "active_profiles": (GLOBAL_SCOPE, ALL_TIME, ACTIVE_PROFILES),
+    }
+    result = await db.execute(counters_query(keys.values()))
+    values = {(scope, bucket, metric): value for scope, bucket, metric, value in result}
+    return {name: values.get(key, 0) for name, key in keys.items()}
+
+# =============================================================================
+# RECONCILIATION
+# =============================================================================
+
+class DashboardCounterReconciler:
+    """
+    Recomputes the counters from the source tables.
+
+    Each pass re-derives the per-day scan counts of the last `days` closed
+    days from emergency_access_logs, then sets every all-time total to the
+    sum of its day rows and the profile count to COUNT(*) of
+    medical_profiles. Today's rows are left to the live increments. A full
+    pass re-derives every day still in the raw logs, and global days
+    already removed by retention from emergency_access_daily.
+
+    Increments that commit while a pass runs can leave a total off by a
+    few; the next pass corrects them.
+    """
+
+    def __init__(self, days: int, retention_days: int, interval_seconds: int):
+        self.days = days
+        self.retention_days = retention_days
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[str] = None
+        self.last_result: Optional[dict] = None
+
+    def _all_time_values(self, conn) -> Dict[CounterKey, int]:
+        rows = conn.execute(
+            select(DashboardCounter.scope, DashboardCounter.bucket, DashboardCounter.metric, DashboardCounter.value)
+            .where(DashboardCounter.bucket == ALL_TIME)
+        )
+        return {(scope, bucket, metric): value for scope, bucket, metric, value in rows}
+
+    def _rederive_days(self, conn, today: date, full: bool) -> int:
+        """Replace day rows before today with counts from the source tables"""
+        # Days from the retention cutoff on are complete in the raw logs
+        cutoff = today - timedelta(days=self.retention_days)
+        start = None if full else max(today - timedelta(days=self.days), cutoff)
+
+        accessed_at = EmergencyAccess.accessed_at
+        day = func.date(accessed_at)
+        raw = select(day, EmergencyAccess.hospital_id, func.count()).where(
+            accessed_at < datetime.combine(today, time.min),
+            EmergencyAccess.user_id.isnot(None)  # like the rollups: patient scans only
+        ).group_by(day, EmergencyAccess.hospital_id)
+        if start:
+            raw = raw.where(accessed_at >= datetime.combine(start, time.min))
+
+        counts = Counter()
+        first_raw_day = None
+        for raw_day, hospital_id, count in conn.execute(raw):
+            bucket = day_bucket(raw_day)
+            first_raw_day = min(first_raw_day or bucket, bucket)
+            counts[(GLOBAL_SCOPE, bucket, TOTAL_ACCESSES)] += count
+            if hospital_id:
+                counts[(hospital_scope(hospital_id), bucket, TOTAL_ACCESSES)] += count
+
+        if full:
+            # Maintenance removes whole days, so any day still present is complete
+            start = min(date.fromisoformat(first_raw_day), cutoff) if first_raw_day else cutoff
+            # Earlier days survive only as per-patient rollups, without a hospital
+            rollup = select(EmergencyAccessDaily.day, func.sum(EmergencyAccessDaily.access_count)).where(
+                EmergencyAccessDaily.day < start
+            ).group_by(EmergencyAccessDaily.day)
+            for rollup_day, count in conn.execute(rollup):
+                counts[(GLOBAL_SCOPE, day_bucket(rollup_day), TOTAL_ACCESSES)] = count
+
+        window = (DashboardCounter.bucket >= day_bucket(start)) & (DashboardCounter.bucket < day_bucket(today))
+        if full:
+            # Hospital days before start have no source left, so they stay as they are
+            window = window | ((DashboardCounter.bucket < day_bucket(start)) & (DashboardCounter.scope == GLOBAL_SCOPE))
+        conn.execute(delete(DashboardCounter).where(
+            DashboardCounter.metric == TOTAL_ACCESSES,
+            DashboardCounter.bucket != ALL_TIME,
+            window
+        ))
+        if counts:
+            now = datetime.utcnow()
+            conn.execute(_replace_statement(conn.dialect.name, [
+                {"scope": scope, "bucket": bucket, "metric": metric, "value": value, "updated_at": now}
+                for (scope, bucket, metric), value in sorted(counts.items())
+            ]))
+        return len(counts)
+
+    def _rederive_totals(self, conn) -> None:
+        """All-time rows from the day rows and the profile table"""
+        sums = conn.execute(
+            select(DashboardCounter.scope, func.sum(DashboardCounter.value))
+            .where(DashboardCounter.metric == TOTAL_ACCESSES, DashboardCounter.bucket != ALL_TIME)
+            .group_by(DashboardCounter.scope)
+        ).all()
+        profiles = conn.execute(select(func.count(MedicalProfile.id))).scalar()
+
+        now = datetime.utcnow()
+        rows = [
+            {"scope": scope, "bucket": ALL_TIME, "metric": TOTAL_ACCESSES, "value": value, "updated_at": now}
+            for scope, value in sorted(sums)
+        ]
+        rows.append({"scope": GLOBAL_SCOPE, "bucket": ALL_TIME, "metric": ACTIVE_PROFILES, "value": profiles, "updated_at": now})
+        conn.execute(delete(DashboardCounter).where(
+            DashboardCounter.metric == TOTAL_ACCESSES,
+            DashboardCounter.bucket == ALL_TIME,
+            DashboardCounter.scope.notin_([scope for scope, _ in sums])
+        ))
+        conn.execute(_replace_statement(conn.dialect.name, rows))
+
+    def _reconcile(self, conn, today: date, full: bool) -> dict:
+        before = self._all_time_values(conn)
+        days = self._rederive_days(conn, today, full)
+        self._rederive_totals(conn)
+        after = self._all_time_values(conn)
+        conn.commit()
+
+        drift = {}
+        for scope, bucket, metric in sorted(set(before) | set(after)):
+            change = after.get((scope, bucket, metric), 0) - before.get((scope, bucket, metric), 0)
+            if change:
+                drift[f"{scope}/{metric}"] = change
+        return {"full": full, "day_rows": days, "corrected": drift}
+
+    # -------------------------------------------------------------------------
+    # Entry points
+    # -------------------------------------------------------------------------
+
+    def run_once(self, full: bool = False, now: Optional[datetime] = None) -> dict:
+        """One reconciliation pass; safe to run from several instances at once"""
+        now = now or datetime.utcnow()
+
+        with engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                result = self._reconcile(conn, now.date(), full)
+            elif not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID}).scalar():
+                conn.commit()
+                result = {"skipped": "reconciliation already running elsewhere"}
+            else:
+                try:
+                    result = self._reconcile(conn, now.date(), full)
+                finally:
+                    conn.rollback()
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+                    conn.commit()
+
+        self.last_run = now.isoformat()
+        self.last_result = result
+        return result
+
+    def _run(self) -> None:
+        # The first pass after startup is full, which also backfills empty counters
+        full = True
+        while not self._stop.is_set():
+            try:
+                result = self.run_once(full=full)
+                full = False
+                if result.get("corrected"):
+                    print(f"Dashboard counters corrected: {result['corrected']}")
+            except Exception as e:
+                print(f"Dashboard counter reconciliation failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        """Run every interval_seconds on a background thread (no-op when the interval is 0)"""
+        if not self.interval_seconds or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dashboard-counters", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "days": self.days,
+            "interval_seconds": self.interval_seconds,
+            "last_run": self.last_run,
+            "last_result": self.last_result
+        }
+
+
+dashboard_counter_reconciler = DashboardCounterReconciler(
+    days=settings.DASHBOARD_RECONCILE_DAYS,
+    retention_days=settings.ACCESS_LOG_RETENTION_DAYS,
+    interval_seconds=settings.DASHBOARD_RECONCILE_INTERVAL_SECONDS
+)
@@ -0,0 +1,58 @@
+# Materialized emergency view cache for QR scans
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.config import settings
+from app.schemas import EmergencyView
+from app.utils.cache import LRUCache
+from app.utils.http_cache import make_etag
+
+@dataclass(frozen=True)
+class CachedEmergencyView:
+    """Already-decrypted emergency view plus the owning user id, its ETag and the profile version it shows"""
+    user_id: str
+    etag: str
+    view: EmergencyView
+    version: Optional[datetime] = None
+
+# Keyed by username. The worker that saves a profile drops its entry right
+# away; every other worker notices the newer profile updated_at on its next
+# read (is_current) and rebuilds. The TTL only bounds memory use.
+emergency_view_cache = LRUCache(
+    max_entries=settings.EMERGENCY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.EMERGENCY_CACHE_TTL_SECONDS
+)
+
+def view_etag(user) -> str:
+    """
+    ETag for a patient's emergency view, derived from the profile version and
+    the contact rows so it can be checked before anything is decrypted.
+    """
+    profile = user.profile
+    contacts = [(c.id, c.name, c.phone, c.priority) for c in user.contacts]
+    return make_etag(user.id, profile.id, profile.updated_at.isoformat() if profile.updated_at else "", contacts)
+
+def get_cached_view(username: str):
+    """Return the cached emergency view for a username, or None"""
+    return emergency_view_cache.get(username)
+
+def is_current(entry: CachedEmergencyView, version: Optional[datetime]) -> bool:
+    """
+    Whether a cached view still shows the profile whose updated_at the
+    database reports. An older version (a lagging replica) keeps the entry.
+    """
+    if version is None or entry.version == version:
+        return True
+    return entry.version is not None and version < entry.version
+
+def cache_view(username: str, user_id: str, etag: str, view: EmergencyView, version: Optional[datetime] = None) -> CachedEmergencyView:
+    """Store a freshly built emergency view"""
+    entry = CachedEmergencyView(user_id=user_id, etag=etag, view=view, version=version)
+    emergency_view_cache.set(username, entry)
+    return entry
+
+def invalidate_view(username: str) -> None:
+    """Drop the cached view after the patient's profile or contacts change"""
+    emergency_view_cache.invalidate(username)
@@ -0,0 +1,95 @@
+# Shared outbound HTTP clients for external services
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+
+from app.config import settings
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Connection pool, timeout and retry policy for one external service"""
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    timeout: float = 10.0
+    connect_timeout: float = 5.0
+    retries: int = 2
+    http2: bool = True
+
+
+class HTTPClientManager:
+    """
+    One pooled httpx.AsyncClient per upstream, opened in the app lifespan and
+    reused by every call so connections stay warm (keep-alive, HTTP/2 when
+    available). Tests can swap in a client pointed at a local stand-in server
+    with set_client().
+    """
+
+    def __init__(self, upstreams: Dict[str, UpstreamConfig]):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build(self, config: UpstreamConfig) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry
+        )
+        http2 = config.http2 and HTTP2_AVAILABLE
+        # Transport-level retries cover connection failures, not HTTP errors
+        transport = httpx.AsyncHTTPTransport(retries=config.retries, limits=limits, http2=http2)
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            http2=http2
+        )
+
+    async def start(self) -> None:
+        """Open a client for every configured upstream"""
+        for name, config in self.upstreams.items():
+            if name not in self._clients:
+                self._clients[name] = self._build(config)
+
+    async def close(self) -> None:
+        """Close all pooled connections"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Client for an upstream, created on first use outside the lifespan"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build(self.upstreams[name])
+            self._clients[name] = client
+        return client
+
+    def set_client(self, name: str, client: Optional[httpx.AsyncClient]) -> None:
+        """Override (or with None, reset) the client used for an upstream"""
+        if client is None:
+            self._clients.pop(name, None)
+        else:
+            self._clients[name] = client
+
+
+http_clients = HTTPClientManager({
+    "tts": UpstreamConfig(
+        max_connections=settings.TTS_HTTP_MAX_CONNECTIONS,
+        timeout=settings.TTS_HTTP_TIMEOUT_SECONDS,
+        retries=settings.OUTBOUND_HTTP_RETRIES
+    ),
+    "translate": UpstreamConfig(
+        max_connections=settings.TRANSLATE_HTTP_MAX_CONNECTIONS,
+        timeout=settings.TRANSLATE_HTTP_TIMEOUT_SECONDS,
+        retries=settings.OUTBOUND_HTTP_RETRIES
+    ),
+})
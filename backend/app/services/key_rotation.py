@@ -0,0 +1,229 @@
+# Resumable re-encryption of medical profiles under the active key
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy import bindparam, or_, select, update
+
+from app.database import engine
+from app.models import MedicalProfile
+from app.utils.encryption import keyring, reseal_medical_data
+
+# Encrypted columns a row is read with; the rewrite only applies if all are unchanged
+SEALED_COLUMNS = ("medical_data", "allergies", "medications", "medical_conditions")
+
+# Rows a concurrent write changed between read and rewrite are re-read and
+# retried this many times before they count as failed
+MAX_CONFLICT_RETRIES = 3
+
+# Compare-and-swap: a profile saved after it was read keeps the newer data.
+# The content is unchanged, so updated_at (which versions the profile ETag,
+# cached emergency views and TTS audio) stays as it is
+_profiles = MedicalProfile.__table__
+RESEAL_STATEMENT = update(_profiles).where(
+    _profiles.c.id == bindparam("row_id"),
+    *(_profiles.c[column].is_not_distinct_from(bindparam(f"old_{column}")) for column in SEALED_COLUMNS)
+).values(
+    medical_data=bindparam("new_medical_data"),
+    allergies=None,
+    medications=None,
+    medical_conditions=None,
+    updated_at=_profiles.c.updated_at
+)
+
+
+class KeyRotationJob:
+    """
+    Streams MedicalProfile rows in primary-key order (a server-side cursor on
+    PostgreSQL, keyset pages elsewhere), re-encrypts each batch on a thread
+    pool and commits it as one chunk.
+    After every chunk the last processed id is checkpointed to disk, so a
+    crashed or stopped run resumes where it left off. max_rows_per_second
+    throttles the job so live emergency traffic keeps its share of the DB.
+    Each row is only rewritten if its encrypted columns still hold what was
+    read (a profile saved meanwhile is re-read and retried). Rotation does
+    not change what a profile says, so cached views stay valid.
+    """
+
+    def __init__(
+        self,
+        checkpoint_path: str = "key_rotation.checkpoint.json",
+        batch_size: int = 500,
+        workers: int = 4,
+        max_rows_per_second: Optional[float] = 2000,
+        force: bool = False
+    ):
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_rows_per_second = max_rows_per_second
+        self.force = force
+        self._stop = threading.Event()
+        self.progress = {"last_id": None, "rotated": 0, "skipped": 0, "failed": 0, "conflicts": 0, "key_id": keyring.active_key_id}
+
+    # -------------------------------------------------------------------------
+    # Checkpointing
+    # -------------------------------------------------------------------------
+
+    def load_checkpoint(self) -> None:
+        """Resume from a previous run targeting the same active key"""
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            saved = json.load(f)
+        if saved.get("key_id") == keyring.active_key_id:
+            self.progress.update(saved)
+
+    def save_checkpoint(self) -> None:
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.progress, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # -------------------------------------------------------------------------
+    # Work
+    # -------------------------------------------------------------------------
+
+    def _reseal(self, row):
+        """New envelope for a row, or None if it is already current"""
+        if row.medical_data and not self.force and not keyring.needs_rotation(row.medical_data):
+            return None
+        if not (row.medical_data or row.allergies or row.medications or row.medical_conditions):
+            return None
+        return reseal_medical_data(row.medical_data, row.allergies, row.medications, row.medical_conditions)
+
+    def _rewrite(self, rows, pool: ThreadPoolExecutor) -> list:
+        """Re-encrypt rows and write them back; returns ids changed since they were read"""
+        futures = [(row, pool.submit(self._reseal, row)) for row in rows]
+        updates = []
+        for row, future in futures:
+            try:
+                envelope = future.result()
+            except Exception as e:
+                self.progress["failed"] += 1
+                print(f"Could not re-encrypt profile {row.id}: {e}")
+                continue
+            if envelope is None:
+                self.progress["skipped"] += 1
+                continue
+            updates.append((row, {
+                "row_id": row.id,
+                "new_medical_data": envelope,
+                **{f"old_{column}": getattr(row, column) for column in SEALED_COLUMNS}
+            }))
+
+        changed = []
+        if updates:
+            # One statement per row: rowcount tells which ones lost the race
+            with engine.begin() as conn:
+                for row, params in updates:
+                    if conn.execute(RESEAL_STATEMENT, params).rowcount:
+                        self.progress["rotated"] += 1
+                    else:
+                        changed.append(row.id)
+        return changed
+
+    def _process_batch(self, rows, pool: ThreadPoolExecutor) -> None:
+        pending = rows
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            changed = self._rewrite(pending, pool)
+            if not changed:
+                break
+            self.progress["conflicts"] += len(changed)
+            if attempt == MAX_CONFLICT_RETRIES:
+                self.progress["failed"] += len(changed)
+                print(f"Profiles kept changing during key rotation, left as they are: {', '.join(changed)}")
+                break
+            with engine.connect() as conn:
+                pending = conn.execute(self._select().where(MedicalProfile.id.in_(changed))).all()
+
+        self.progress["last_id"] = rows[-1].id
+        self.save_checkpoint()
+
+    def _throttle(self, started: float, rows: int) -> None:
+        if not self.max_rows_per_second:
+            return
+        min_duration = rows / self.max_rows_per_second
+        elapsed = time.monotonic() - started
+        if elapsed < min_duration:
+            time.sleep(min_duration - elapsed)
+
+    def _select(self):
+        return select(
+            MedicalProfile.id,
+            MedicalProfile.medical_data,
+            MedicalProfile.allergies,
+            MedicalProfile.medications,
+            MedicalProfile.medical_conditions
+        )
+
+    def _query(self, after_id):
+        query = self._select().where(
+            or_(
+                MedicalProfile.medical_data.isnot(None),
+                MedicalProfile.allergies.isnot(None),
+                MedicalProfile.medications.isnot(None),
+                MedicalProfile.medical_conditions.isnot(None)
+            )
+        ).order_by(MedicalProfile.id)
+        if after_id is not None:
+            query = query.where(MedicalProfile.id > after_id)
+        return query
+
+    def _batches(self):
+        """Yield lists of rows after the checkpoint, in primary-key order"""
+        if engine.dialect.name == "postgresql":
+            # Separate read connection: the server-side cursor stays open
+            # while each chunk is committed on its own session
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=self.batch_size).execute(
+                    self._query(self.progress["last_id"])
+                )
+                yield from result.partitions(self.batch_size)
+            return
+
+        # Databases that cannot write while a cursor is open (SQLite):
+        # page by primary key instead
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(self._query(self.progress["last_id"]).limit(self.batch_size)).all()
+            if not rows:
+                return
+            yield rows
+
+    def run(self) -> dict:
+        """Rotate every profile not yet sealed with the active key"""
+        self.load_checkpoint()
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            for rows in self._batches():
+                started = time.monotonic()
+                self._process_batch(rows, pool)
+                print(
+                    f"Key rotation: {self.progress['rotated']} rotated, "
+                    f"{self.progress['skipped']} current, {self.progress['failed']} failed, "
+                    f"{self.progress['conflicts']} retried after concurrent edits "
+                    f"(last id {self.progress['last_id']})"
+                )
+                if self._stop.is_set():
+                    break
+                self._throttle(started, len(rows))
+
+        return dict(self.progress)
+
+    # -------------------------------------------------------------------------
+    # Background execution
+    # -------------------------------------------------------------------------
+
+    def start_background(self) -> threading.Thread:
+        """Run the job on a daemon thread; stop() ends it after the current chunk"""
+        thread = threading.Thread(target=self.run, name="key-rotation", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
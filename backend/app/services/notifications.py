@@ -1,41 +1,74 @@
 # SMS/Email alerts
 
-from twilio.rest import Client
+import asyncio
+from abc import ABC, abstractmethod
 from app.config import settings
-import httpx
+from app.utils.cache import LRUCache
 
-# Initialize Twilio client only if credentials are provided
-twilio_client = None
-if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
+def twilio_client():
+    """
+    Twilio client when credentials are provided, else None.
+    The SDK is slow to import, so it is loaded only when configured.
+    """
+    if not (settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN):
+        return None
     try:
-        twilio_client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        from twilio.rest import Client
+        return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
     except Exception as e:
         print(f"Failed to initialize Twilio client: {e}")
-        twilio_client = None
+        return None
 
-async def send_emergency_sms(phone: str, message: str):
-    """Send SMS to emergency contact"""
-    if not twilio_client:
-        print(f"SMS would be sent to {phone}: {message}")
-        return "mock_sid_demo_mode"
-    
-    try:
-        message = twilio_client.messages.create(
+# =============================================================================
+# SMS GATEWAYS
+# =============================================================================
+
+class SMSGateway(ABC):
+    """Provider interface. send() returns a message id or raises on failure."""
+    name = "base"
+
+    @abstractmethod
+    async def send(self, phone: str, message: str) -> str:
+        ...
+
+class TwilioGateway(SMSGateway):
+    """Twilio REST API; the blocking client runs in a worker thread"""
+    name = "twilio"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def send(self, phone: str, message: str) -> str:
+        result = await asyncio.to_thread(
+            self.client.messages.create,
             body=message,
             from_=settings.TWILIO_PHONE_NUMBER,
             to=phone
         )
-        return message.sid
-    except Exception as e:
-        print(f"SMS failed: {e}")
-        return None
+        return result.sid
+
+class ConsoleGateway(SMSGateway):
+    """Demo mode: print instead of sending"""
+    name = "console"
+
+    async def send(self, phone: str, message: str) -> str:
+        print(f"SMS would be sent to {phone}: {message}")
+        return "mock_sid_demo_mode"
 
-async def notify_emergency_contacts(contacts: list, patient_name: str, location: dict = None):
-    """Notify all emergency contacts"""
+def default_gateway() -> SMSGateway:
+    """Twilio when configured, console output otherwise"""
+    client = twilio_client()
+    return TwilioGateway(client) if client else ConsoleGateway()
+
+# =============================================================================
+# MESSAGES
+# =============================================================================
+
+def build_alert_message(contact: dict, patient_name: str, location: dict = None) -> str:
+    """Alert text for a single emergency contact"""
     location_str = f"Location: {location.get('lat')}, {location.get('lng')}" if location else "Location: Unknown"
-    
-    for contact in contacts:
-        message = f"""
+
+    return f"""
 🚨 EMERGENCY ALERT 🚨
 
 {patient_name} has activated their emergency profile.
@@ -46,6 +79,166 @@ First responders have been notified.
 You are listed as emergency contact #{contact['priority']}.
 
 Reply CONFIRM when you receive this message.
-        """.strip()
-        
-        await send_emergency_sms(contact['phone'], message)
\ No newline at end of file
+    """.strip()
+
+async def send_emergency_sms(phone: str, message: str, gateway: SMSGateway = None):
+    """Send SMS to emergency contact"""
+    try:
+        return await (gateway or default_gateway()).send(phone, message)
+    except Exception as e:
+        print(f"SMS failed: {e}")
+        return None
+
+async def notify_emergency_contacts(contacts: list, patient_name: str, location: dict = None, gateway: SMSGateway = None):
+    """Notify all emergency contacts concurrently"""
+    gateway = gateway or default_gateway()
+    return await asyncio.gather(*[
+        send_emergency_sms(contact['phone'], build_alert_message(contact, patient_name, location), gateway)
+        for contact in contacts
+    ])
+
+# =============================================================================
+# BACKGROUND DISPATCHER
+# =============================================================================
+
+class NotificationDispatcher:
+    """
+    Queue of alert rounds processed by a pool of asyncio workers.
+    Each round fans out to every contact at once, bounded by a per-provider
+    concurrency limit, and retries failed sends with exponential backoff.
+    Repeat submissions for the same patient within the dedupe window are
+    dropped so a burst of scans sends one round.
+    """
+
+    def __init__(
+        self,
+        gateway: SMSGateway = None,
+        workers: int = 4,
+        provider_concurrency: int = 10,
+        max_attempts: int = 3,
+        retry_base_seconds: float = 0.5,
+        dedupe_window_seconds: float = 300,
+        max_queue: int = 1000
+    ):
+        self.gateway = gateway
+        self.workers = workers
+        self.provider_concurrency = provider_concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.max_queue = max_queue
+        self._recent = LRUCache(max_entries=100000, ttl_seconds=dedupe_window_seconds)
+        self._queue = None
+        self._tasks = []
+        self._limits = {}
+        self.stats_counters = {"submitted": 0, "deduplicated": 0, "dropped": 0, "sent": 0, "failed": 0, "retries": 0}
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the worker pool on the running event loop (idempotent)"""
+        if self._tasks:
+            return
+        if self.gateway is None:
+            self.gateway = default_gateway()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Let queued rounds finish, then cancel the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Notification dispatcher stopped with {self._queue.qsize()} rounds pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -------------------------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------------------------
+
+    def submit(self, patient_id: str, contacts: list, patient_name: str, location: dict = None) -> bool:
+        """
+        Queue an alert round without waiting for it.
+        Returns False if it was deduplicated or the queue is full.
+        """
+        self.start()
+        if self._recent.get(patient_id) is not None:
+            self.stats_counters["deduplicated"] += 1
+            return False
+        if not contacts:
+            return False
+
+        try:
+            self._queue.put_nowait((list(contacts), patient_name, location))
+        except asyncio.QueueFull:
+            self.stats_counters["dropped"] += 1
+            return False
+
+        self._recent.set(patient_id, True)
+        self.stats_counters["submitted"] += 1
+        return True
+
+    # -------------------------------------------------------------------------
+    # Consumer side
+    # -------------------------------------------------------------------------
+
+    def _limit(self, gateway: SMSGateway) -> asyncio.Semaphore:
+        if gateway.name not in self._limits:
+            self._limits[gateway.name] = asyncio.Semaphore(self.provider_concurrency)
+        return self._limits[gateway.name]
+
+    async def _worker(self) -> None:
+        while True:
+            contacts, patient_name, location = await self._queue.get()
+            try:
+                await asyncio.gather(*[
+                    self._deliver(contact, patient_name, location) for contact in contacts
+                ])
+            except Exception as e:
+                print(f"Notification round failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, contact: dict, patient_name: str, location: dict) -> None:
+        message = build_alert_message(contact, patient_name, location)
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with self._limit(self.gateway):
+                    await self.gateway.send(contact['phone'], message)
+                self.stats_counters["sent"] += 1
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.stats_counters["failed"] += 1
+                    print(f"SMS to {contact['phone']} failed after {attempt} attempts: {e}")
+                    return
+                self.stats_counters["retries"] += 1
+                await asyncio.sleep(self.retry_base_seconds * (2 ** (attempt - 1)))
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Queue depth and delivery counters"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "workers": len(self._tasks),
+            **self.stats_counters
+        }
+
+
+notification_dispatcher = NotificationDispatcher(
+    workers=settings.NOTIFY_WORKERS,
+    provider_concurrency=settings.NOTIFY_PROVIDER_CONCURRENCY,
+    max_attempts=settings.NOTIFY_MAX_ATTEMPTS,
+    retry_base_seconds=settings.NOTIFY_RETRY_BASE_SECONDS,
+    dedupe_window_seconds=settings.NOTIFY_DEDUPE_WINDOW_SECONDS,
+    max_queue=settings.NOTIFY_QUEUE_SIZE
+)
@@ -0,0 +1,189 @@
+# Streaming gzip NDJSON export of patients
+
+import json
+import os
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+
+from app.database import engine
+from app.models import EmergencyContact, MedicalProfile, User
+from app.services.audit_log import access_log_buffer
+from app.utils.encryption import open_medical_data
+
+# gzip container (RFC 1952) around a deflate stream
+GZIP_WBITS = 31
+
+# Access log type of the audit row each export leaves (no patient id: not a scan)
+EXPORT_ACCESS_TYPE = "patient_export"
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def _open_row(row) -> dict:
+    """Runs on the worker pool"""
+    return open_medical_data(row.medical_data, row.allergies, row.medications, row.medical_conditions)
+
+
+class PatientExporter:
+    """
+    Streams every patient (account, profile, contacts) as one JSON object
+    per line, gzip-compressed as it goes.
+
+    Profiles are read in primary-key order from a server-side cursor
+    (PostgreSQL) chunk_size rows at a time; each chunk's contacts come from
+    one IN query on a second connection, and its profiles are decrypted on
+    a thread pool. Only one chunk is in memory at once, whatever the table
+    size. Records use the bulk import layout, so an export can be loaded
+    back with the patient import. Rows that cannot be decrypted are left
+    out and counted. Every export, finished or not, leaves an audit row
+    in the access log naming who ran it and what it covered.
+    """
+
+    def __init__(self, chunk_size: int, workers: int, compression_level: int):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.compression_level = compression_level
+        self.last_run: Optional[dict] = None
+
+    def _profiles_query(self, updated_since: Optional[datetime]):
+        query = select(
+            MedicalProfile.id,
+            MedicalProfile.user_id,
+            User.username,
+            User.email,
+            User.created_at,
+            MedicalProfile.full_name,
+            MedicalProfile.date_of_birth,
+            MedicalProfile.blood_type,
+            MedicalProfile.medical_data,
+            MedicalProfile.allergies,
+            MedicalProfile.medications,
+            MedicalProfile.medical_conditions,
+            MedicalProfile.dnr_status,
+            MedicalProfile.organ_donor,
+            MedicalProfile.special_instructions,
+            MedicalProfile.languages,
+            MedicalProfile.updated_at
+        ).join(User, User.id == MedicalProfile.user_id).order_by(MedicalProfile.id)
+        if updated_since:
+            query = query.where(MedicalProfile.updated_at >= updated_since)
+        return query
+
+    def _contacts(self, conn, user_ids: List[str]) -> dict:
+        rows = conn.execute(
+            select(
+                EmergencyContact.user_id,
+                EmergencyContact.name,
+                EmergencyContact.relation,
+                EmergencyContact.phone,
+                EmergencyContact.email,
+                EmergencyContact.priority
+            ).where(EmergencyContact.user_id.in_(user_ids)).order_by(EmergencyContact.user_id, EmergencyContact.priority)
+        )
+        contacts = defaultdict(list)
+        for row in rows:
+            contacts[row.user_id].append({
+                "name": row.name,
+                "relation": row.relation,
+                "phone": row.phone,
+                "email": row.email,
+                "priority": row.priority
+            })
+        return contacts
+
+    def _record(self, row, medical: dict, contacts: list) -> dict:
+        return {
+            "user_id": row.user_id,
+            "username": row.username,
+            "email": row.email,
+            "created_at": row.created_at,
+            "profile": {
+                "full_name": row.full_name,
+                "date_of_birth": row.date_of_birth,
+                "blood_type": row.blood_type,
+                **medical,
+                "dnr_status": row.dnr_status,
+                "organ_donor": row.organ_donor,
+                "special_instructions": row.special_instructions,
+                "languages": row.languages or ["English"],
+                "updated_at": row.updated_at
+            },
+            "contacts": contacts
+        }
+
+    def _audit(self, actor: str, stats: dict, updated_since: Optional[datetime]) -> None:
+        scope = f"profiles updated since {updated_since.isoformat()}" if updated_since else "all profiles"
+        access_log_buffer.record(
+            None,
+            f"{actor}: {stats['status']}, {stats['rows']} patients ({scope}), {stats['failed']} unreadable",
+            EXPORT_ACCESS_TYPE
+        )
+
+    def stream(self, actor: str, updated_since: Optional[datetime] = None) -> Iterator[bytes]:
+        """gzip-compressed NDJSON, one compressed block per chunk of patients; actor goes in the audit row"""
+        started = time.monotonic()
+        stats = {"started_at": datetime.utcnow().isoformat(), "rows": 0, "failed": 0, "bytes": 0, "status": "running"}
+        self.last_run = stats
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, GZIP_WBITS)
+
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="patient-export") as pool, \
+                    engine.connect() as read_conn, engine.connect() as lookup_conn:
+                result = read_conn.execution_options(stream_results=True, yield_per=self.chunk_size).execute(
+                    self._profiles_query(updated_since)
+                )
+                for rows in result.partitions(self.chunk_size):
+                    contacts = self._contacts(lookup_conn, [row.user_id for row in rows])
+                    futures = [(row, pool.submit(_open_row, row)) for row in rows]
+
+                    lines = []
+                    for row, future in futures:
+                        try:
+                            medical = future.result()
+                        except Exception as e:
+                            stats["failed"] += 1
+                            print(f"Export skipped profile {row.id}: {e}")
+                            continue
+                        lines.append(json.dumps(self._record(row, medical, contacts.get(row.user_id, [])), default=_json_default))
+                    stats["rows"] += len(lines)
+
+                    block = compressor.compress(("\n".join(lines) + "\n").encode()) if lines else b""
+                    if block:
+                        stats["bytes"] += len(block)
+                        yield block
+                    lookup_conn.rollback()  # don't hold a snapshot across chunks
+
+            tail = compressor.flush()
+            stats["bytes"] += len(tail)
+            stats["status"] = "completed"
+            yield tail
+        except GeneratorExit:
+            stats["status"] = "cancelled"
+            raise
+        except Exception:
+            stats["status"] = "failed"
+            raise
+        finally:
+            stats["seconds"] = round(time.monotonic() - started, 3)
+            stats["rows_per_second"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else None
+            self._audit(actor, stats, updated_since)
+            print(f"Patient export {stats['status']}: {stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_second']} rows/s)")
+
+    def export_to_file(self, path: str, actor: str, updated_since: Optional[datetime] = None) -> dict:
+        """Write an export to path, replacing it only once complete"""
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                for block in self.stream(f"{actor} -> {path}", updated_since):
+                    f.write(block)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return dict(self.last_run)
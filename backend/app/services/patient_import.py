@@ -0,0 +1,424 @@
+# Bulk patient import from CSV or NDJSON
+
+import csv
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database import engine
+from app.models import EmergencyContact, MedicalProfile, User
+from app.schemas import PatientImportRecord
+from app.services.background_jobs import PATIENT_IMPORT, delete_job, expire_jobs, record_job, save_progress
+from app.services.dashboard_counters import increment_statement, profile_deltas
+from app.services.reference_index import USAGE_STATEMENT, profile_terms
+from app.utils.encryption import encrypt_medical_data
+from app.utils.passwords import hash_password_pooled
+
+IMPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# CSV layout: one patient per row. List columns hold ";"-separated items;
+# contacts are contact1_name ... contact3_priority (priority defaults to n)
+CSV_LIST_SEPARATOR = ";"
+CSV_MAX_CONTACTS = 3
+CSV_CONTACT_FIELDS = ("name", "relation", "phone", "email", "priority")
+
+# Not a hash any scheme recognises, so logins fail until a reset
+UNUSABLE_PASSWORD = "!"
+
+# Errors caused by a row's data (duplicates, values the column rejects); they
+# send the batch row by row so only the offending rows fail. COPY goes
+# through the raw driver cursor, so its errors arrive unwrapped
+ROW_ERRORS = (
+    IntegrityError,
+    DataError,
+    engine.dialect.loaded_dbapi.IntegrityError,
+    engine.dialect.loaded_dbapi.DataError
+)
+
+# (line number, parsed record, parse error)
+RawRecord = Tuple[int, Optional[dict], Optional[str]]
+
+# =============================================================================
+# READERS
+# =============================================================================
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[RawRecord]:
+    """One JSON object per line; blank lines are skipped"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+
+def _csv_items(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(CSV_LIST_SEPARATOR) if item.strip()]
+
+def _csv_flag(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "y")
+
+def _csv_record(row: Dict[str, str]) -> dict:
+    """Nested import record from a flat CSV row"""
+    def text(name):
+        return (row.get(name) or "").strip() or None
+
+    profile = {
+        "full_name": text("full_name"),
+        "date_of_birth": text("date_of_birth"),
+        "blood_type": text("blood_type"),
+        "allergies": _csv_items(row.get("allergies")),
+        "medications": _csv_items(row.get("medications")),
+        "medical_conditions": _csv_items(row.get("medical_conditions")),
+        "dnr_status": _csv_flag(row.get("dnr_status")),
+        "organ_donor": _csv_flag(row.get("organ_donor")),
+        "special_instructions": text("special_instructions"),
+    }
+    if _csv_items(row.get("languages")):
+        profile["languages"] = _csv_items(row.get("languages"))
+
+    contacts = []
+    for n in range(1, CSV_MAX_CONTACTS + 1):
+        contact = {field: text(f"contact{n}_{field}") for field in CSV_CONTACT_FIELDS}
+        if any(contact.values()):
+            contact["priority"] = contact["priority"] or n
+            contacts.append(contact)
+
+    return {
+        "username": text("username"),
+        "email": text("email"),
+        "password": text("password"),
+        "profile": profile,
+        "contacts": contacts,
+    }
+
+def read_csv(lines: Iterable[str]) -> Iterator[RawRecord]:
+    """Header row, then one patient per row"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        if None in row:
+            yield reader.line_num, None, "More fields than the header"
+            continue
+        yield reader.line_num, _csv_record(row), None
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+def _row_error_message(error: Exception) -> str:
+    """Reason a row was refused by the database, without the statement or its values"""
+    detail = str(getattr(error, "orig", None) or error).strip().splitlines()[0]
+    if "unique" in detail.lower() or "duplicate" in detail.lower():
+        return "Username or email already registered"
+    return f"Rejected by the database: {detail}"
+
+# =============================================================================
+# ROW PREPARATION (worker threads)
+# =============================================================================
+
+def _prepare_rows(record: PatientImportRecord) -> dict:
+    """Password hash (on the shared hashing pool) and profile envelope for one patient, plus its row dicts"""
+    now = datetime.utcnow()
+    user_id = str(uuid.uuid4())
+    profile = record.profile
+    return {
+        "user": {
+            "id": user_id,
+            "username": record.username,
+            "email": record.email,
+            "hashed_password": hash_password_pooled(record.password) if record.password else UNUSABLE_PASSWORD,
+            "user_type": "patient",
+            "created_at": now,
+        },
+        # The QR image is rendered on first use (profile update, /api/qr) or by a QR batch
+        "profile": {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "full_name": profile.full_name,
+            "date_of_birth": profile.date_of_birth,
+            "blood_type": profile.blood_type,
+            "medical_data": encrypt_medical_data(profile.allergies, profile.medications, profile.medical_conditions),
+            "dnr_status": profile.dnr_status,
+            "organ_donor": profile.organ_donor,
+            "special_instructions": profile.special_instructions,
+            "languages": profile.languages,
+            "emergency_url": f"https://crisislink.cv/emergency/{record.username}",
+            "updated_at": now,
+        },
+        "contacts": [
+            {"id": str(uuid.uuid4()), "user_id": user_id, **contact.model_dump()}
+            for contact in record.contacts
+        ],
+        # Reference terms the profile lists (search popularity)
+        "terms": profile_terms(profile.allergies, profile.medications, profile.medical_conditions),
+    }
+
+# =============================================================================
+# WRITERS
+# =============================================================================
+
+def _copy_value(value) -> str:
+    """A value in COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value)
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+def _copy_rows(conn, table, rows: List[dict]) -> None:
+    """COPY FROM STDIN through the psycopg2 connection behind conn"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(row[column]) for column in columns) + "\n")
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+def _write_rows(conn, users: List[dict], profiles: List[dict], contacts: List[dict], terms: Counter) -> None:
+    """Insert one batch; COPY on PostgreSQL (psycopg2), multi-row INSERTs elsewhere"""
+    for model, rows in ((User, users), (MedicalProfile, profiles), (EmergencyContact, contacts)):
+        if not rows:
+            continue
+        if conn.dialect.driver == "psycopg2":
+            _copy_rows(conn, model.__table__, rows)
+        else:
+            conn.execute(insert(model), rows)
+    conn.execute(increment_statement(conn.dialect.name, profile_deltas(len(profiles))))
+    if terms:
+        conn.execute(USAGE_STATEMENT, [{"term": term, "delta": count} for term, count in sorted(terms.items())])
+
+# =============================================================================
+# JOBS
+# =============================================================================
+
+class PatientImportJob:
+    """One import and its progress"""
+
+    def __init__(self, import_format: str, path: str, owns_file: bool):
+        self.id = str(uuid.uuid4())
+        self.format = import_format
+        self.path = path
+        self.owns_file = owns_file  # uploads are deleted once imported
+        self.status = "queued"
+        self.read = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.saved_at = 0.0
+
+    def progress(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "read": self.read,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "error": self.error
+        }
+
+class PatientImportRunner:
+    """
+    Streams records from a CSV or NDJSON source and imports them
+    batch_size at a time, so memory does not grow with the input.
+    For each batch: validate against PatientImportRecord, drop usernames
+    and emails already taken, hash passwords and encrypt profiles on a
+    thread pool, then write users, profiles and contacts in one
+    transaction. A row that fails is reported with its line number and
+    the rest of the batch still goes in.
+    Job state lives in background_jobs, so a status poll can reach any
+    worker; the upload stays on the worker that received it and runs it.
+    """
+
+    def __init__(self, batch_size: int, workers: int, max_reported_errors: int, upload_dir: str, retention_seconds: int):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_reported_errors = max_reported_errors
+        self.upload_dir = upload_dir
+        self.retention_seconds = retention_seconds
+
+    def create_job(self, import_format: str, path: str = None) -> PatientImportJob:
+        """Register a job; without a path it gets an upload file in upload_dir"""
+        owns_file = path is None
+        if owns_file:
+            os.makedirs(self.upload_dir, exist_ok=True)
+            path = os.path.join(self.upload_dir, f"{uuid.uuid4()}.{import_format}")
+        job = PatientImportJob(import_format, path, owns_file)
+        expire_jobs(PATIENT_IMPORT, self.retention_seconds)
+        record_job(PATIENT_IMPORT, job.id, job.progress())
+        return job
+
+    def discard(self, job: PatientImportJob) -> None:
+        delete_job(job.id)
+        self._remove_upload(job)
+
+    def start(self, job: PatientImportJob) -> None:
+        """Run a job on a background thread"""
+        threading.Thread(target=self.run, args=(job,), name=f"patient-import-{job.id[:8]}", daemon=True).start()
+
+    def _remove_upload(self, job: PatientImportJob) -> None:
+        if job.owns_file and os.path.exists(job.path):
+            os.remove(job.path)
+
+    def _reject(self, job: PatientImportJob, line: int, message: str, username: str = None) -> None:
+        job.failed += 1
+        if len(job.errors) < self.max_reported_errors:
+            job.errors.append({"line": line, "username": username, "error": message})
+
+    # -------------------------------------------------------------------------
+    # Batches
+    # -------------------------------------------------------------------------
+
+    def _validate(self, job: PatientImportJob, batch: List[Tuple[int, dict]]) -> List[Tuple[int, PatientImportRecord]]:
+        """Schema-valid records whose username and email are free"""
+        valid = []
+        for line, data in batch:
+            try:
+                valid.append((line, PatientImportRecord.model_validate(data)))
+            except ValidationError as e:
+                self._reject(job, line, _validation_message(e), (data or {}).get("username"))
+        if not valid:
+            return []
+
+        with engine.connect() as conn:
+            taken = conn.execute(
+                select(User.username, User.email).where(or_(
+                    User.username.in_([record.username for _, record in valid]),
+                    User.email.in_([record.email for _, record in valid])
+                ))
+            ).all()
+        usernames = {username for username, _ in taken}
+        emails = {email for _, email in taken}
+
+        free = []
+        for line, record in valid:
+            if record.username in usernames:
+                self._reject(job, line, "Username already registered", record.username)
+            elif record.email in emails:
+                self._reject(job, line, "Email already registered", record.username)
+            else:
+                # Later rows of the same batch see this one as taken
+                usernames.add(record.username)
+                emails.add(record.email)
+                free.append((line, record))
+        return free
+
+    def _write(self, job: PatientImportJob, prepared: List[Tuple[int, str, dict]]) -> None:
+        """
+        One transaction for the batch. If the database refuses any row (a
+        concurrent signup took a username, a value does not fit its column),
+        the batch is retried row by row and each refused row is reported.
+        """
+        try:
+            with engine.begin() as conn:
+                _write_rows(
+                    conn,
+                    [rows["user"] for _, _, rows in prepared],
+                    [rows["profile"] for _, _, rows in prepared],
+                    [contact for _, _, rows in prepared for contact in rows["contacts"]],
+                    Counter(term for _, _, rows in prepared for term in rows["terms"])
+                )
+            job.imported += len(prepared)
+            return
+        except ROW_ERRORS:
+            pass
+
+        for line, username, rows in prepared:
+            try:
+                with engine.begin() as conn:
+                    _write_rows(conn, [rows["user"]], [rows["profile"]], rows["contacts"], Counter(rows["terms"]))
+                job.imported += 1
+            except ROW_ERRORS as e:
+                self._reject(job, line, _row_error_message(e), username)
+
+    def _import_batch(self, job: PatientImportJob, batch: List[Tuple[int, dict]], pool: ThreadPoolExecutor) -> None:
+        records = self._validate(job, batch)
+        futures = [(line, record.username, pool.submit(_prepare_rows, record)) for line, record in records]
+        prepared = []
+        for line, username, future in futures:
+            try:
+                prepared.append((line, username, future.result()))
+            except Exception as e:
+                self._reject(job, line, f"Could not prepare row: {e}", username)
+        if prepared:
+            self._write(job, prepared)
+        save_progress(job)
+
+    # -------------------------------------------------------------------------
+    # Entry point
+    # -------------------------------------------------------------------------
+
+    def run(self, job: PatientImportJob, lines: Iterable[str] = None) -> PatientImportJob:
+        """Import every record of a job; lines defaults to the job's file"""
+        job.status = "running"
+        save_progress(job, force=True)
+        source = None
+        try:
+            if lines is None:
+                source = open(job.path, encoding="utf-8-sig", newline="")
+                lines = source
+
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="patient-import") as pool:
+                batch = []
+                for line, data, error in READERS[job.format](lines):
+                    job.read += 1
+                    if error:
+                        self._reject(job, line, error)
+                        continue
+                    batch.append((line, data))
+                    if len(batch) >= self.batch_size:
+                        self._import_batch(job, batch, pool)
+                        batch = []
+                if batch:
+                    self._import_batch(job, batch, pool)
+
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"Patient import {job.id} failed: {e}")
+        finally:
+            if source:
+                source.close()
+            # Uploads hold PHI; keep them no longer than the import
+            self._remove_upload(job)
+            job.finished_at = time.time()
+            save_progress(job)
+        return job
+
+
+patient_import_runner = PatientImportRunner(
+    batch_size=settings.PATIENT_IMPORT_BATCH_SIZE,
+    workers=settings.PATIENT_IMPORT_WORKERS,
+    max_reported_errors=settings.PATIENT_IMPORT_MAX_REPORTED_ERRORS,
+    upload_dir=settings.PATIENT_IMPORT_UPLOAD_DIR,
+    retention_seconds=settings.PATIENT_IMPORT_RETENTION_SECONDS
+)
@@ -0,0 +1,87 @@
+# Content-addressed QR code images
+
+import asyncio
+import hashlib
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import QRAsset
+from app.utils.cache import LRUCache
+from app.utils.qr_generator import QR_MEDIA_TYPES, QR_RENDER_VERSION, emergency_url_for, render_qr
+
+ASSET_PATH_PREFIX = "/api/qr/assets/"
+DEV_PUBLIC_URL = "http://localhost:8000"
+
+# Asset bytes never change for a given id, so no TTL is needed
+qr_asset_cache = LRUCache(max_entries=settings.QR_ASSET_CACHE_MAX_ENTRIES)
+
+def asset_id_for(data: str, fmt: str) -> str:
+    """Address of the image encoding data: a hash of everything that determines its bytes"""
+    return hashlib.sha256(f"{QR_RENDER_VERSION}|{fmt}|{data}".encode()).hexdigest()
+
+def asset_path(asset_id: str, fmt: str) -> str:
+    """Reference stored on the profile row"""
+    return f"{ASSET_PATH_PREFIX}{asset_id}.{fmt}"
+
+def load_public_url(api_public_url: str, environment: str) -> str:
+    """Base URL for asset links; unset is only allowed (with a warning) in development"""
+    if api_public_url:
+        return api_public_url.rstrip("/")
+    if environment != "development":
+        raise RuntimeError(f"API_PUBLIC_URL is not set (ENVIRONMENT={environment}); QR links would point at {DEV_PUBLIC_URL}")
+    print(f"WARNING: API_PUBLIC_URL is not set; QR links point at {DEV_PUBLIC_URL}. Development only.")
+    return DEV_PUBLIC_URL
+
+public_base_url = load_public_url(settings.API_PUBLIC_URL, settings.ENVIRONMENT)
+
+def public_qr_url(reference: Optional[str]) -> Optional[str]:
+    """Absolute URL for a stored reference; legacy data URIs pass through"""
+    if reference and reference.startswith(ASSET_PATH_PREFIX):
+        return f"{public_base_url}{reference}"
+    return reference
+
+async def ensure_qr_asset(db: AsyncSession, data: str, fmt: str = "png") -> str:
+    """Render and store the QR image for data unless it already exists; returns its id"""
+    asset_id = asset_id_for(data, fmt)
+    if qr_asset_cache.get(asset_id) is not None:
+        return asset_id
+    if await db.scalar(select(QRAsset.id).where(QRAsset.id == asset_id)):
+        return asset_id
+
+    # Rendering is CPU-bound; keep it off the event loop
+    content = await asyncio.to_thread(render_qr, data, fmt)
+    try:
+        db.add(QRAsset(id=asset_id, media_type=QR_MEDIA_TYPES[fmt], content=content))
+        await db.commit()
+    except IntegrityError:
+        # Another request rendered the same image first
+        await db.rollback()
+    qr_asset_cache.set(asset_id, (QR_MEDIA_TYPES[fmt], content))
+    return asset_id
+
+async def ensure_emergency_qr(db: AsyncSession, username: str, fmt: str = "png") -> str:
+    """Stored reference for a patient's emergency QR code"""
+    return asset_path(await ensure_qr_asset(db, emergency_url_for(username), fmt), fmt)
+
+async def find_emergency_qr(db: AsyncSession, username: str, fmt: str = "png") -> Optional[str]:
+    """Stored reference for a patient's emergency QR code if it has been rendered, else None (never renders)"""
+    asset_id = asset_id_for(emergency_url_for(username), fmt)
+    if qr_asset_cache.get(asset_id) is None and not await db.scalar(select(QRAsset.id).where(QRAsset.id == asset_id)):
+        return None
+    return asset_path(asset_id, fmt)
+
+async def load_qr_asset(db: AsyncSession, asset_id: str) -> Optional[Tuple[str, bytes]]:
+    """(media type, bytes) for an asset id, or None"""
+    cached = qr_asset_cache.get(asset_id)
+    if cached is not None:
+        return cached
+    asset = await db.get(QRAsset, asset_id)
+    if not asset:
+        return None
+    entry = (asset.media_type, asset.content)
+    qr_asset_cache.set(asset_id, entry)
+    return entry
@@ -0,0 +1,261 @@
+# Bulk QR code and wallet card generation
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import MedicalProfile, User
+from app.services.background_jobs import QR_BATCH, expire_jobs, record_job, save_progress
+from app.utils.qr_generator import emergency_url_for, render_qr, render_wallet_card
+
+KINDS = ("qr", "card")
+OUTPUT_FORMATS = {"zip": "application/zip", "pdf": "application/pdf"}
+
+def _render_item(username: str, full_name: str, kind: str):
+    """Runs in a worker process; must stay a picklable top-level function"""
+    if kind == "card":
+        return username, render_wallet_card(username, full_name)
+    return username, render_qr(emergency_url_for(username))
+
+# =============================================================================
+# OUTPUT WRITERS
+# =============================================================================
+
+class _ZipWriter:
+    """PNGs are already compressed, so entries are stored as-is"""
+
+    def __init__(self, path: str):
+        self.archive = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+
+    def add(self, username: str, png: bytes) -> None:
+        self.archive.writestr(f"{username}.png", png)
+
+    def close(self) -> None:
+        self.archive.close()
+
+class _PdfWriter:
+    """
+    Streaming PDF: each image becomes a page (lossless, Flate-compressed) the
+    moment it arrives; the page tree and cross-reference table are written at
+    close. Unlike re-saving with append=True, no earlier page is ever read
+    back, so cost per page stays constant and memory stays flat.
+    """
+    RESOLUTION = 300  # dpi the images are rendered for
+    CATALOG_ID, PAGES_ID = 1, 2
+
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = 3
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, body: bytes, stream: bytes = None, number: int = None) -> int:
+        if number is None:
+            number, self.next_id = self.next_id, self.next_id + 1
+        self.offsets[number] = self.file.tell()
+        self.file.write(b"%d 0 obj\n%s\n" % (number, body))
+        if stream is not None:
+            self.file.write(b"stream\n%s\nendstream\n" % stream)
+        self.file.write(b"endobj\n")
+        return number
+
+    def add(self, username: str, png: bytes) -> None:
+        from PIL import Image
+
+        page = Image.open(BytesIO(png)).convert("RGB")
+        width, height = page.size
+        pixels = zlib.compress(page.tobytes(), 6)
+        image_id = self._object(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+            b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>" % (width, height, len(pixels)),
+            pixels
+        )
+        size = b"%.2f %.2f" % (width * 72 / self.RESOLUTION, height * 72 / self.RESOLUTION)
+        draw = b"q %s 0 0 %s 0 0 cm /image Do Q" % tuple(size.split())
+        contents_id = self._object(b"<< /Length %d >>" % len(draw), draw)
+        self.page_ids.append(self._object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s] /Resources << /XObject << /image %d 0 R >> >> "
+            b"/Contents %d 0 R >>" % (self.PAGES_ID, size, image_id, contents_id)
+        ))
+
+    def close(self) -> None:
+        kids = b" ".join(b"%d 0 R" % number for number in self.page_ids)
+        self._object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)), number=self.PAGES_ID)
+        self._object(b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES_ID, number=self.CATALOG_ID)
+
+        xref = self.file.tell()
+        self.file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_id)
+        for number in range(1, self.next_id):
+            self.file.write(b"%010d 00000 n \n" % self.offsets[number])
+        self.file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, self.CATALOG_ID, xref))
+        self.file.close()
+
+# =============================================================================
+# JOBS
+# =============================================================================
+
+class QRBatchJob:
+    """One batch request and its progress"""
+
+    def __init__(self, usernames: List[str], kind: str, output_format: str, path: str):
+        self.id = str(uuid.uuid4())
+        self.usernames = list(dict.fromkeys(usernames))
+        self.kind = kind
+        self.output_format = output_format
+        self.path = path
+        self.status = "queued"
+        self.completed = 0
+        self.failed = 0
+        self.missing: List[str] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.saved_at = 0.0
+
+    @property
+    def media_type(self) -> str:
+        return OUTPUT_FORMATS[self.output_format]
+
+    def progress(self) -> dict:
+        total = len(self.usernames)
+        done = self.completed + self.failed + len(self.missing)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "kind": self.kind,
+            "format": self.output_format,
+            "total": total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "missing": self.missing,
+            "percent": round(100 * done / total, 1) if total else 100.0,
+            "error": self.error
+        }
+
+class QRBatchRunner:
+    """
+    Renders batches on a process pool so CPU-bound QR/PIL work never runs on
+    the event loop. At most workers * 4 images are in flight at once, and each
+    finished image is appended to the output file immediately, so memory does
+    not grow with the batch size.
+    Job state lives in background_jobs, so status polls and downloads can
+    reach any worker; output_dir must be storage every worker can read.
+    """
+
+    def __init__(self, workers: Optional[int], output_dir: str, retention_seconds: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.output_dir = output_dir
+        self.retention_seconds = retention_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Never fork: the app process runs threads and holds DB connections
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def create_job(self, usernames: List[str], kind: str = "qr", output_format: str = "zip", path: str = None) -> QRBatchJob:
+        """Register a job; path defaults to a file in output_dir"""
+        if path is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"{uuid.uuid4()}.{output_format}")
+        job = QRBatchJob(usernames, kind, output_format, path)
+        self._expire_old_jobs()
+        record_job(QR_BATCH, job.id, job.progress(), path)
+        return job
+
+    def start(self, job: QRBatchJob) -> None:
+        """Run a job on a background thread"""
+        threading.Thread(target=self.run, args=(job,), name=f"qr-batch-{job.id[:8]}", daemon=True).start()
+
+    def _expire_old_jobs(self) -> None:
+        for path in expire_jobs(QR_BATCH, self.retention_seconds):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _lookup_names(self, usernames: List[str]) -> Dict[str, str]:
+        """username -> full name (or username when there is no profile)"""
+        names = {}
+        db = SessionLocal()
+        try:
+            for start in range(0, len(usernames), 500):
+                chunk = usernames[start:start + 500]
+                rows = db.query(User.username, MedicalProfile.full_name).outerjoin(
+                    MedicalProfile, MedicalProfile.user_id == User.id
+                ).filter(User.username.in_(chunk)).all()
+                for username, full_name in rows:
+                    names[username] = full_name or username
+        finally:
+            db.close()
+        return names
+
+    def run(self, job: QRBatchJob) -> QRBatchJob:
+        """Render every image of a job into its output file"""
+        job.status = "running"
+        try:
+            names = self._lookup_names(job.usernames)
+            job.missing = [u for u in job.usernames if u not in names]
+            save_progress(job, force=True)
+
+            writer = _ZipWriter(job.path) if job.output_format == "zip" else _PdfWriter(job.path)
+            pool = self._pool()
+            max_in_flight = self.workers * 4
+            pending = set()
+            queue = deque(u for u in job.usernames if u in names)
+
+            try:
+                while queue or pending:
+                    while queue and len(pending) < max_in_flight:
+                        username = queue.popleft()
+                        pending.add(pool.submit(_render_item, username, names[username], job.kind))
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            username, png = future.result()
+                            writer.add(username, png)
+                            job.completed += 1
+                        except Exception as e:
+                            job.failed += 1
+                            print(f"QR batch item failed: {e}")
+                    save_progress(job)
+            finally:
+                writer.close()
+
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"QR batch {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            save_progress(job)
+        return job
+
+
+qr_batch_runner = QRBatchRunner(
+    workers=settings.QR_BATCH_WORKERS or None,
+    output_dir=settings.QR_BATCH_OUTPUT_DIR,
+    retention_seconds=settings.QR_BATCH_RETENTION_SECONDS
+)
@@ -0,0 +1,330 @@
+# In-memory typeahead index over the reference vocabulary
+
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+
+from app.config import settings
+from app.database import engine
+from app.models import MedicalProfile, ReferenceData
+from app.utils.encryption import open_medical_data
+
+# Match tiers, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, SUBSTRING, SUBCATEGORY, TYPO = range(6)
+
+# Shorter queries only match prefixes: substrings and typos of one or two
+# letters match most of the vocabulary
+MIN_NGRAM_QUERY = 3
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, accents stripped, punctuation and whitespace runs collapsed to one space"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in folded).split())
+
+def trigrams(text: str, word_start: bool = True) -> set:
+    """Three-letter grams; with word_start, a leading space marks the start of the text"""
+    padded = f" {text}" if word_start else text
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(length: int) -> int:
+    return 0 if length < 4 else 1 if length < 8 else 2
+
+def prefix_edit_distance(query: str, target: str, limit: int) -> int:
+    """
+    Fewest edits turning query into some prefix of target, counting an
+    adjacent swap as one edit (optimal string alignment). One pass scores
+    every prefix; returns limit + 1 once the distance must exceed limit.
+    """
+    target = target[:len(query) + limit]
+    before_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(query) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (query[i - 1] != target[j - 1]))
+            if i > 1 and j > 1 and query[i - 1] == target[j - 2] and query[i - 2] == target[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[max(len(query) - limit, 0):] or [limit + 1])
+
+# =============================================================================
+# INDEX
+# =============================================================================
+
+@dataclass(frozen=True)
+class ReferenceEntry:
+    item: dict  # response payload (ReferenceData.to_dict)
+    category: str
+    name: str  # normalized
+    subcategory: str  # normalized
+    popularity: int
+
+class ReferenceIndex:
+    """
+    Immutable snapshot of the reference vocabulary, built for typeahead.
+
+    Every word start of a name ("tree nuts", "nuts") is kept in one sorted
+    list for prefix lookups by bisection, and name trigrams map to entries
+    for substring and typo candidates. Results rank exact names, then name
+    prefixes, word prefixes, substrings, subcategory matches and typo
+    matches (closest first); within a tier, terms more profiles list come
+    first, then by name.
+    """
+
+    def __init__(self, rows: Iterable, version: tuple = None):
+        self.version = version
+        self.entries = [
+            ReferenceEntry(
+                item={"id": row.id, "category": row.category, "subcategory": row.subcategory, "name": row.name},
+                category=row.category,
+                name=normalize(row.name),
+                subcategory=normalize(row.subcategory),
+                popularity=row.usage_count or 0
+            )
+            for row in rows
+        ]
+
+        keys = []
+        self._grams: Dict[str, set] = defaultdict(set)
+        self._subcategories: Dict[str, list] = defaultdict(list)
+        for position, entry in enumerate(self.entries):
+            words = entry.name.split()
+            keys.extend((" ".join(words[start:]), position) for start in range(len(words)))
+            for gram in trigrams(entry.name):
+                self._grams[gram].add(position)
+            if entry.subcategory:
+                self._subcategories[entry.subcategory].append(position)
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._key_entries = [position for _, position in keys]
+        self._by_popularity = sorted(range(len(self.entries)), key=self._rank_within_tier)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _rank_within_tier(self, position: int) -> tuple:
+        entry = self.entries[position]
+        return -entry.popularity, entry.name
+
+    def _typo_distance(self, query: str, entry: ReferenceEntry, limit: int) -> int:
+        """Fewest edits turning query into the start of the name or of one of its words"""
+        words = entry.name.split()
+        return min(prefix_edit_distance(query, " ".join(words[start:]), limit) for start in range(len(words)))
+
+    def search(self, query: str, category: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Best matches for a (partial) query, as reference item dicts"""
+        query = normalize(query)
+        if not query:
+            return [
+                self.entries[position].item for position in self._by_popularity
+                if not category or self.entries[position].category == category
+            ][:limit]
+
+        found: Dict[int, Tuple[int, int]] = {}  # entry -> (tier, edits)
+
+        def offer(position: int, tier: int, edits: int = 0) -> None:
+            if category and self.entries[position].category != category:
+                return
+            if position not in found or (tier, edits) < found[position]:
+                found[position] = (tier, edits)
+
+        for index in range(bisect_left(self._keys, query), len(self._keys)):
+            key = self._keys[index]
+            if not key.startswith(query):
+                break
+            position = self._key_entries[index]
+            name = self.entries[position].name
+            offer(position, EXACT if name == query else NAME_PREFIX if key == name else WORD_PREFIX)
+
+        long_query = len(query) >= MIN_NGRAM_QUERY
+        for subcategory, positions in self._subcategories.items():
+            if subcategory.startswith(query) or (long_query and query in subcategory):
+                for position in positions:
+                    offer(position, SUBCATEGORY)
+
+        if long_query:
+            # A name containing the query has every one of its trigrams
+            postings = sorted((self._grams.get(gram, set()) for gram in trigrams(query, word_start=False)), key=len)
+            for position in set.intersection(*postings) if all(postings) else ():
+                if query in self.entries[position].name:
+                    offer(position, SUBSTRING)
+
+            typos = max_typos(len(query))
+            if typos and len(found) < limit:
+                # Each edit destroys at most four of the query's trigrams (three,
+                # or four for an adjacent swap), so a match keeps at least this
+                # many (q-gram lemma)
+                query_grams = trigrams(query)
+                needed = max(len(query_grams) - 4 * typos, 1)
+                shared = Counter(position for gram in query_grams for position in self._grams.get(gram, ()))
+                for position, count in shared.items():
+                    if count < needed or position in found:
+                        continue
+                    edits = self._typo_distance(query, self.entries[position], typos)
+                    if edits <= typos:
+                        offer(position, TYPO, edits)
+
+        ranked = sorted(found, key=lambda position: (*found[position], *self._rank_within_tier(position)))
+        return [self.entries[position].item for position in ranked[:limit]]
+
+# =============================================================================
+# SERVING AND RELOAD
+# =============================================================================
+
+class ReferenceSearch:
+    """
+    Serves reference search from an in-memory ReferenceIndex.
+
+    A background thread compares a cheap version stamp of the table (row
+    count, highest id, latest edit, total usage) every refresh_seconds and
+    rebuilds the index when it changed; request_reload() wakes it early after a write
+    through this instance. The new index replaces the old one in a single
+    assignment, so every search sees one complete snapshot. Until the first
+    load, search returns None and callers query the database.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.index: Optional[ReferenceIndex] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.loaded_at: Optional[str] = None
+        self.reloads = 0
+        self.searches = 0
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the index if the table changed; returns whether it did"""
+        with engine.connect() as conn:
+            # Stamp first: rows newer than it only cause one extra rebuild
+            version = tuple(conn.execute(select(
+                func.count(ReferenceData.id),
+                func.max(ReferenceData.id),
+                func.max(ReferenceData.updated_at),
+                func.coalesce(func.sum(ReferenceData.usage_count), 0)
+            )).one())
+            if not force and self.index is not None and self.index.version == version:
+                return False
+            rows = conn.execute(select(
+                ReferenceData.id,
+                ReferenceData.category,
+                ReferenceData.subcategory,
+                ReferenceData.name,
+                ReferenceData.usage_count
+            )).all()
+
+        self.index = ReferenceIndex(rows, version)
+        self.loaded_at = datetime.utcnow().isoformat()
+        self.reloads += 1
+        return True
+
+    def search(self, query: str, category: Optional[str] = None, limit: int = 20) -> Optional[List[dict]]:
+        """Ranked matches, or None while no index is loaded"""
+        index = self.index
+        if index is None:
+            return None
+        self.searches += 1
+        return index.search(query, category, limit)
+
+    def request_reload(self) -> None:
+        """Check the table now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.reload():
+                    print(f"Reference index loaded: {len(self.index)} terms")
+            except Exception as e:
+                print(f"Reference index reload failed: {e}")
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Load now and keep checking on a background thread (no-op when the interval is 0)"""
+        if not self.refresh_seconds or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reference-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "terms": len(self.index) if self.index is not None else None,
+            "version": self.index.version if self.index is not None else None,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "searches": self.searches
+        }
+
+
+reference_search = ReferenceSearch(refresh_seconds=settings.REFERENCE_INDEX_REFRESH_SECONDS)
+
+# =============================================================================
+# POPULARITY
+# =============================================================================
+
+# Adds delta to the named term's usage_count (free-text terms match no row).
+# updated_at marks vocabulary edits (it versions the public reference ETag),
+# so popularity changes keep it as it is
+_reference = ReferenceData.__table__
+USAGE_STATEMENT = update(_reference).where(_reference.c.name == bindparam("term")).values(
+    usage_count=_reference.c.usage_count + bindparam("delta"),
+    updated_at=_reference.c.updated_at
+)
+
+def profile_terms(allergies: Iterable[str] = (), medications: Iterable[str] = (), medical_conditions: Iterable[str] = ()) -> set:
+    """Distinct terms a profile lists"""
+    return {term for terms in (allergies, medications, medical_conditions) for term in (terms or []) if term}
+
+def usage_params(before: Iterable[str], after: Iterable[str]) -> List[dict]:
+    """
+    USAGE_STATEMENT parameters for a profile going from terms before to after.
+    Sorted so concurrent writers lock rows in the same order.
+    """
+    before, after = set(before), set(after)
+    deltas = {**{term: -1 for term in before - after}, **{term: 1 for term in after - before}}
+    return [{"term": term, "delta": delta} for term, delta in sorted(deltas.items())]
+
+def recount_usage(chunk_size: int = 1000) -> dict:
+    """
+    Set every usage_count from the profiles themselves, decrypting each.
+    For backfills and drift; profile writes during the scan may be
+    miscounted until the next run.
+    """
+    counts = Counter()
+    profiles = failed = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(select(
+            MedicalProfile.medical_data,
+            MedicalProfile.allergies,
+            MedicalProfile.medications,
+            MedicalProfile.medical_conditions
+        ))
+        for row in result:
+            try:
+                counts.update(profile_terms(**open_medical_data(*row)))
+                profiles += 1
+            except Exception:
+                failed += 1
+
+    with engine.begin() as conn:
+        names = conn.execute(select(ReferenceData.name)).scalars().all()
+        conn.execute(update(ReferenceData).values(usage_count=0, updated_at=ReferenceData.updated_at))
+        params = [{"term": name, "delta": counts[name]} for name in sorted(names) if counts[name]]
+        if params:
+            conn.execute(USAGE_STATEMENT, params)
+    return {"profiles": profiles, "unreadable": failed, "terms_in_use": len(params)}
@@ -1,19 +1,174 @@
 # Multi-language translation
 
-import httpx
+import asyncio
+import hashlib
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ReferenceData, TranslationMemory
+from app.schemas import EmergencyView
+from app.services.http_clients import http_clients
+from app.utils.cache import LRUCache
+
+# In-process LRU in front of the translation_memory table. It holds patient
+# text too, but only in memory, like the emergency view cache
+translation_cache = LRUCache(max_entries=settings.TRANSLATION_CACHE_MAX_ENTRIES)
+
+# =============================================================================
+# TRANSLATION MEMORY
+# =============================================================================
+
+def _source_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+async def _lookup(db: AsyncSession, texts: List[str], target_language: str) -> dict:
+    """Known translations from the LRU, then the persistent memory"""
+    found = {}
+    missing = []
+    for text in texts:
+        cached = translation_cache.get((text, target_language))
+        if cached is not None:
+            found[text] = cached
+        else:
+            missing.append(text)
+
+    if missing:
+        hashes = {_source_hash(text): text for text in missing}
+        rows = (await db.scalars(select(TranslationMemory).where(
+            TranslationMemory.target_language == target_language,
+            TranslationMemory.source_hash.in_(list(hashes))
+        ))).all()
+        for row in rows:
+            text = hashes[row.source_hash]
+            found[text] = row.translated_text
+            translation_cache.set((text, target_language), row.translated_text)
+
+    return found
+
+async def _remember(db: AsyncSession, translations: dict, target_language: str) -> None:
+    """
+    Cache new translations in-process and persist the reference vocabulary
+    terms among them. Patient free text (special instructions, unlisted
+    allergies) is PHI and never goes to the shared table in plaintext.
+    A concurrent writer winning the race is fine.
+    """
+    for text, translated in translations.items():
+        translation_cache.set((text, target_language), translated)
+
+    vocabulary = set((await db.scalars(select(ReferenceData.name).where(ReferenceData.name.in_(list(translations))))).all())
+    if not vocabulary:
+        return
+    try:
+        db.add_all([
+            TranslationMemory(
+                source_hash=_source_hash(text),
+                target_language=target_language,
+                source_text=text,
+                translated_text=translated
+            )
+            for text, translated in translations.items()
+            if text in vocabulary
+        ])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+
+# =============================================================================
+# UPSTREAM API
+# =============================================================================
 
-async def translate_text(text: str, target_language: str) -> str:
+async def _translate_one(text: str, target_language: str) -> str:
+    """
+    One string through the translation API:
+    {"text", "target_language", "source_language"} -> {"translated_text"}
+    """
+    response = await http_clients.get("translate").post(
+        settings.TRANSLATE_API_URL,
+        headers={"Authorization": f"Bearer {settings.AIML_API_KEY}"},
+        json={
+            "text": text,
+            "target_language": target_language,
+            "source_language": "auto"
+        }
+    )
+    response.raise_for_status()
+    translated = response.json().get("translated_text")
+    if not isinstance(translated, str):
+        raise ValueError("Translation response has no translated_text")
+    return translated
+
+async def _translate_upstream(texts: List[str], target_language: str) -> dict:
+    """
+    Translate strings concurrently (bounded by the translate client's pool).
+    Returns the ones that succeeded; failures are logged and left out.
+    """
+    results = await asyncio.gather(*(_translate_one(text, target_language) for text in texts), return_exceptions=True)
+    translated = {}
+    for text, result in zip(texts, results):
+        if isinstance(result, Exception):
+            print(f"Translation failed: {result}")
+        else:
+            translated[text] = result
+    return translated
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+async def translate_batch_checked(texts: List[str], target_language: str, db: Optional[AsyncSession] = None) -> Tuple[List[str], bool]:
+    """
+    Translate a list of strings, sending only unseen ones upstream.
+    Falls back to the source text for anything that could not be
+    translated; the flag is False when any fallback was used.
+    """
+    unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+    if not unique:
+        return list(texts), True
+
+    own_session = db is None
+    db = db or AsyncSessionLocal()
+    try:
+        known = await _lookup(db, unique, target_language)
+        missing = [t for t in unique if t not in known]
+        if missing:
+            new = await _translate_upstream(missing, target_language)
+            if new:
+                await _remember(db, new, target_language)
+                known.update(new)
+    finally:
+        if own_session:
+            await db.close()
+
+    return [known.get(t, t) for t in texts], all(t in known for t in unique)
+
+async def translate_batch(texts: List[str], target_language: str, db: Optional[AsyncSession] = None) -> List[str]:
+    """translate_batch_checked without the completeness flag"""
+    return (await translate_batch_checked(texts, target_language, db))[0]
+
+async def translate_text(text: str, target_language: str, db: Optional[AsyncSession] = None) -> str:
     """Translate text using AI/ML API"""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.aimlapi.com/translate",  # Replace with actual
-            headers={"Authorization": f"Bearer {settings.AIML_API_KEY}"},
-            json={
-                "text": text,
-                "target_language": target_language,
-                "source_language": "auto"
-            }
-        )
-        result = response.json()
-        return result.get("translated_text", text)
\ No newline at end of file
+    return (await translate_batch([text], target_language, db))[0]
+
+async def translate_emergency_view(view: EmergencyView, target_language: str, db: Optional[AsyncSession] = None) -> Tuple[EmergencyView, bool]:
+    """
+    Translate every free-text field of an emergency view, one upstream
+    request per string not already known (sent concurrently).
+    The flag is False when some text is still in the source language.
+    """
+    fields = ["allergies", "medications", "medical_conditions"]
+    texts = [item for field in fields for item in getattr(view, field)]
+    if view.special_instructions:
+        texts.append(view.special_instructions)
+
+    translations, complete = await translate_batch_checked(texts, target_language, db)
+    translated = iter(translations)
+    updates = {field: [next(translated) for _ in getattr(view, field)] for field in fields}
+    if view.special_instructions:
+        updates["special_instructions"] = next(translated)
+
+    return view.model_copy(update=updates), complete
@@ -0,0 +1,106 @@
+# On-disk cache of synthesized emergency audio
+
+import asyncio
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.services.ai_voice import text_to_speech
+
+
+class AudioCache:
+    """
+    Size-bounded directory of audio files keyed by (profile version, language).
+    Hits refresh the file's access time; writes evict the least recently used
+    files once the directory exceeds max_bytes. Concurrent misses for the same
+    key share a single synthesis request.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._locks = {}
+        self._evict_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, version: str, language: str) -> str:
+        return hashlib.sha256(f"{version}|{language}".encode()).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.mp3"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached file path, or None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, audio: bytes) -> Path:
+        """Store audio atomically and enforce the size bound"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(audio)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Path) -> None:
+        with self._evict_lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".mp3"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    path.unlink()
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    async def get_or_synthesize(self, version: str, language: str, text: str) -> Path:
+        """Return cached audio for this profile version, synthesizing it on a miss"""
+        key = self.key_for(version, language)
+        path = self.get(key)
+        if path:
+            self.hits += 1
+            return path
+
+        # [lock, callers holding or waiting for it]; the entry stays until the
+        # last of them is done, so a caller arriving meanwhile queues on the
+        # same lock instead of starting a second synthesis
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                path = self.get(key)
+                if path:
+                    self.hits += 1
+                    return path
+                self.misses += 1
+                audio = await text_to_speech(text, language)
+                return await asyncio.to_thread(self.put, key, audio)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._locks.pop(key, None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters"""
+        return {"hits": self.hits, "misses": self.misses, "synthesizing": len(self._locks), "max_bytes": self.max_bytes}
+
+
+tts_audio_cache = AudioCache(settings.TTS_CACHE_DIR, settings.TTS_CACHE_MAX_BYTES)
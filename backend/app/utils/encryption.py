@@ -1,22 +1,162 @@
 # Data encryption
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from app.config import settings
+import base64
+import hashlib
 import json
 
-# Generate key: settings.SECRET_KEY[:32].encode()
-cipher = Fernet(Fernet.generate_key())
+# Envelopes look like "v1:<key id>:<fernet token>" so any worker holding the
+# keyring can pick the right key, and old keys can stay readable after rotation.
+ENVELOPE_VERSION = "v1"
+
+# Profile fields sealed together in one envelope
+MEDICAL_FIELDS = ("allergies", "medications", "medical_conditions")
+
+# Key derived from SECRET_KEY: the development fallback, never used silently elsewhere
+DERIVED_KEY_ID = "secret-key-derived"
+
+# Shown in every list of a profile whose data cannot be decrypted, so it is
+# never mistaken for a patient with no allergies
+UNREADABLE_MARKER = "UNREADABLE: stored medical data could not be decrypted"
+
+# =============================================================================
+# KEYRING
+# =============================================================================
+
+class Keyring:
+    """Named Fernet keys; new data is always sealed with the active key"""
+
+    def __init__(self, keys: dict, active_key_id: str):
+        if active_key_id not in keys:
+            raise ValueError(f"Active encryption key '{active_key_id}' is not in the keyring")
+        self.ciphers = {kid: Fernet(key) for kid, key in keys.items()}
+        self.active_key_id = active_key_id
+
+    def encrypt(self, plaintext: bytes) -> str:
+        token = self.ciphers[self.active_key_id].encrypt(plaintext).decode()
+        return f"{ENVELOPE_VERSION}:{self.active_key_id}:{token}"
+
+    def decrypt(self, envelope: str) -> bytes:
+        parts = envelope.split(":", 2)
+        if len(parts) == 3 and parts[0] == ENVELOPE_VERSION:
+            _, kid, token = parts
+            if kid not in self.ciphers:
+                raise InvalidToken(f"Unknown encryption key id '{kid}'")
+            return self.ciphers[kid].decrypt(token.encode())
+
+        # Bare Fernet token written before envelopes existed
+        for cipher in self.ciphers.values():
+            try:
+                return cipher.decrypt(envelope.encode())
+            except InvalidToken:
+                continue
+        raise InvalidToken("No key in the keyring can decrypt this value")
+
+    def key_id_of(self, envelope: str):
+        """Key id an envelope was sealed with (None for bare tokens)"""
+        parts = envelope.split(":", 2)
+        return parts[1] if len(parts) == 3 and parts[0] == ENVELOPE_VERSION else None
+
+    def needs_rotation(self, envelope: str) -> bool:
+        return self.key_id_of(envelope) != self.active_key_id
+
+def derive_key(secret_key: str) -> bytes:
+    return base64.urlsafe_b64encode(hashlib.sha256(secret_key.encode()).digest())
+
+def load_keyring(encryption_keys: str, active_key_id: str, secret_key: str,
+                 environment: str = "development", read_derived_key: bool = False) -> Keyring:
+    """
+    Build the keyring from configuration.
+    encryption_keys is "kid1:<fernet key>,kid2:<fernet key>". Without it, only
+    development falls back to a key derived from SECRET_KEY (with a warning);
+    anywhere else that is a startup error. read_derived_key adds the derived
+    key for reading under DERIVED_KEY_ID.
+    """
+    keys = {}
+    for entry in filter(None, (e.strip() for e in encryption_keys.split(","))):
+        kid, _, key = entry.partition(":")
+        keys[kid.strip()] = key.strip().encode()
+
+    if not keys:
+        if environment != "development":
+            raise RuntimeError(f"ENCRYPTION_KEYS is not set (ENVIRONMENT={environment}); refusing to encrypt with a key derived from SECRET_KEY")
+        print("WARNING: ENCRYPTION_KEYS is not set; medical data is encrypted with a key derived from SECRET_KEY. Development only.")
+        return Keyring({DERIVED_KEY_ID: derive_key(secret_key)}, DERIVED_KEY_ID)
+
+    if read_derived_key:
+        keys.setdefault(DERIVED_KEY_ID, derive_key(secret_key))
+    return Keyring(keys, active_key_id or next(iter(keys)))
+
+keyring = load_keyring(
+    settings.ENCRYPTION_KEYS,
+    settings.ENCRYPTION_ACTIVE_KEY_ID,
+    settings.SECRET_KEY,
+    settings.ENVIRONMENT,
+    settings.ENCRYPTION_READ_DERIVED_KEY
+)
+
+# =============================================================================
+# FIELD HELPERS
+# =============================================================================
 
 def encrypt_data(data: list) -> str:
     """Encrypt list to string"""
-    json_str = json.dumps(data)
-    encrypted = cipher.encrypt(json_str.encode())
-    return encrypted.decode()
+    return keyring.encrypt(json.dumps(data).encode())
 
 def decrypt_data(encrypted_str: str) -> list:
     """Decrypt string to list"""
     try:
-        decrypted = cipher.decrypt(encrypted_str.encode())
-        return json.loads(decrypted.decode())
+        return json.loads(keyring.decrypt(encrypted_str).decode())
     except:
-        return []
\ No newline at end of file
+        return []
+
+# =============================================================================
+# PROFILE ENVELOPE
+# =============================================================================
+
+def encrypt_medical_data(allergies: list, medications: list, medical_conditions: list) -> str:
+    """Seal all sensitive profile lists in a single envelope"""
+    payload = {
+        "allergies": allergies or [],
+        "medications": medications or [],
+        "medical_conditions": medical_conditions or []
+    }
+    return keyring.encrypt(json.dumps(payload).encode())
+
+def decrypt_medical_data(profile) -> dict:
+    """
+    Sensitive lists of a MedicalProfile with one decryption, plus "unreadable".
+    A row that cannot be decrypted is logged and every list holds
+    UNREADABLE_MARKER instead of coming back empty.
+    """
+    try:
+        medical = open_medical_data(profile.medical_data, profile.allergies, profile.medications, profile.medical_conditions)
+    except Exception as e:
+        print(f"Medical data of profile {profile.id} could not be decrypted: {type(e).__name__}")
+        return {**{field: [UNREADABLE_MARKER] for field in MEDICAL_FIELDS}, "unreadable": True}
+    return {**medical, "unreadable": False}
+
+def open_medical_data(medical_data: str, allergies: str = None, medications: str = None, medical_conditions: str = None) -> dict:
+    """
+    A profile's sensitive lists from its stored columns.
+    Unlike decrypt_medical_data this raises instead of returning empty lists,
+    for callers that must not mistake an unreadable row for an empty one.
+    """
+    if medical_data:
+        payload = json.loads(keyring.decrypt(medical_data).decode())
+    else:
+        legacy = {"allergies": allergies, "medications": medications, "medical_conditions": medical_conditions}
+        payload = {
+            field: json.loads(keyring.decrypt(value).decode()) if value else []
+            for field, value in legacy.items()
+        }
+    return {field: payload.get(field) or [] for field in MEDICAL_FIELDS}
+
+def reseal_medical_data(medical_data: str, allergies: str = None, medications: str = None, medical_conditions: str = None) -> str:
+    """
+    Re-encrypt a profile's sensitive lists under the active key.
+    Raises if the row cannot be read, so it is never overwritten.
+    """
+    payload = open_medical_data(medical_data, allergies, medications, medical_conditions)
+    return encrypt_medical_data(payload["allergies"], payload["medications"], payload["medical_conditions"])
@@ -0,0 +1,79 @@
+# Password hashing
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from app.config import settings
+
+@lru_cache(maxsize=None)
+def pwd_context():
+    """Built on first use, so importing the app does not load passlib"""
+    from passlib.context import CryptContext
+
+    # Hashes made with any other cost are flagged for rehash at next login
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    )
+
+# bcrypt releases the GIL, so threads run in parallel; the fixed size caps
+# the CPU a signup burst can take, and extra requests wait their turn here.
+# Created on first use, and again after a shutdown
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_executor_lock = threading.Lock()
+
+def _executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+        return _hash_executor
+
+def hash_password(password: str) -> str:
+    """Hash a plain text password using bcrypt (blocking; for scripts and seeds)"""
+    return pwd_context().hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a plain password against its hash (blocking)"""
+    return pwd_context().verify(plain_password, hashed_password)
+
+def hash_password_pooled(password: str) -> str:
+    """hash_password on the hashing pool, for worker threads (bulk import) that must share its CPU cap"""
+    return _executor().submit(pwd_context().hash, password).result()
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the hashing pool, leaving the event loop free"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), pwd_context().hash, password)
+
+async def verify_and_rehash(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password on the hashing pool.
+    Returns (valid, new_hash); new_hash is set when the stored hash uses an
+    outdated cost or scheme and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _executor(), pwd_context().verify_and_update, plain_password, hashed_password
+        )
+    except ValueError:
+        # Unrecognised or malformed stored hash
+        return False, None
+
+def shutdown_hash_executor() -> None:
+    """Stop the hashing pool; the next hash starts a new one"""
+    global _hash_executor
+    with _hash_executor_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
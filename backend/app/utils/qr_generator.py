@@ -1,30 +1,58 @@
 # QR code creation
+# qrcode and PIL are imported inside the renderers: they are slow to load
+# and most processes never draw a code (assets are stored once rendered)
 
-import qrcode
 from io import BytesIO
-import base64
-
-def generate_qr_code(username: str) -> str:
-    """Generate QR code for emergency access and return as base64 string"""
-    try:
-        emergency_url = f"https://crisislink.cv/emergency/{username}"
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(emergency_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        
-        return f"data:image/png;base64,{img_str}"
-    except Exception as e:
-        # Return a simple mock QR code if generation fails
-        return "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
\ No newline at end of file
+
+# Rendering parameters; any change here must bump QR_RENDER_VERSION so
+# content-addressed assets are re-rendered instead of served stale
+QR_RENDER_VERSION = 1
+QR_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+def emergency_url_for(username: str) -> str:
+    """Public emergency page encoded in a patient's QR code"""
+    return f"https://crisislink.cv/emergency/{username}"
+
+def render_qr(data: str, fmt: str = "png") -> bytes:
+    """Render a QR code for data as PNG or SVG bytes"""
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffered = BytesIO()
+    if fmt == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffered)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def render_wallet_card(username: str, full_name: str) -> bytes:
+    """Printable emergency card: QR code beside the patient's name, as PNG bytes"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    qr_img = Image.open(BytesIO(render_qr(emergency_url_for(username)))).convert("RGB")
+    qr_img = qr_img.resize((360, 360))
+
+    card = Image.new("RGB", (1012, 638), "white")  # CR80 card at 300 dpi
+    card.paste(qr_img, (612, 139))
+
+    draw = ImageDraw.Draw(card)
+    font = ImageFont.load_default()
+    draw.rectangle([0, 0, 1012, 90], fill=(200, 16, 46))
+    draw.text((40, 35), "EMERGENCY MEDICAL INFORMATION", fill="white", font=font)
+    draw.text((40, 200), full_name or username, fill="black", font=font)
+    draw.text((40, 260), "Scan the QR code for allergies, medications", fill="black", font=font)
+    draw.text((40, 290), "and emergency contacts.", fill="black", font=font)
+    draw.text((40, 540), emergency_url_for(username), fill="black", font=font)
+
+    buffered = BytesIO()
+    card.save(buffered, format="PNG")
+    return buffered.getvalue()
@@ -0,0 +1,42 @@
+# Alembic environment for CrisisLink.cv
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.config import settings
+from app.models import Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+def _configure(**kwargs):
+    # One transaction per revision: concurrent index builds commit whatever
+    # precedes them, so revisions must not share a transaction
+    context.configure(target_metadata=target_metadata, compare_type=True, transaction_per_migration=True, **kwargs)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_offline():
+    """Emit SQL for DATABASE_URL without connecting (alembic upgrade --sql)"""
+    _configure(url=settings.DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+
+def run_migrations_online():
+    # app.migrate passes its own connection; the CLI opens one
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _configure(connection=connection, render_as_batch=connection.dialect.name == "sqlite")
+        return
+
+    connectable = create_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        _configure(connection=connection, render_as_batch=connection.dialect.name == "sqlite")
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,103 @@
+"""Baseline: schema as created by Base.metadata.create_all before migrations
+
+Databases created that way are stamped at this revision by app.migrate.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("user_type", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "doctors",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id"), nullable=False, unique=True),
+        sa.Column("hospital_id", sa.String(), nullable=False),
+        sa.Column("hospital_name", sa.String(), nullable=False),
+        sa.Column("specialty", sa.String()),
+        sa.Column("license_number", sa.String()),
+        sa.Column("is_verified", sa.Boolean()),
+        sa.Column("verified_at", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+    op.create_table(
+        "medical_profiles",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id"), unique=True),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("date_of_birth", sa.String()),
+        sa.Column("blood_type", sa.String()),
+        sa.Column("allergies", sa.Text()),
+        sa.Column("medications", sa.Text()),
+        sa.Column("medical_conditions", sa.Text()),
+        sa.Column("dnr_status", sa.Boolean()),
+        sa.Column("organ_donor", sa.Boolean()),
+        sa.Column("special_instructions", sa.Text()),
+        sa.Column("languages", sa.JSON()),
+        sa.Column("qr_code_url", sa.String()),
+        sa.Column("emergency_url", sa.String()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+    op.create_table(
+        "emergency_contacts",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id")),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("relation", sa.String()),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("email", sa.String()),
+        sa.Column("priority", sa.Integer()),
+    )
+
+    op.create_table(
+        "emergency_access_logs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id")),
+        sa.Column("accessed_at", sa.DateTime()),
+        sa.Column("responder_info", sa.Text()),
+        sa.Column("access_type", sa.String()),
+    )
+
+    op.create_table(
+        "reference_data",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("category", sa.String()),
+        sa.Column("subcategory", sa.String()),
+        sa.Column("name", sa.String()),
+    )
+    op.create_index("ix_reference_data_id", "reference_data", ["id"])
+    op.create_index("ix_reference_data_category", "reference_data", ["category"])
+    op.create_index("ix_reference_data_name", "reference_data", ["name"], unique=True)
+
+
+def downgrade():
+    op.drop_table("reference_data")
+    op.drop_table("emergency_access_logs")
+    op.drop_table("emergency_contacts")
+    op.drop_table("medical_profiles")
+    op.drop_table("doctors")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,54 @@
+"""Sealed medical_data envelope, QR asset store and translation memory
+
+Each step is skipped when create_all already made the table or column,
+so databases that ran newer app versions before migrations upgrade cleanly.
+
+Revision ID: 0002_envelope_assets_memory
+Revises: 0001_baseline
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_envelope_assets_memory"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "medical_data" not in {c["name"] for c in inspector.get_columns("medical_profiles")}:
+        op.add_column("medical_profiles", sa.Column("medical_data", sa.Text()))
+
+    if "qr_assets" not in tables:
+        op.create_table(
+            "qr_assets",
+            sa.Column("id", sa.String(64), primary_key=True),
+            sa.Column("media_type", sa.String(), nullable=False),
+            sa.Column("content", sa.LargeBinary(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+    if "translation_memory" not in tables:
+        op.create_table(
+            "translation_memory",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("source_hash", sa.String(64), nullable=False),
+            sa.Column("target_language", sa.String(), nullable=False),
+            sa.Column("source_text", sa.Text(), nullable=False),
+            sa.Column("translated_text", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.UniqueConstraint("source_hash", "target_language"),
+        )
+
+
+def downgrade():
+    op.drop_table("translation_memory")
+    op.drop_table("qr_assets")
+    with op.batch_alter_table("medical_profiles") as batch:
+        batch.drop_column("medical_data")
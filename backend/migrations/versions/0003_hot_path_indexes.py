@@ -0,0 +1,57 @@
+"""Indexes for the emergency, dashboard and audit lookups
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY outside
+a transaction, so writes to the tables (including scan logging) continue
+while they build. A build that failed part-way leaves an INVALID index
+behind; it is dropped and rebuilt on the next run.
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_envelope_assets_memory
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_hot_path_indexes"
+down_revision = "0002_envelope_assets_memory"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns); must match the Index/index=True declarations in app/models.py
+INDEXES = [
+    ("ix_emergency_contacts_user_id_priority", "emergency_contacts", ["user_id", "priority"]),
+    ("ix_emergency_access_logs_user_id_accessed_at", "emergency_access_logs", ["user_id", "accessed_at"]),
+    ("ix_emergency_access_logs_accessed_at", "emergency_access_logs", ["accessed_at"]),
+    ("ix_doctors_hospital_id", "doctors", ["hospital_id"]),
+]
+
+
+def _drop_if_invalid(name, table):
+    """Remove the leftovers of an interrupted concurrent build"""
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name}
+    ).first()
+    if invalid:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if postgres:
+                _drop_if_invalid(name, table)
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
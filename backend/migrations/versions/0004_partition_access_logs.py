@@ -0,0 +1,162 @@
+"""Monthly partitions for emergency_access_logs and a daily rollup table
+
+On PostgreSQL the log table is rebuilt as a table range-partitioned on
+accessed_at, with one partition per month from the oldest row through
+three months ahead, plus a default partition. The access log maintenance
+job creates later partitions and drops expired ones.
+Other databases keep a plain table; accessed_at only becomes NOT NULL.
+
+The rebuild runs online, so it is safe under DB_MIGRATE_ON_STARTUP:
+the new table and its indexes are created empty, existing rows are
+copied in committed batches of COPY_BATCH_SIZE in (accessed_at, id)
+order while scans keep logging to the old table, and only the last
+step locks the old table against writes (reads continue) to copy the
+rows logged since the last batch and swap the tables. An interrupted
+run resumes the copy where it stopped. The downgrade copies everything
+under one lock and is meant for maintenance windows.
+
+Revision ID: 0004_partition_access_logs
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-17
+"""
+
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_partition_access_logs"
+down_revision = "0003_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 3
+LOG_INDEXES = [
+    ("ix_emergency_access_logs_user_id_accessed_at", ["user_id", "accessed_at"]),
+    ("ix_emergency_access_logs_accessed_at", ["accessed_at"]),
+]
+COLUMNS = "id, user_id, accessed_at, responder_info, access_type"
+NEW_TABLE = "emergency_access_logs_partitioned"
+COPY_BATCH_SIZE = 50000
+SWAP_LOCK_TIMEOUT = "10s"
+
+
+def _add_months(month, count):
+    index = month.month - 1 + count
+    return date(month.year + index // 12, index % 12 + 1, 1)
+
+
+def _create_log_table(name, partitioned):
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} ("
+        "id VARCHAR NOT NULL, "
+        "user_id VARCHAR REFERENCES users (id), "
+        f"accessed_at TIMESTAMP WITHOUT TIME ZONE {'NOT NULL' if partitioned else ''}, "
+        "responder_info TEXT, "
+        "access_type VARCHAR, "
+        f"PRIMARY KEY ({'id, accessed_at' if partitioned else 'id'})"
+        f"){' PARTITION BY RANGE (accessed_at)' if partitioned else ''}"
+    )
+
+
+def _copied_up_to(bind):
+    """Latest (accessed_at, id) already in the new table: where a copy resumes"""
+    row = bind.execute(sa.text(
+        f"SELECT accessed_at, id FROM {NEW_TABLE} ORDER BY accessed_at DESC, id DESC LIMIT 1"
+    )).first()
+    return {"at": row.accessed_at, "id": row.id} if row else {"at": datetime.min, "id": ""}
+
+
+def upgrade():
+    op.create_table(
+        "emergency_access_daily",
+        sa.Column("user_id", sa.String(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("access_count", sa.Integer(), nullable=False),
+        sa.Column("first_accessed_at", sa.DateTime()),
+        sa.Column("last_accessed_at", sa.DateTime()),
+        if_not_exists=True
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute("UPDATE emergency_access_logs SET accessed_at = CURRENT_TIMESTAMP WHERE accessed_at IS NULL")
+        with op.batch_alter_table("emergency_access_logs") as batch:
+            batch.alter_column("accessed_at", existing_type=sa.DateTime(), nullable=False)
+        return
+
+    # Empty partitioned table next to the live one; its indexes are built
+    # now, while that is instant, and kept up as rows are copied in
+    _create_log_table(NEW_TABLE, partitioned=True)
+    oldest = bind.execute(sa.text("SELECT min(accessed_at) FROM emergency_access_logs")).scalar()
+    month = (oldest or datetime.utcnow()).date().replace(day=1)
+    last = _add_months(datetime.utcnow().date().replace(day=1), PARTITIONS_AHEAD)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS emergency_access_logs_p{month:%Y%m} PARTITION OF {NEW_TABLE} "
+            f"FOR VALUES FROM ('{month}') TO ('{_add_months(month, 1)}')"
+        )
+        month = _add_months(month, 1)
+    op.execute(f"CREATE TABLE IF NOT EXISTS emergency_access_logs_default PARTITION OF {NEW_TABLE} DEFAULT")
+    for name, columns in LOG_INDEXES:
+        op.create_index(f"{name}_new", NEW_TABLE, columns, if_not_exists=True)
+
+    # Bulk copy, one committed statement per batch (commits the DDL above first)
+    with op.get_context().autocommit_block():
+        # Rows from before accessed_at was always set (nothing adds more)
+        # sort with the oldest, so the keyset copy below picks them up
+        bind.execute(
+            sa.text("UPDATE emergency_access_logs SET accessed_at = :at WHERE accessed_at IS NULL"),
+            {"at": oldest or datetime.utcnow()}
+        )
+        position = _copied_up_to(bind)
+        while True:
+            boundary = bind.execute(sa.text(
+                "SELECT accessed_at, id FROM emergency_access_logs "
+                "WHERE accessed_at IS NOT NULL AND (accessed_at, id) > (:at, :id) "
+                "ORDER BY accessed_at, id OFFSET :skip LIMIT 1"
+            ), {**position, "skip": COPY_BATCH_SIZE - 1}).first()
+            if boundary is None:
+                break
+            bind.execute(sa.text(
+                f"INSERT INTO {NEW_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM emergency_access_logs "
+                "WHERE (accessed_at, id) > (:at, :id) AND (accessed_at, id) <= (:until_at, :until_id) "
+                "ON CONFLICT DO NOTHING"
+            ), {**position, "until_at": boundary.accessed_at, "until_id": boundary.id})
+            position = {"at": boundary.accessed_at, "id": boundary.id}
+
+    # Swap in the migration's transaction. Writers wait on the lock for as
+    # long as the tail copy takes; give up rather than queue behind a long
+    # running statement (the next start retries)
+    op.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+    op.execute("LOCK TABLE emergency_access_logs IN EXCLUSIVE MODE")
+    bind.execute(sa.text(
+        f"INSERT INTO {NEW_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM emergency_access_logs "
+        "WHERE (accessed_at, id) > (:at, :id) ON CONFLICT DO NOTHING"
+    ), _copied_up_to(bind))
+    op.execute("DROP TABLE emergency_access_logs")
+    op.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO emergency_access_logs")
+    op.execute(f"ALTER INDEX {NEW_TABLE}_pkey RENAME TO emergency_access_logs_pkey")
+    for name, _ in LOG_INDEXES:
+        op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("ALTER TABLE emergency_access_logs RENAME TO emergency_access_logs_partitioned")
+        for name, _ in LOG_INDEXES:
+            op.execute(f"ALTER INDEX {name} RENAME TO {name}_partitioned")
+        op.execute("ALTER INDEX emergency_access_logs_pkey RENAME TO emergency_access_logs_partitioned_pkey")
+
+        _create_log_table("emergency_access_logs", partitioned=False)
+        op.execute(f"INSERT INTO emergency_access_logs ({COLUMNS}) SELECT {COLUMNS} FROM emergency_access_logs_partitioned")
+        op.execute("DROP TABLE emergency_access_logs_partitioned")
+        for name, columns in LOG_INDEXES:
+            op.create_index(name, "emergency_access_logs", columns)
+    else:
+        with op.batch_alter_table("emergency_access_logs") as batch:
+            batch.alter_column("accessed_at", existing_type=sa.DateTime(), nullable=True)
+
+    op.drop_table("emergency_access_daily")
@@ -0,0 +1,39 @@
+"""Incrementally maintained dashboard counters
+
+Adds dashboard_counters and records the responding hospital on access log
+rows so scans can be counted per hospital. The counters start empty; the
+first reconciliation pass fills them from the source tables.
+
+Revision ID: 0005_dashboard_counters
+Revises: 0004_partition_access_logs
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_dashboard_counters"
+down_revision = "0004_partition_access_logs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "dashboard_counters",
+        sa.Column("scope", sa.String(), primary_key=True),
+        sa.Column("bucket", sa.String(), primary_key=True),
+        sa.Column("metric", sa.String(), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    # Nullable with no default: metadata-only on PostgreSQL, and on a
+    # partitioned table it reaches every partition
+    op.add_column("emergency_access_logs", sa.Column("hospital_id", sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("emergency_access_logs") as batch:
+        batch.drop_column("hospital_id")
+    op.drop_table("dashboard_counters")
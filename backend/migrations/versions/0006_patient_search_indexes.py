@@ -0,0 +1,65 @@
+"""Indexes for the doctor patient search
+
+A btree on (full_name, id) serves name-ordered keyset pages. On PostgreSQL
+a pg_trgm GIN index on lower(full_name) serves substring search; both are
+built concurrently, as in 0003.
+
+Revision ID: 0006_patient_search_indexes
+Revises: 0005_dashboard_counters
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_patient_search_indexes"
+down_revision = "0005_dashboard_counters"
+branch_labels = None
+depends_on = None
+
+NAME_INDEX = "ix_medical_profiles_full_name_id"
+TRIGRAM_INDEX = "ix_medical_profiles_full_name_trgm"
+
+
+def _drop_if_invalid(name):
+    """Remove the leftovers of an interrupted concurrent build"""
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name}
+    ).first()
+    if invalid:
+        op.drop_index(name, table_name="medical_profiles", postgresql_concurrently=True)
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    if postgres:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        if postgres:
+            _drop_if_invalid(NAME_INDEX)
+            _drop_if_invalid(TRIGRAM_INDEX)
+        op.create_index(
+            NAME_INDEX, "medical_profiles", ["full_name", "id"],
+            if_not_exists=True, postgresql_concurrently=True
+        )
+        if postgres:
+            op.create_index(
+                TRIGRAM_INDEX, "medical_profiles", [sa.text("lower(full_name) gin_trgm_ops")],
+                if_not_exists=True, postgresql_using="gin", postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        if postgres:
+            op.drop_index(TRIGRAM_INDEX, table_name="medical_profiles", if_exists=True, postgresql_concurrently=True)
+        op.drop_index(NAME_INDEX, table_name="medical_profiles", if_exists=True, postgresql_concurrently=True)
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,31 @@
+"""Replication heartbeat
+
+Adds the single-row table the primary stamps with the current time so
+read replicas can measure their lag. It replicates like any other table,
+so replicas get it from the primary; nothing needs to run on them.
+
+Revision ID: 0007_replication_heartbeat
+Revises: 0006_patient_search_indexes
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_replication_heartbeat"
+down_revision = "0006_patient_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "replication_heartbeat",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("beat_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("replication_heartbeat")
@@ -0,0 +1,32 @@
+"""Reference term popularity
+
+Adds reference_data.usage_count, the number of profiles listing each
+term, which ranks reference search results. Existing rows start at 0;
+scripts/rebuild_reference_usage.py fills them from the profiles.
+
+Revision ID: 0008_reference_usage_count
+Revises: 0007_replication_heartbeat
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_reference_usage_count"
+down_revision = "0007_replication_heartbeat"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Constant default: metadata-only on PostgreSQL 11+
+    op.add_column(
+        "reference_data",
+        sa.Column("usage_count", sa.Integer(), nullable=False, server_default="0")
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("reference_data") as batch:
+        batch.drop_column("usage_count")
@@ -0,0 +1,50 @@
+"""Reference term change marker
+
+Adds reference_data.updated_at so the reference ETag and the in-memory
+search index notice renames and category edits, not just added rows.
+Existing rows are stamped with the migration time. On PostgreSQL a
+trigger also stamps edits made outside the app (plain SQL); popularity
+updates (usage_count only) leave it alone.
+
+Revision ID: 0009_reference_updated_at
+Revises: 0008_reference_usage_count
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_reference_updated_at"
+down_revision = "0008_reference_usage_count"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("reference_data", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE reference_data SET updated_at = CURRENT_TIMESTAMP")
+
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "CREATE FUNCTION reference_data_touch() RETURNS trigger AS $$ "
+        "BEGIN "
+        "IF (NEW.category, NEW.subcategory, NEW.name) IS DISTINCT FROM (OLD.category, OLD.subcategory, OLD.name) THEN "
+        "NEW.updated_at := now() AT TIME ZONE 'utc'; "
+        "END IF; "
+        "RETURN NEW; "
+        "END $$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER reference_data_touch BEFORE UPDATE ON reference_data "
+        "FOR EACH ROW EXECUTE FUNCTION reference_data_touch()"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TRIGGER reference_data_touch ON reference_data")
+        op.execute("DROP FUNCTION reference_data_touch()")
+    with op.batch_alter_table("reference_data") as batch:
+        batch.drop_column("updated_at")
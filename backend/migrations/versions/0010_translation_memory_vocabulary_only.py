@@ -0,0 +1,30 @@
+"""Translation memory holds reference vocabulary only
+
+Earlier versions stored every translated string of an emergency view,
+including patients' special instructions and free-text allergies, in
+plaintext. Those rows are deleted; reference vocabulary terms stay.
+
+Revision ID: 0010_translation_memory_vocabulary_only
+Revises: 0009_reference_updated_at
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+
+revision = "0010_translation_memory_vocabulary_only"
+down_revision = "0009_reference_updated_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "DELETE FROM translation_memory "
+        "WHERE source_text NOT IN (SELECT name FROM reference_data WHERE name IS NOT NULL)"
+    )
+
+
+def downgrade():
+    # Deleted rows are not restored; they are retranslated on demand
+    pass
@@ -0,0 +1,37 @@
+"""Background job state shared by every worker
+
+QR batch and patient import progress lived in the memory of the worker
+that ran the job, so a status poll or download routed to another worker
+got a 404. It now lives in background_jobs.
+
+Revision ID: 0011_background_jobs
+Revises: 0010_translation_memory_vocabulary_only
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_background_jobs"
+down_revision = "0010_translation_memory_vocabulary_only"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "background_jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("job_type", sa.String(), nullable=False),
+        sa.Column("progress", sa.JSON(), nullable=False),
+        sa.Column("path", sa.String()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime()),
+    )
+    op.create_index("ix_background_jobs_finished_at", "background_jobs", ["finished_at"])
+
+
+def downgrade():
+    op.drop_index("ix_background_jobs_finished_at", table_name="background_jobs")
+    op.drop_table("background_jobs")
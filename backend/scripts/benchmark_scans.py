@@ -0,0 +1,85 @@
+"""
+Concurrent emergency-scan benchmark.
+
+Fires many GET /api/emergency/{username} requests at a running API and
+reports throughput and latency. To compare database layers, start the
+server with EMERGENCY_CACHE_MAX_ENTRIES=0 so every scan reaches the
+database, run this script, then repeat against the other build:
+
+    EMERGENCY_CACHE_MAX_ENTRIES=0 uvicorn app.main:app --port 8000
+    python scripts/benchmark_scans.py demo_patient --requests 2000 --concurrency 100
+"""
+
+import sys
+import argparse
+import asyncio
+import time
+
+import httpx
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+async def scan(client, url, latencies, errors):
+    started = time.perf_counter()
+    try:
+        response = await client.get(url)
+        if response.status_code != 200:
+            errors[response.status_code] = errors.get(response.status_code, 0) + 1
+    except httpx.HTTPError as e:
+        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+    latencies.append(time.perf_counter() - started)
+
+async def run(base_url, usernames, total, concurrency, language):
+    latencies = []
+    errors = {}
+    urls = [f"{base_url}/api/emergency/{usernames[i % len(usernames)]}?language={language}" for i in range(total)]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def bounded(url):
+            async with semaphore:
+                await scan(client, url, latencies, errors)
+
+        # Warm up connections and any lazily created pools
+        await asyncio.gather(*(bounded(url) for url in urls[:concurrency]))
+        latencies.clear()
+        errors.clear()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(bounded(url) for url in urls))
+        elapsed = time.perf_counter() - started
+
+    return elapsed, sorted(latencies), errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure concurrent emergency scan throughput against a running API.")
+    parser.add_argument("usernames", nargs="+", help="Patients to scan (round-robin)")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API root")
+    parser.add_argument("--requests", type=int, default=1000, help="Total scans")
+    parser.add_argument("--concurrency", type=int, default=50, help="Scans in flight at once")
+    parser.add_argument("--language", default="en", help="Response language")
+    args = parser.parse_args()
+
+    elapsed, latencies, errors = asyncio.run(
+        run(args.base_url.rstrip("/"), args.usernames, args.requests, args.concurrency, args.language)
+    )
+
+    print(f"{args.requests} scans, concurrency {args.concurrency}: {elapsed:.2f}s")
+    print(f"Throughput: {args.requests / elapsed:.1f} scans/s")
+    print(
+        f"Latency ms: p50 {percentile(latencies, 0.50) * 1000:.1f}, "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f}, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f}, "
+        f"max {latencies[-1] * 1000:.1f}"
+    )
+    if errors:
+        print(f"Errors: {errors}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
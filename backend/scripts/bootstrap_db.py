@@ -0,0 +1,28 @@
+import sys
+import os
+import argparse
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.migrate import upgrade_database
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bring the database schema up to date and optionally load demo data. "
+                    "Run as a release step to let app instances start with DB_MIGRATE_ON_STARTUP=false."
+    )
+    parser.add_argument("--revision", default="head", help="Alembic revision to migrate to")
+    parser.add_argument("--seed", action="store_true", help="Load reference data and the demo user (skipped where present)")
+    args = parser.parse_args()
+
+    upgrade_database(args.revision)
+    print(f"Database migrated to {args.revision}")
+
+    if args.seed:
+        # Imported only when seeding: hashing the demo password loads passlib and bcrypt
+        from app.seeds.medical_data import seed_data
+        seed_data()
+
+if __name__ == "__main__":
+    main()
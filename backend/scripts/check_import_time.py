@@ -0,0 +1,82 @@
+import sys
+import os
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (SMS, QR rendering, password hashing) or only by
+# migration and seed commands; none of them may come back at import time
+LAZY_MODULES = ["twilio", "qrcode", "PIL", "passlib", "alembic", "app.migrate", "app.seeds.medical_data"]
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - started, "modules": sorted(sys.modules)}))
+"""
+
+def import_once(database_url: str) -> tuple:
+    """Import app.main in a fresh interpreter; returns (result, importtime lines)"""
+    env = {**os.environ, "DATABASE_URL": database_url, "DB_REPLICA_URLS": "", "PYTHONPATH": BACKEND_DIR}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing app.main failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr.splitlines()
+
+def top_packages(importtime_lines: list, count: int) -> list:
+    """Top-level packages by cumulative import time (microseconds)"""
+    totals = {}
+    for line in importtime_lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and "." not in name.strip():
+            totals[name.strip()] = int(cumulative)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fail when importing the app gets slow, touches the database, or loads a module meant to be lazy."
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time (the median is compared)")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Allowed median import time")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level packages to list")
+    args = parser.parse_args()
+
+    failures = []
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Importing must not connect: SQLite would create this file
+        database_path = os.path.join(tmp, "import_check.db")
+        for _ in range(args.runs):
+            result, lines = import_once(f"sqlite:///{database_path}")
+            timings.append(result["seconds"] * 1000)
+        if os.path.exists(database_path):
+            failures.append("importing app.main opened a database connection")
+
+    loaded = set(result["modules"])
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+
+    median = statistics.median(timings)
+    print(f"import app.main: median {median:.0f} ms over {args.runs} runs (min {min(timings):.0f}, max {max(timings):.0f}, budget {args.budget_ms:.0f})")
+    for name, microseconds in top_packages(lines, args.top):
+        print(f"  {microseconds / 1000:8.1f} ms  {name}")
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import sys
+import os
+import argparse
+import re
+from datetime import datetime
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+
+from app.crud import _patient_query, patient_search_query
+from app.services.dashboard_counters import counters_query
+from app.database import engine
+from app.models import Doctor, EmergencyAccess, EmergencyContact, MedicalProfile, TranslationMemory, User
+
+# Queries the emergency, dashboard and audit paths run on every request;
+# each must be answerable through an index on these tables
+HOT_TABLES = {"users", "medical_profiles", "emergency_contacts", "emergency_access_logs", "doctors", "translation_memory", "dashboard_counters"}
+
+HOT_PATH_QUERIES = {
+    "emergency view (user, profile, contacts)": _patient_query().where(User.username == "demo"),
+    "contacts by patient in priority order": select(EmergencyContact)
+        .where(EmergencyContact.user_id == "u1")
+        .order_by(EmergencyContact.priority),
+    "profile by user": select(MedicalProfile).where(MedicalProfile.user_id == "u1"),
+    "last access for a patient": select(func.max(EmergencyAccess.accessed_at))
+        .where(EmergencyAccess.user_id == "u1"),
+    "patient audit history": select(EmergencyAccess)
+        .where(EmergencyAccess.user_id == "u1")
+        .order_by(EmergencyAccess.accessed_at.desc())
+        .limit(50),
+    "scans in a time window": select(func.count(EmergencyAccess.id))
+        .where(EmergencyAccess.accessed_at >= datetime(2026, 1, 1)),
+    "doctors at a hospital": select(Doctor).where(Doctor.hospital_id == "alfred"),
+    "translation memory lookup": select(TranslationMemory).where(
+        TranslationMemory.target_language == "es",
+        TranslationMemory.source_hash.in_(["a" * 64, "b" * 64])
+    ),
+    "patient list page (name order, with age and last access)": patient_search_query("", 50, ("Jane Doe", "p1")),
+    "dashboard stats": counters_query([
+        ("hospital:alfred", "all", "total_accesses"),
+        ("hospital:alfred", "2026-10-17", "total_accesses"),
+        ("global", "all", "active_profiles"),
+    ]),
+}
+
+def full_scans(conn, statement) -> list:
+    """Hot tables the database would read in full to answer statement"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+
+    if conn.dialect.name == "postgresql":
+        # Tiny test tables make seq scans look cheap; with them priced out,
+        # a remaining Seq Scan means no index can serve the query
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+        # Partitions (emergency_access_logs_p202610, ..._default) count as their parent
+        scanned = {re.sub(r"_(p\d{6}|default)$", "", t) for t in re.findall(r"Seq Scan on (\w+)", plan)}
+        return sorted(scanned & HOT_TABLES)
+
+    if conn.dialect.name == "sqlite":
+        # "SCAN t" / "SEARCH t" without "USING ... INDEX" reads the whole table;
+        # joined tables appear under aliases such as emergency_contacts_1
+        details = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        matches = [re.match(r"(?:SCAN|SEARCH) (\w+)\b(?! USING)", d) for d in details]
+        scanned = {re.sub(r"_\d+$", "", m.group(1)) for m in matches if m}
+        return sorted(scanned & HOT_TABLES)
+
+    raise SystemExit(f"Query plan check not implemented for {conn.dialect.name}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fail when a hot-path query cannot use an index (EXPLAIN against DATABASE_URL)."
+    )
+    parser.add_argument("--migrate", action="store_true", help="Run migrations to head first (for throwaway CI databases)")
+    args = parser.parse_args()
+
+    if args.migrate:
+        from app.migrate import upgrade_database
+        upgrade_database()
+
+    failures = 0
+    with engine.connect() as conn:
+        for name, statement in HOT_PATH_QUERIES.items():
+            with conn.begin():
+                scans = full_scans(conn, statement)
+            if scans:
+                failures += 1
+                print(f"FAIL  {name}: full scan of {', '.join(scans)}")
+            else:
+                print(f"ok    {name}")
+
+    if failures:
+        print(f"{failures} hot-path queries cannot use an index")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
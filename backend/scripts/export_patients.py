@@ -0,0 +1,42 @@
+import sys
+import os
+import argparse
+import getpass
+import socket
+from datetime import datetime
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.services.audit_log import access_log_buffer
+from app.services.patient_export import PatientExporter
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export every patient (account, profile, contacts) as gzip-compressed NDJSON. "
+                    "The output can be loaded back with scripts/import_patients.py after gunzip. "
+                    "Each run is recorded in the access log."
+    )
+    parser.add_argument("output", help="Output file (.ndjson.gz); written to a temporary name first")
+    parser.add_argument("--updated-since", type=datetime.fromisoformat, help="Only profiles changed since this ISO time")
+    parser.add_argument("--chunk-size", type=int, default=settings.PATIENT_EXPORT_CHUNK_SIZE, help="Rows per cursor fetch")
+    parser.add_argument("--workers", type=int, default=settings.PATIENT_EXPORT_WORKERS, help="Decryption threads")
+    parser.add_argument("--compression-level", type=int, default=settings.PATIENT_EXPORT_COMPRESSION_LEVEL, help="gzip level 1-9")
+    args = parser.parse_args()
+
+    exporter = PatientExporter(args.chunk_size, args.workers, args.compression_level)
+    try:
+        stats = exporter.export_to_file(args.output, f"export_patients.py by {getpass.getuser()}@{socket.gethostname()}", args.updated_since)
+    finally:
+        # Write the audit row before exiting
+        access_log_buffer.stop()
+
+    print(f"{stats['rows']} patients -> {args.output} ({stats['bytes']} bytes)")
+    print(f"{stats['seconds']}s, {stats['rows_per_second']} rows/s")
+    if stats["failed"]:
+        print(f"{stats['failed']} profiles could not be decrypted and were left out")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
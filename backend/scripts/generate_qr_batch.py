@@ -0,0 +1,51 @@
+import sys
+import os
+import argparse
+import threading
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.qr_batch import KINDS, OUTPUT_FORMATS, qr_batch_runner
+
+def main():
+    parser = argparse.ArgumentParser(description="Render emergency QR codes or wallet cards for many patients.")
+    parser.add_argument("usernames_file", help="File with one username per line ('-' for stdin)")
+    parser.add_argument("--kind", choices=KINDS, default="qr", help="Bare QR codes or printable wallet cards")
+    parser.add_argument("--output", required=True, help="Output path (.zip or .pdf)")
+    args = parser.parse_args()
+
+    output_format = os.path.splitext(args.output)[1].lstrip(".").lower()
+    if output_format not in OUTPUT_FORMATS:
+        parser.error(f"--output must end in one of: {', '.join(OUTPUT_FORMATS)}")
+
+    source = sys.stdin if args.usernames_file == "-" else open(args.usernames_file)
+    with source:
+        usernames = [line.strip() for line in source if line.strip()]
+
+    job = qr_batch_runner.create_job(usernames, args.kind, output_format, path=args.output)
+    print(f"Rendering {len(job.usernames)} {args.kind}s on {qr_batch_runner.workers} processes...")
+
+    # Report progress while the job runs
+    finished = threading.Event()
+    def report():
+        while not finished.wait(2):
+            p = job.progress()
+            print(f"  {p['percent']}% ({p['completed']} done, {p['failed']} failed, {len(p['missing'])} unknown)")
+    threading.Thread(target=report, daemon=True).start()
+
+    try:
+        qr_batch_runner.run(job)
+    finally:
+        finished.set()
+        qr_batch_runner.shutdown()
+
+    p = job.progress()
+    print(f"{p['status']}: {p['completed']} rendered, {p['failed']} failed -> {args.output}")
+    if p["missing"]:
+        print(f"Unknown usernames: {', '.join(p['missing'])}")
+    if p["status"] != "completed":
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
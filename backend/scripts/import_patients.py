@@ -0,0 +1,59 @@
+import sys
+import os
+import argparse
+import io
+import threading
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.services.patient_import import IMPORT_FORMATS, PatientImportRunner
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk-create patients (account, profile, contacts) from a CSV or NDJSON file. "
+                    "Rows that fail are reported by line number; the rest are imported."
+    )
+    parser.add_argument("source", help="CSV or NDJSON file ('-' for stdin)")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=settings.PATIENT_IMPORT_BATCH_SIZE, help="Rows per insert transaction")
+    parser.add_argument("--workers", type=int, default=settings.PATIENT_IMPORT_WORKERS, help="Hashing/encryption threads")
+    args = parser.parse_args()
+
+    import_format = args.format or os.path.splitext(args.source)[1].lstrip(".").lower()
+    if import_format not in IMPORT_FORMATS:
+        parser.error(f"Cannot tell the format of {args.source}; pass --format")
+
+    runner = PatientImportRunner(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        max_reported_errors=sys.maxsize,
+        upload_dir=settings.PATIENT_IMPORT_UPLOAD_DIR,
+        retention_seconds=0
+    )
+    job = runner.create_job(import_format, path=args.source)
+
+    # Report progress while the job runs
+    finished = threading.Event()
+    def report():
+        while not finished.wait(5):
+            print(f"  {job.read} read, {job.imported} imported, {job.failed} failed")
+    threading.Thread(target=report, daemon=True).start()
+
+    lines = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="") if args.source == "-" else None
+    try:
+        runner.run(job, lines)
+    finally:
+        finished.set()
+
+    for error in sorted(job.errors, key=lambda e: e["line"]):
+        print(f"line {error['line']} ({error['username'] or '?'}): {error['error']}")
+    print(f"{job.status}: {job.imported} imported, {job.failed} failed of {job.read} read")
+    if job.error:
+        print(f"Error: {job.error}")
+    if job.status != "completed" or job.failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
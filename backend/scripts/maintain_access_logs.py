@@ -0,0 +1,31 @@
+import sys
+import os
+import argparse
+import json
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.services.access_log_maintenance import AccessLogMaintenance
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create upcoming access log partitions, roll up and remove rows past retention. "
+                    "Suitable for cron; concurrent runs are skipped on PostgreSQL."
+    )
+    parser.add_argument("--retention-days", type=int, default=settings.ACCESS_LOG_RETENTION_DAYS, help="Raw rows kept this long")
+    parser.add_argument("--archive-dir", default=settings.ACCESS_LOG_ARCHIVE_DIR, help="Write removed rows here as gzip NDJSON")
+    parser.add_argument("--partitions-ahead", type=int, default=settings.ACCESS_LOG_PARTITIONS_AHEAD, help="Future monthly partitions to keep ready")
+    args = parser.parse_args()
+
+    job = AccessLogMaintenance(
+        retention_days=args.retention_days,
+        partitions_ahead=args.partitions_ahead,
+        archive_dir=args.archive_dir,
+        interval_seconds=0
+    )
+    print(json.dumps(job.run_once(), indent=2))
+
+if __name__ == "__main__":
+    main()
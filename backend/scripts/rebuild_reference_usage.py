@@ -0,0 +1,22 @@
+import sys
+import os
+import argparse
+import json
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.reference_index import recount_usage
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recount how many profiles list each reference term (search popularity). "
+                    "Run once after migration 0008, then occasionally to correct drift."
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Profiles per cursor fetch")
+    args = parser.parse_args()
+
+    print(json.dumps(recount_usage(chunk_size=args.chunk_size), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import sys
+import os
+import argparse
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.key_rotation import KeyRotationJob
+from app.utils.encryption import keyring
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-encrypt all medical profiles under ENCRYPTION_ACTIVE_KEY_ID. "
+                    "Safe to interrupt: rerunning resumes from the checkpoint."
+    )
+    parser.add_argument("--checkpoint", default="key_rotation.checkpoint.json", help="Progress file used to resume")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per cursor fetch and commit")
+    parser.add_argument("--workers", type=int, default=4, help="Threads doing decrypt/re-encrypt")
+    parser.add_argument("--max-rows-per-second", type=float, default=2000, help="Throttle; 0 disables")
+    parser.add_argument("--force", action="store_true", help="Re-encrypt rows already on the active key")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    print(f"Rotating profiles to key '{keyring.active_key_id}'...")
+    job = KeyRotationJob(
+        checkpoint_path=args.checkpoint,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        max_rows_per_second=args.max_rows_per_second or None,
+        force=args.force
+    )
+    progress = job.run()
+    print(
+        f"Done: {progress['rotated']} rotated, {progress['skipped']} already current, {progress['failed']} failed, "
+        f"{progress['conflicts']} retried after concurrent edits."
+    )
+    if progress["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+from cryptography.fernet import Fernet
+
+# Add the parent directory to sys.path to resolve app imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read when app modules are first imported, so the test
+# environment has to be in place before any of them are
+TEST_DIR = tempfile.mkdtemp(prefix="crisislink-tests-")
+TEST_KEYS = {"k1": Fernet.generate_key().decode(), "k2": Fernet.generate_key().decode()}
+os.environ.update({
+    "ENVIRONMENT": "development",
+    "DATABASE_URL": f"sqlite:///{TEST_DIR}/test.db",
+    "ASYNC_DATABASE_URL": "",
+    "DB_REPLICA_URLS": "",
+    "DB_MIGRATE_ON_STARTUP": "false",
+    "ENCRYPTION_KEYS": ",".join(f"{kid}:{key}" for kid, key in TEST_KEYS.items()),
+    "ENCRYPTION_ACTIVE_KEY_ID": "k1",
+    "API_PUBLIC_URL": "http://testserver",
+    "PASSWORD_BCRYPT_ROUNDS": "4",
+    "ACCESS_LOG_MAINTENANCE_INTERVAL_SECONDS": "0",
+    "DASHBOARD_RECONCILE_INTERVAL_SECONDS": "0",
+    "REFERENCE_INDEX_REFRESH_SECONDS": "0",
+    "TRANSLATE_API_URL": "http://127.0.0.1:9/translate",
+    "OUTBOUND_HTTP_RETRIES": "0",
+    "PATIENT_IMPORT_UPLOAD_DIR": os.path.join(TEST_DIR, "imports"),
+    "QR_BATCH_OUTPUT_DIR": os.path.join(TEST_DIR, "qr"),
+    "TTS_CACHE_DIR": os.path.join(TEST_DIR, "tts"),
+})
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Fresh SQLite database at the latest migration"""
+    from app.migrate import upgrade_database
+
+    upgrade_database()
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    """API client with the app lifespan (background workers) running"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_patient(client):
+    """Registers a patient with a profile; returns its user_id and username"""
+    def make(full_name: str = "Test Patient", **profile) -> dict:
+        username = f"patient_{uuid.uuid4().hex[:10]}"
+        response = client.post(
+            "/api/auth/register/patient",
+            json={"username": username, "email": f"{username}@example.com", "password": "correct horse"}
+        )
+        assert response.status_code == 200, response.text
+        user_id = response.json()["user_id"]
+
+        response = client.post(f"/api/profiles/?user_id={user_id}", json={"full_name": full_name, **profile})
+        assert response.status_code == 200, response.text
+        return {"user_id": user_id, "username": username}
+
+    return make
@@ -0,0 +1,73 @@
+import uuid
+
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.models import EmergencyAccess
+from app.services import audit_log
+from app.services.audit_log import AccessLogBuffer
+
+
+def _buffer(**options) -> AccessLogBuffer:
+    return AccessLogBuffer(**{"max_queue": 10, "batch_size": 5, "flush_interval": 0.05, "max_attempts": 3, "retry_backoff": 0.01, **options})
+
+
+def _logged(responder: str) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(EmergencyAccess).where(EmergencyAccess.responder_info == responder))
+
+
+def _failing_sessions(monkeypatch, failures: int) -> list:
+    """SessionLocal whose first failures commits raise; returns the attempt log"""
+    attempts = []
+    real_session = audit_log.SessionLocal
+
+    def session():
+        db = real_session()
+        attempts.append(len(attempts) < failures)
+        if attempts[-1]:
+            def broken_commit():
+                raise RuntimeError("database unavailable")
+            db.commit = broken_commit
+        return db
+
+    monkeypatch.setattr(audit_log, "SessionLocal", session)
+    return attempts
+
+
+def test_failed_batch_is_retried_until_written(monkeypatch):
+    attempts = _failing_sessions(monkeypatch, failures=2)
+    responder = f"retry-{uuid.uuid4().hex[:8]}"
+    buffer = _buffer()
+    buffer.start()
+    for _ in range(3):
+        assert buffer.record(None, responder, "patient_export")
+    buffer.stop()
+
+    assert _logged(responder) == 3
+    assert attempts == [True, True, False]
+    assert buffer.stats()["retries"] == 2
+    assert (buffer.written, buffer.failed) == (3, 0)
+
+
+def test_batch_is_dropped_after_max_attempts(monkeypatch):
+    _failing_sessions(monkeypatch, failures=100)
+    responder = f"dropped-{uuid.uuid4().hex[:8]}"
+    buffer = _buffer()
+    buffer.record(None, responder, "patient_export")
+    buffer.stop()
+
+    assert _logged(responder) == 0
+    assert (buffer.written, buffer.failed, buffer.retries) == (0, 1, 2)
+
+
+def test_record_does_not_start_the_writer_and_full_queue_drops():
+    responder = f"queued-{uuid.uuid4().hex[:8]}"
+    buffer = _buffer(max_queue=2)
+    results = [buffer.record(None, responder, "patient_export") for _ in range(3)]
+
+    assert results == [True, True, False]
+    assert buffer._thread is None
+    assert buffer.dropped == 1
+    buffer.stop()
+    assert _logged(responder) == 2
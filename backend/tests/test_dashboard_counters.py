@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+
+from app.database import engine
+from app.models import DashboardCounter, EmergencyAccess
+from app.services.audit_log import access_log_buffer
+from app.services.dashboard_counters import (
+    ACTIVE_PROFILES, ALL_TIME, GLOBAL_SCOPE, TOTAL_ACCESSES, DashboardCounterReconciler, day_bucket, hospital_scope
+)
+
+HOSPITAL = hospital_scope("alfred")
+
+
+def _counter(scope: str, bucket: str, metric: str = TOTAL_ACCESSES) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(DashboardCounter.value).where(
+            DashboardCounter.scope == scope, DashboardCounter.bucket == bucket, DashboardCounter.metric == metric
+        )) or 0
+
+
+def _snapshot() -> dict:
+    today = day_bucket(datetime.utcnow())
+    return {
+        "total": _counter(GLOBAL_SCOPE, ALL_TIME),
+        "today": _counter(GLOBAL_SCOPE, today),
+        "hospital_total": _counter(HOSPITAL, ALL_TIME),
+        "hospital_today": _counter(HOSPITAL, today),
+        "profiles": _counter(GLOBAL_SCOPE, ALL_TIME, ACTIVE_PROFILES),
+    }
+
+
+def _reconciler() -> DashboardCounterReconciler:
+    return DashboardCounterReconciler(days=7, retention_days=90, interval_seconds=0)
+
+
+def _corrupt(scope: str, bucket: str, metric: str, value: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(update(DashboardCounter).where(
+            DashboardCounter.scope == scope, DashboardCounter.bucket == bucket, DashboardCounter.metric == metric
+        ).values(value=value))
+
+
+def test_scans_and_new_profiles_move_the_counters(client, make_patient):
+    before = _snapshot()
+    patient = make_patient()
+    assert client.get(f"/api/emergency/{patient['username']}?hospital_id=alfred").status_code == 200
+    assert client.get(f"/api/emergency/{patient['username']}").status_code == 200
+    # Write out the buffered scans (and their counter increments)
+    access_log_buffer.stop()
+    access_log_buffer.start()
+
+    after = _snapshot()
+    assert {name: after[name] - before[name] for name in after} == {
+        "total": 2, "today": 2, "hospital_total": 1, "hospital_today": 1, "profiles": 1
+    }
+    stats = client.get("/api/dashboard/stats?hospital_id=alfred").json()
+    assert (stats["total_accesses"], stats["accesses_today"]) == (after["hospital_total"], after["hospital_today"])
+
+
+def test_reconcile_restores_corrupted_counters(make_patient):
+    make_patient()
+    expected = _snapshot()
+
+    _corrupt(GLOBAL_SCOPE, ALL_TIME, TOTAL_ACCESSES, 999_999)
+    _corrupt(GLOBAL_SCOPE, ALL_TIME, ACTIVE_PROFILES, -5)
+    result = _reconciler().run_once()
+
+    assert _snapshot() == expected
+    assert result["corrected"][f"{GLOBAL_SCOPE}/{ACTIVE_PROFILES}"] == expected["profiles"] + 5
+
+
+def test_reconcile_counts_scans_the_increments_missed(make_patient):
+    patient = make_patient()
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    _reconciler().run_once()
+    before = _snapshot()
+    missed_day = _counter(HOSPITAL, day_bucket(yesterday))
+
+    # A scan written without its counter increment
+    with engine.begin() as conn:
+        conn.execute(insert(EmergencyAccess).values(
+            user_id=patient["user_id"], accessed_at=yesterday, access_type="qr_scan", hospital_id="alfred"
+        ))
+    _reconciler().run_once()
+
+    after = _snapshot()
+    assert (after["total"], after["hospital_total"]) == (before["total"] + 1, before["hospital_total"] + 1)
+    assert _counter(HOSPITAL, day_bucket(yesterday)) == missed_day + 1
@@ -0,0 +1,123 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import update
+
+from app.database import engine
+from app.models import MedicalProfile
+from app.services.emergency_cache import invalidate_view
+from app.utils.encryption import (
+    DERIVED_KEY_ID,
+    UNREADABLE_MARKER,
+    Keyring,
+    decrypt_medical_data,
+    derive_key,
+    keyring,
+    load_keyring,
+)
+
+
+@pytest.fixture
+def keys():
+    return {"old": Fernet.generate_key(), "new": Fernet.generate_key()}
+
+
+def test_envelope_names_the_active_key(keys):
+    ring = Keyring(keys, "new")
+    envelope = ring.encrypt(b"secret")
+
+    assert envelope.startswith("v1:new:")
+    assert ring.key_id_of(envelope) == "new"
+    assert ring.decrypt(envelope) == b"secret"
+    assert not ring.needs_rotation(envelope)
+
+
+def test_rotated_keyring_still_reads_old_envelopes(keys):
+    envelope = Keyring(keys, "old").encrypt(b"before rotation")
+    rotated = Keyring(keys, "new")
+
+    assert rotated.decrypt(envelope) == b"before rotation"
+    assert rotated.needs_rotation(envelope)
+    assert rotated.encrypt(b"after").startswith("v1:new:")
+
+
+def test_bare_fernet_tokens_from_before_envelopes_are_readable(keys):
+    legacy = Fernet(keys["old"]).encrypt(b"legacy").decode()
+    ring = Keyring(keys, "new")
+
+    assert ring.decrypt(legacy) == b"legacy"
+    assert ring.key_id_of(legacy) is None
+    assert ring.needs_rotation(legacy)
+
+
+def test_unknown_key_id_is_an_error(keys):
+    envelope = Keyring({"gone": Fernet.generate_key()}, "gone").encrypt(b"x")
+    with pytest.raises(InvalidToken):
+        Keyring(keys, "new").decrypt(envelope)
+
+
+def test_active_key_must_be_in_the_keyring(keys):
+    with pytest.raises(ValueError):
+        Keyring(keys, "missing")
+
+
+def test_load_keyring_parses_configuration(keys):
+    configured = ",".join(f"{kid}:{key.decode()}" for kid, key in keys.items())
+    ring = load_keyring(configured, "old", "secret", "production")
+
+    assert set(ring.ciphers) == {"old", "new"}
+    assert ring.active_key_id == "old"
+
+
+def test_missing_keyring_only_falls_back_in_development():
+    with pytest.raises(RuntimeError):
+        load_keyring("", "", "secret", "production")
+
+    ring = load_keyring("", "", "secret", "development")
+    assert ring.active_key_id == DERIVED_KEY_ID
+
+
+def test_derived_key_can_be_kept_for_reading(keys):
+    sealed = Keyring({DERIVED_KEY_ID: derive_key("secret")}, DERIVED_KEY_ID).encrypt(b"dev data")
+    configured = f"new:{keys['new'].decode()}"
+
+    assert set(load_keyring(configured, "", "secret", "production").ciphers) == {"new"}
+    ring = load_keyring(configured, "new", "secret", "production", read_derived_key=True)
+    assert ring.decrypt(sealed) == b"dev data"
+    assert ring.active_key_id == "new"
+
+
+def _profile(**columns):
+    defaults = {"id": "p1", "medical_data": None, "allergies": None, "medications": None, "medical_conditions": None}
+    return SimpleNamespace(**{**defaults, **columns})
+
+
+def test_medical_data_from_legacy_per_field_columns():
+    profile = _profile(allergies=keyring.encrypt(json.dumps(["Latex"]).encode()))
+    assert decrypt_medical_data(profile) == {
+        "allergies": ["Latex"], "medications": [], "medical_conditions": [], "unreadable": False
+    }
+
+
+def test_unreadable_medical_data_is_flagged_not_empty():
+    medical = decrypt_medical_data(_profile(medical_data="v1:k1:not-a-token"))
+
+    assert medical["unreadable"] is True
+    assert medical["allergies"] == [UNREADABLE_MARKER]
+    assert medical["medications"] == [UNREADABLE_MARKER]
+
+
+
+def test_emergency_view_surfaces_unreadable_data(client, make_patient):
+    patient = make_patient(allergies=["Penicillin"])
+    with engine.begin() as conn:
+        conn.execute(
+            update(MedicalProfile).where(MedicalProfile.user_id == patient["user_id"]).values(medical_data="v1:k1:corrupt")
+        )
+    invalidate_view(patient["username"])
+
+    view = client.get(f"/api/emergency/{patient['username']}").json()
+    assert view["medical_data_unreadable"] is True
+    assert view["allergies"] == [UNREADABLE_MARKER]
@@ -0,0 +1,99 @@
+from sqlalchemy import update
+
+from app.database import engine
+from app.models import MedicalProfile
+from app.routes.emergency import EMERGENCY_CACHE_CONTROL, UNTRANSLATED_CACHE_CONTROL
+from app.utils.encryption import encrypt_medical_data
+
+
+def test_emergency_view_revalidates_with_etag(client, make_patient):
+    patient = make_patient(allergies=["Penicillin"])
+    url = f"/api/emergency/{patient['username']}"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.json()["allergies"] == ["Penicillin"]
+    assert first.headers["cache-control"] == EMERGENCY_CACHE_CONTROL
+    etag = first.headers["etag"]
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert revalidated.content == b""
+
+
+def test_profile_update_invalidates_emergency_view(client, make_patient):
+    patient = make_patient(allergies=["Penicillin"])
+    url = f"/api/emergency/{patient['username']}"
+    etag = client.get(url).headers["etag"]
+
+    response = client.put(
+        f"/api/profiles/{patient['user_id']}",
+        json={"full_name": "Test Patient", "allergies": ["Latex"], "medications": ["Insulin"]}
+    )
+    assert response.status_code == 200
+
+    # The old ETag no longer matches and the cached view is not served
+    after = client.get(url, headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["etag"] != etag
+    assert after.json()["allergies"] == ["Latex"]
+    assert after.json()["medications"] == ["Insulin"]
+
+
+def test_profile_read_revalidates_and_changes_after_update(client, make_patient):
+    patient = make_patient()
+    url = f"/api/profiles/{patient['user_id']}"
+
+    etag = client.get(url).headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    client.put(url, json={"full_name": "Renamed Patient"})
+    after = client.get(url, headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.json()["full_name"] == "Renamed Patient"
+
+
+def test_etags_differ_per_language(client, make_patient, monkeypatch):
+    from app.services import translator
+
+    async def fake_translate(text, target_language):
+        return f"{text} [{target_language}]"
+
+    monkeypatch.setattr(translator, "_translate_one", fake_translate)
+    patient = make_patient(allergies=["Pollen"])
+    url = f"/api/emergency/{patient['username']}"
+
+    english = client.get(url)
+    spanish = client.get(f"{url}?language=es")
+    assert spanish.json()["allergies"] == ["Pollen [es]"]
+    assert spanish.headers["etag"] != english.headers["etag"]
+    assert client.get(f"{url}?language=es", headers={"If-None-Match": english.headers["etag"]}).status_code == 200
+
+
+def test_untranslated_fallback_is_not_cacheable(client, make_patient):
+    # TRANSLATE_API_URL points at a closed port: every string falls back to English
+    patient = make_patient(allergies=["Shellfish"])
+    response = client.get(f"/api/emergency/{patient['username']}?language=fr")
+
+    assert response.status_code == 200
+    assert response.json()["allergies"] == ["Shellfish"]
+    assert "etag" not in response.headers
+    assert response.headers["cache-control"] == UNTRANSLATED_CACHE_CONTROL
+
+
+def test_profile_saved_by_another_worker_replaces_the_cached_view(client, make_patient):
+    patient = make_patient(allergies=["Penicillin"])
+    url = f"/api/emergency/{patient['username']}"
+    etag = client.get(url).headers["etag"]  # now cached in this process
+
+    # Written without this process's invalidate_view, as another worker would
+    with engine.begin() as conn:
+        conn.execute(update(MedicalProfile).where(MedicalProfile.user_id == patient["user_id"]).values(
+            medical_data=encrypt_medical_data(["Latex"], [], [])
+        ))
+
+    after = client.get(url, headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.json()["allergies"] == ["Latex"]
+    assert client.get(f"{url}/voice").json()["text"].count("Latex") == 1
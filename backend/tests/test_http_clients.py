@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import ai_voice, translator
+from app.services.http_clients import HTTPClientManager, UpstreamConfig, http_clients
+
+
+@pytest.fixture
+def upstream():
+    """Injects MockTransport clients for translate and TTS; yields the requests they receive"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url == settings.TRANSLATE_API_URL:
+            return httpx.Response(200, json={"translated_text": json.loads(request.content)["text"].upper()})
+        return httpx.Response(200, content=b"ID3 audio")
+
+    for name in ("translate", "tts"):
+        http_clients.set_client(name, httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    yield requests
+    for name in ("translate", "tts"):
+        http_clients.set_client(name, None)
+
+
+def test_callers_use_the_injected_client(upstream):
+    assert asyncio.run(translator._translate_one("asthma", "pt")) == "ASTHMA"
+    assert asyncio.run(ai_voice.text_to_speech("Blood type O", "pt")) == b"ID3 audio"
+
+    translate, tts = upstream
+    assert (str(translate.url), json.loads(translate.content)["target_language"]) == (settings.TRANSLATE_API_URL, "pt")
+    assert (str(tts.url), json.loads(tts.content)["text"]) == (settings.TTS_API_URL, "Blood type O")
+
+
+def test_injected_client_is_kept_by_start_and_closed_by_close():
+    manager = HTTPClientManager({"tts": UpstreamConfig(), "translate": UpstreamConfig()})
+    injected = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(204)))
+    manager.set_client("tts", injected)
+
+    async def lifespan():
+        await manager.start()
+        assert manager.get("tts") is injected
+        assert manager.get("translate") is not injected
+        await manager.close()
+
+    asyncio.run(lifespan())
+    assert injected.is_closed
+
+    # After close a fresh pooled client replaces it
+    assert manager.get("tts") is not injected
+    asyncio.run(manager.close())
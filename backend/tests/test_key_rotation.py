@@ -0,0 +1,111 @@
+import json
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database import engine
+from app.models import MedicalProfile
+from app.services.key_rotation import KeyRotationJob
+from app.utils.encryption import encrypt_medical_data, keyring, open_medical_data
+
+
+@pytest.fixture
+def job(tmp_path):
+    def make(**options) -> KeyRotationJob:
+        return KeyRotationJob(checkpoint_path=str(tmp_path / "rotation.json"), batch_size=2, max_rows_per_second=None, **options)
+    return make
+
+
+def _sealed(user_id: str) -> str:
+    with engine.connect() as conn:
+        return conn.execute(select(MedicalProfile.medical_data).where(MedicalProfile.user_id == user_id)).scalar()
+
+
+def _updated_at(user_id: str):
+    with engine.connect() as conn:
+        return conn.execute(select(MedicalProfile.updated_at).where(MedicalProfile.user_id == user_id)).scalar()
+
+
+def test_rotation_reseals_every_profile_under_the_active_key(make_patient, job, tmp_path, monkeypatch):
+    patients = [make_patient(allergies=[f"Allergy {n}"]) for n in range(3)]
+    assert all(keyring.key_id_of(_sealed(p["user_id"])) == "k1" for p in patients)
+
+    stamps = [_updated_at(p["user_id"]) for p in patients]
+    monkeypatch.setattr(keyring, "active_key_id", "k2")
+    progress = job().run()
+
+    assert progress["rotated"] >= 3
+    for n, patient in enumerate(patients):
+        sealed = _sealed(patient["user_id"])
+        assert keyring.key_id_of(sealed) == "k2"
+        assert open_medical_data(sealed)["allergies"] == [f"Allergy {n}"]
+
+    # Content is unchanged, so the profile keeps its version (ETag)
+    assert all(_updated_at(p["user_id"]) == before for p, before in zip(patients, stamps))
+
+    # A run from scratch finds nothing left to do
+    (tmp_path / "rotation.json").unlink()
+    assert job().run()["rotated"] == 0
+
+
+def test_rotation_moves_legacy_columns_into_the_envelope(make_patient, job):
+    patient = make_patient()
+    with engine.begin() as conn:
+        conn.execute(update(MedicalProfile).where(MedicalProfile.user_id == patient["user_id"]).values(
+            medical_data=None,
+            allergies=keyring.encrypt(json.dumps(["Latex"]).encode())
+        ))
+
+    job(force=True).run()
+
+    with engine.connect() as conn:
+        row = conn.execute(select(MedicalProfile).where(MedicalProfile.user_id == patient["user_id"])).mappings().one()
+    assert row["allergies"] is None
+    assert open_medical_data(row["medical_data"])["allergies"] == ["Latex"]
+
+
+def test_concurrent_edit_wins_over_rotation(make_patient, job, monkeypatch):
+    patient = make_patient(allergies=["Before"])
+    with engine.connect() as conn:
+        profile_id = conn.scalar(select(MedicalProfile.id).where(MedicalProfile.user_id == patient["user_id"]))
+    original_reseal = KeyRotationJob._reseal
+    raced = []
+
+    def reseal_racing_a_save(self, row):
+        envelope = original_reseal(self, row)
+        if row.id == profile_id and not raced:
+            # A profile save lands between the job's read and its write
+            raced.append(True)
+            with engine.begin() as conn:
+                conn.execute(update(MedicalProfile).where(MedicalProfile.user_id == patient["user_id"]).values(
+                    medical_data=encrypt_medical_data(["Saved meanwhile"], [], [])
+                ))
+        return envelope
+
+    monkeypatch.setattr(KeyRotationJob, "_reseal", reseal_racing_a_save)
+    progress = job(force=True).run()
+
+    assert raced
+    assert progress["conflicts"] == 1
+    assert open_medical_data(_sealed(patient["user_id"]))["allergies"] == ["Saved meanwhile"]
+
+
+def test_checkpoint_resumes_after_the_last_batch(make_patient, job, tmp_path, monkeypatch):
+    make_patient()
+    monkeypatch.setattr(keyring, "active_key_id", "k2")
+    first = job(force=True)
+    first.run()
+    saved = json.loads((tmp_path / "rotation.json").read_text())
+    assert saved["last_id"] == first.progress["last_id"]
+    assert saved["key_id"] == "k2"
+
+    resumed = job()
+    resumed.load_checkpoint()
+    assert resumed.progress["last_id"] == saved["last_id"]
+    assert resumed.run()["rotated"] == first.progress["rotated"]  # nothing after the checkpoint
+
+    # A checkpoint for another key is ignored
+    (tmp_path / "rotation.json").write_text(json.dumps({**saved, "key_id": "k1"}))
+    fresh = job()
+    fresh.load_checkpoint()
+    assert fresh.progress["last_id"] is None
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from app.services.notifications import NotificationDispatcher, SMSGateway
+
+
+class FakeGateway(SMSGateway):
+    """Local SMS provider: records sends, fails the first failures per phone, takes delay per send"""
+    name = "fake"
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.sent = []
+        self.attempts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, phone: str, message: str) -> str:
+        self.attempts.setdefault(phone, []).append(time.monotonic())
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if len(self.attempts[phone]) <= self.failures:
+                raise RuntimeError("gateway unavailable")
+            self.sent.append((phone, message))
+            return f"sid-{len(self.sent)}"
+        finally:
+            self.in_flight -= 1
+
+
+def _contacts(count: int) -> list:
+    return [{"phone": f"+23855501{n:02d}", "priority": n + 1} for n in range(count)]
+
+
+def _dispatcher(gateway: SMSGateway, **options) -> NotificationDispatcher:
+    return NotificationDispatcher(gateway=gateway, **{"workers": 2, "retry_base_seconds": 0.05, **options})
+
+
+def test_repeat_alerts_within_the_window_are_deduplicated():
+    gateway = FakeGateway()
+
+    async def scenario():
+        dispatcher = _dispatcher(gateway, dedupe_window_seconds=60)
+        accepted = [dispatcher.submit("patient-1", _contacts(2), "Ana") for _ in range(3)]
+        accepted.append(dispatcher.submit("patient-2", _contacts(1), "Rui"))
+        await dispatcher.stop()
+        return accepted, dispatcher.stats()
+
+    accepted, stats = asyncio.run(scenario())
+    assert accepted == [True, False, False, True]
+    assert (stats["submitted"], stats["deduplicated"], stats["sent"]) == (2, 2, 3)
+    assert "Ana has activated their emergency profile" in gateway.sent[0][1]
+
+
+def test_failed_sends_are_retried_with_backoff():
+    gateway = FakeGateway(failures=2)
+
+    async def scenario():
+        dispatcher = _dispatcher(gateway, max_attempts=3)
+        dispatcher.submit("patient-1", _contacts(1), "Ana")
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    first, second, third = gateway.attempts["+2385550100"]
+    assert second - first >= 0.05
+    assert third - second >= 0.1
+    assert (stats["sent"], stats["retries"], stats["failed"]) == (1, 2, 0)
+
+
+def test_send_counts_as_failed_after_max_attempts():
+    gateway = FakeGateway(failures=10)
+
+    async def scenario():
+        dispatcher = _dispatcher(gateway, max_attempts=2)
+        dispatcher.submit("patient-1", _contacts(2), "Ana")
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["sent"], stats["retries"], stats["failed"]) == (0, 2, 2)
+    assert all(len(attempts) == 2 for attempts in gateway.attempts.values())
+
+
+def test_sends_per_provider_are_capped():
+    gateway = FakeGateway(delay=0.02)
+
+    async def scenario():
+        dispatcher = _dispatcher(gateway, workers=4, provider_concurrency=3)
+        for n in range(4):
+            dispatcher.submit(f"patient-{n}", _contacts(5), "Ana")
+        await dispatcher.stop()
+
+    asyncio.run(scenario())
+    assert len(gateway.sent) == 20
+    assert gateway.max_in_flight == 3
+
+
+def test_stop_drains_the_queue():
+    gateway = FakeGateway(delay=0.01)
+
+    async def scenario():
+        dispatcher = _dispatcher(gateway, workers=1)
+        for n in range(5):
+            dispatcher.submit(f"patient-{n}", _contacts(2), "Ana")
+        await dispatcher.stop()
+        return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert len(gateway.sent) == 10
+    assert (stats["queue_depth"], stats["workers"]) == (0, 0)
@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("O'Brien, Ann", "3f1c")
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == ("O'Brien, Ann", "3f1c")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", encode_cursor("only one"), encode_cursor("a", "b", "c"), "e30"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, 2)
+    assert error.value.status_code == 400
+
+
+def _pages(client, search, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"search": search, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/dashboard/patients", params=params).json()
+        pages.append(body)
+        cursor = body["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_patient_pages_cover_every_match_once_in_name_order(client, make_patient):
+    token = uuid.uuid4().hex[:8]
+    # Repeated names: only the id tie-breaker keeps pages from overlapping
+    names = [f"Keyset {token} {letter}" for letter in "aabbbcd"]
+    ids = {make_patient(name)["user_id"] for name in names}
+
+    pages = _pages(client, token, limit=3)
+    rows = [patient for page in pages for patient in page["patients"]]
+
+    assert [len(page["patients"]) for page in pages] == [3, 3, 1]
+    assert sorted(patient["id"] for patient in rows) == sorted(ids)
+    assert [patient["name"] for patient in rows] == sorted(names)
+    # The total is only computed for the first page
+    assert pages[0]["total_count"] == len(names)
+    assert all(page["total_count"] is None for page in pages[1:])
+
+
+def test_exactly_full_last_page_has_no_cursor(client, make_patient):
+    token = uuid.uuid4().hex[:8]
+    for letter in "ab":
+        make_patient(f"Boundary {token} {letter}")
+
+    body = client.get("/api/dashboard/patients", params={"search": token, "limit": 2}).json()
+    assert len(body["patients"]) == 2
+    assert body["next_cursor"] is None
+
+
+def test_cursor_after_last_row_returns_empty_page(client, make_patient):
+    token = uuid.uuid4().hex[:8]
+    make_patient(f"Tail {token}")
+
+    cursor = encode_cursor(f"Tail {token}￿", "")
+    body = client.get("/api/dashboard/patients", params={"search": token, "cursor": cursor}).json()
+    assert body["patients"] == []
+    assert body["next_cursor"] is None
+
+
+def test_bad_cursor_is_a_client_error(client):
+    assert client.get("/api/dashboard/patients", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,15 @@
+import asyncio
+
+from app.utils import passwords
+
+
+def test_hashing_works_again_after_the_pool_shuts_down():
+    hashed = passwords.hash_password_pooled("before")
+    passwords.shutdown_hash_executor()
+    passwords.shutdown_hash_executor()  # a second shutdown is harmless
+
+    assert passwords.verify_password("before", hashed)
+    assert passwords.verify_password("after", passwords.hash_password_pooled("after"))
+
+    passwords.shutdown_hash_executor()
+    assert asyncio.run(passwords.verify_and_rehash("before", hashed)) == (True, None)
@@ -0,0 +1,103 @@
+import gzip
+import json
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.database import engine
+from app.models import EmergencyAccess
+from app.services.audit_log import access_log_buffer
+from app.services.patient_export import EXPORT_ACCESS_TYPE, PatientExporter
+from app.services.patient_import import PatientImportJob, PatientImportRunner
+
+
+def _exporter() -> PatientExporter:
+    return PatientExporter(chunk_size=2, workers=2, compression_level=6)
+
+
+def _export(actor: str, updated_since: datetime = None) -> dict:
+    """Exported records by username"""
+    data = b"".join(_exporter().stream(actor, updated_since))
+    return {record["username"]: record for record in map(json.loads, gzip.decompress(data).decode().splitlines())}
+
+
+def _audit_rows(actor: str) -> list:
+    # Write out the buffered audit rows
+    access_log_buffer.stop()
+    access_log_buffer.start()
+    with engine.connect() as conn:
+        return conn.scalars(
+            select(EmergencyAccess.responder_info)
+            .where(EmergencyAccess.access_type == EXPORT_ACCESS_TYPE, EmergencyAccess.responder_info.startswith(actor))
+        ).all()
+
+
+def _import(*records) -> PatientImportJob:
+    runner = PatientImportRunner(batch_size=10, workers=2, max_reported_errors=10, upload_dir="", retention_seconds=60)
+    return runner.run(runner.create_job("ndjson", path="unused"), [json.dumps(record) for record in records])
+
+
+def _renamed(record: dict) -> dict:
+    username = f"copy_{uuid.uuid4().hex[:10]}"
+    return {**record, "username": username, "email": f"{username}@example.com"}
+
+
+def test_export_loads_back_with_the_patient_import():
+    source = _renamed({
+        "profile": {
+            "full_name": "Round Trip", "blood_type": "O+", "allergies": ["Latex"],
+            "medications": ["Insulin"], "dnr_status": True, "languages": ["Portuguese"]
+        },
+        "contacts": [
+            {"name": "Rui", "relation": "Brother", "phone": "+2385550101", "priority": 1},
+            {"name": "Eva", "relation": "Friend", "phone": "+2385550102", "email": "eva@example.com", "priority": 2}
+        ]
+    })
+    assert _import(source).imported == 1
+    exported = _export("test")[source["username"]]
+
+    assert exported["profile"]["allergies"] == ["Latex"]
+    assert [contact["name"] for contact in exported["contacts"]] == ["Rui", "Eva"]
+
+    # As exported, every account is already registered
+    assert _import(exported).errors[0]["error"] == "Username already registered"
+
+    # Under a new account it comes back identical
+    copy = _renamed(exported)
+    job = _import(copy)
+    assert (job.imported, job.failed) == (1, 0)
+
+    reimported = _export("test")[copy["username"]]
+    for key in ("full_name", "blood_type", "allergies", "medications", "medical_conditions", "dnr_status", "organ_donor", "languages"):
+        assert reimported["profile"][key] == exported["profile"][key]
+    assert reimported["contacts"] == exported["contacts"]
+
+
+def test_updated_since_limits_the_export(make_patient):
+    before = make_patient()
+    since = datetime.utcnow()
+    after = make_patient()
+
+    exported = _export("test", updated_since=since)
+    assert after["username"] in exported
+    assert before["username"] not in exported
+
+
+def test_every_export_leaves_an_audit_row(make_patient):
+    for _ in range(3):
+        make_patient()
+
+    actor = f"auditor-{uuid.uuid4().hex[:8]}"
+    _export(actor)
+    [completed] = _audit_rows(actor)
+    assert completed.startswith(f"{actor}: completed,")
+    assert "(all profiles)" in completed
+
+    # An export abandoned part way is recorded too
+    cancelled_actor = f"{actor}-cancelled"
+    blocks = _exporter().stream(cancelled_actor)
+    next(blocks)
+    blocks.close()
+    [cancelled] = _audit_rows(cancelled_actor)
+    assert cancelled.startswith(f"{cancelled_actor}: cancelled,")
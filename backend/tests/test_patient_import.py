@@ -0,0 +1,134 @@
+import json
+import time
+import uuid
+
+from sqlalchemy import insert, select
+
+from app.database import engine
+from app.models import EmergencyContact, MedicalProfile, User
+from app.services.patient_import import PatientImportRunner, read_csv
+from app.utils.encryption import decrypt_medical_data
+
+
+def _runner(batch_size=10) -> PatientImportRunner:
+    return PatientImportRunner(batch_size=batch_size, workers=2, max_reported_errors=100, upload_dir="", retention_seconds=60)
+
+
+def _record(username=None, **overrides) -> dict:
+    username = username or f"import_{uuid.uuid4().hex[:10]}"
+    return {
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": "correct horse",
+        "profile": {"full_name": f"Imported {username}", "allergies": ["Penicillin"]},
+        "contacts": [{"name": "Next of Kin", "relation": "Sibling", "phone": "+2385550100", "priority": 1}],
+        **overrides
+    }
+
+
+def _ndjson(*records) -> list:
+    return [record if isinstance(record, str) else json.dumps(record) for record in records]
+
+
+def _errors(job) -> dict:
+    return {error["line"]: error["error"] for error in job.errors}
+
+
+def test_valid_rows_are_imported_with_profile_and_contacts():
+    records = [_record() for _ in range(3)]
+    runner = _runner(batch_size=2)
+    job = runner.run(runner.create_job("ndjson", path="unused"), _ndjson(*records))
+
+    assert job.status == "completed"
+    assert (job.read, job.imported, job.failed) == (3, 3, 0)
+    with engine.connect() as conn:
+        user_id = conn.scalar(select(User.id).where(User.username == records[0]["username"]))
+        profile = conn.execute(select(MedicalProfile).where(MedicalProfile.user_id == user_id)).one()
+        contacts = conn.scalars(select(EmergencyContact.name).where(EmergencyContact.user_id == user_id)).all()
+    assert decrypt_medical_data(profile)["allergies"] == ["Penicillin"]
+    assert contacts == ["Next of Kin"]
+
+
+def test_bad_rows_are_reported_by_line_and_the_rest_imported(make_patient):
+    existing = make_patient()
+    duplicate_in_file = _record()
+    lines = _ndjson(
+        _record(),
+        "{not json",
+        _record(email="not-an-email"),
+        _record(username=existing["username"]),
+        duplicate_in_file,
+        _record(email=duplicate_in_file["email"]),
+        "",
+        _record(),
+    )
+    runner = _runner()
+    job = runner.run(runner.create_job("ndjson", path="unused"), lines)
+
+    assert job.status == "completed"
+    assert (job.read, job.imported, job.failed) == (7, 3, 4)
+    errors = _errors(job)
+    assert errors[2].startswith("Invalid JSON")
+    assert errors[3].startswith("email:")
+    assert errors[4] == "Username already registered"
+    assert errors[6] == "Email already registered"
+    assert job.progress()["errors_truncated"] is False
+
+
+def test_row_taken_between_validation_and_write_falls_back_row_by_row(monkeypatch):
+    records = [_record() for _ in range(3)]
+    raced = records[1]
+    original_validate = PatientImportRunner._validate
+
+    def validate_then_concurrent_signup(self, job, batch):
+        free = original_validate(self, job, batch)
+        # Someone registers the same username before the batch is written
+        with engine.begin() as conn:
+            conn.execute(insert(User).values(
+                id=str(uuid.uuid4()), username=raced["username"], email=f"other-{raced['email']}",
+                hashed_password="!", user_type="patient"
+            ))
+        return free
+
+    monkeypatch.setattr(PatientImportRunner, "_validate", validate_then_concurrent_signup)
+    runner = _runner()
+    job = runner.run(runner.create_job("ndjson", path="unused"), _ndjson(*records))
+
+    assert (job.imported, job.failed) == (2, 1)
+    assert job.errors == [{"line": 2, "username": raced["username"], "error": "Username or email already registered"}]
+    with engine.connect() as conn:
+        imported = conn.scalars(select(User.username).where(User.username.in_([r["username"] for r in records]))).all()
+    assert sorted(imported) == sorted(r["username"] for r in records)
+
+
+def test_csv_rows_become_nested_records():
+    lines = [
+        "username,email,full_name,allergies,dnr_status,contact1_name,contact1_phone,contact2_name,contact2_priority\n",
+        "ana,ana@example.com,Ana Silva,Latex; Pollen ,yes,Rui,+238555,Eva,5\n",
+        "extra,extra@example.com,Too Many,,,,,,,surplus\n",
+    ]
+    (_, record, error), (bad_line, _, bad_error) = read_csv(lines)
+
+    assert error is None
+    assert record["profile"]["allergies"] == ["Latex", "Pollen"]
+    assert record["profile"]["dnr_status"] is True
+    assert [(c["name"], c["priority"]) for c in record["contacts"]] == [("Rui", 1), ("Eva", "5")]
+    assert (bad_line, bad_error) == (3, "More fields than the header")
+
+
+def test_upload_endpoint_runs_the_import_in_the_background(client):
+    records = [_record(), _record(email="broken")]
+    response = client.post(
+        "/api/profiles/import", content="\n".join(_ndjson(*records)), headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 202
+
+    status_url = response.json()["status_url"]
+    for _ in range(100):
+        progress = client.get(status_url).json()
+        if progress["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.05)
+    assert progress["status"] == "completed"
+    assert (progress["imported"], progress["failed"]) == (1, 1)
+    assert client.get("/api/profiles/import/unknown").status_code == 404
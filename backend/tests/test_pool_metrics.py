@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from app.database import PoolMetrics, engine, metered_pool
+
+
+def test_checkouts_checkins_and_overflow_are_counted(tmp_path):
+    metrics = PoolMetrics()
+    metered = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=metered_pool(QueuePool, metrics), pool_size=1, max_overflow=1
+    )
+    first, second = metered.connect(), metered.connect()
+    stats = metrics.stats(metered.pool)
+    assert (stats["checkouts"], stats["checkins"], stats["overflow_events"]) == (2, 0, 1)
+    assert (stats["checked_out"], stats["overflow"]) == (2, 1)
+
+    first.close()
+    second.close()
+    stats = metrics.stats(metered.pool)
+    assert (stats["checkouts"], stats["checkins"], stats["checked_out"]) == (2, 2, 0)
+    assert stats["wait_ms_histogram"]["le_inf"] == 2
+    metered.dispose()
+
+
+def test_pool_counters_are_reported_on_metrics(client):
+    before = client.get("/metrics").json()["db_pool"]["background"]
+
+    # One more connection than the pool holds forces an overflow checkout
+    held = [engine.connect() for _ in range(engine.pool.size() + 1)]
+    during = client.get("/metrics").json()["db_pool"]["background"]
+    for connection in held:
+        connection.close()
+    after = client.get("/metrics").json()["db_pool"]["background"]
+
+    assert during["checkouts"] - before["checkouts"] >= len(held)
+    assert during["overflow_events"] - before["overflow_events"] >= 1
+    assert during["checked_out"] >= len(held)
+    assert after["checkins"] - before["checkins"] >= len(held)
+    assert after["checked_out"] <= during["checked_out"] - len(held)
@@ -0,0 +1,82 @@
+import uuid
+
+from sqlalchemy import select
+
+from app.database import engine
+from app.models import QRAsset
+from app.services.qr_assets import asset_id_for
+from app.services.qr_batch import QRBatchRunner
+from app.utils.qr_generator import emergency_url_for
+
+
+def _asset_count() -> int:
+    with engine.connect() as conn:
+        return len(conn.scalars(select(QRAsset.id)).all())
+
+
+def _register(client) -> dict:
+    username = f"qr_{uuid.uuid4().hex[:10]}"
+    response = client.post(
+        "/api/auth/register/patient",
+        json={"username": username, "email": f"{username}@example.com", "password": "correct horse"}
+    )
+    assert response.status_code == 200, response.text
+    return {"user_id": response.json()["user_id"], "username": username}
+
+
+def test_gets_only_read_rendered_assets(client):
+    patient = _register(client)
+    count = _asset_count()
+
+    # Nothing rendered yet: GETs report that without writing anything
+    assert client.get(f"/api/qr/generate/{patient['username']}").status_code == 404
+    assert client.get(f"/api/qr/my-qr?user_id={patient['user_id']}").status_code == 404
+    assert _asset_count() == count
+
+    rendered = client.post(f"/api/qr/generate/{patient['username']}")
+    assert rendered.status_code == 200
+    assert _asset_count() == count + 2
+
+    assert client.get(f"/api/qr/generate/{patient['username']}").json() == rendered.json()
+    assert client.get(f"/api/qr/my-qr?user_id={patient['user_id']}").json() == rendered.json()
+    assert client.post("/api/qr/generate/nobody").status_code == 404
+
+
+def test_profile_creation_renders_both_formats(client, make_patient):
+    patient = make_patient()
+    links = client.get(f"/api/qr/generate/{patient['username']}").json()
+    assert links["qr_code"].endswith(".png")
+    assert links["qr_code_svg"].endswith(".svg")
+
+
+def test_asset_suffix_must_match_its_media_type(client, make_patient):
+    patient = make_patient()
+    png_id = asset_id_for(emergency_url_for(patient["username"]), "png")
+
+    response = client.get(f"/api/qr/assets/{png_id}.png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+
+    for wrong in (f"{png_id}.svg", f"{png_id}.gif", png_id):
+        assert client.get(f"/api/qr/assets/{wrong}").status_code == 404
+
+
+def test_batch_state_is_shared_with_other_workers(client, make_patient, tmp_path):
+    patient = make_patient()
+    # A runner of its own stands in for another worker process
+    runner = QRBatchRunner(workers=1, output_dir=str(tmp_path), retention_seconds=60)
+    job = runner.create_job([patient["username"], "nobody"])
+    assert client.get(f"/api/qr/batch/{job.id}").json()["status"] == "queued"
+    assert client.get(f"/api/qr/batch/{job.id}/download").status_code == 409
+
+    try:
+        runner.run(job)
+    finally:
+        runner.shutdown()
+
+    progress = client.get(f"/api/qr/batch/{job.id}").json()
+    assert (progress["status"], progress["completed"], progress["missing"]) == ("completed", 1, ["nobody"])
+    download = client.get(f"/api/qr/batch/{job.id}/download")
+    assert download.status_code == 200
+    assert download.headers["content-type"] == "application/zip"
+    assert client.get("/api/qr/batch/unknown").status_code == 404
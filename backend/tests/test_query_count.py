@@ -0,0 +1,57 @@
+import json
+import uuid
+
+from app.database import QueryCounter, engine
+from app.services.emergency_cache import invalidate_view
+from app.services.patient_import import PatientImportRunner
+
+# Cache miss: user, profile and contacts in one joined SELECT; the access
+# log and contact alerts are written off the request path
+EMERGENCY_MISS_STATEMENTS = 1
+# Cache hit: only the profile version lookup
+EMERGENCY_HIT_STATEMENTS = 1
+
+
+def _patient_with_contacts(count: int) -> str:
+    username = f"counted_{uuid.uuid4().hex[:10]}"
+    record = {
+        "username": username,
+        "email": f"{username}@example.com",
+        "profile": {"full_name": "Counted Patient", "allergies": ["Penicillin"]},
+        "contacts": [
+            {"name": f"Contact {n}", "relation": "Friend", "phone": f"+23855501{n:02d}", "priority": n + 1}
+            for n in range(count)
+        ]
+    }
+    runner = PatientImportRunner(batch_size=10, workers=1, max_reported_errors=10, upload_dir="", retention_seconds=60)
+    assert runner.run(runner.create_job("ndjson", path="unused"), [json.dumps(record)]).imported == 1
+    return username
+
+
+def test_emergency_view_runs_a_fixed_number_of_statements(client, make_patient):
+    patient = make_patient(allergies=["Penicillin"], medications=["Insulin", "Aspirin"])
+    url = f"/api/emergency/{patient['username']}"
+    invalidate_view(patient["username"])
+
+    miss = client.get(url)
+    assert miss.status_code == 200
+    assert int(miss.headers["x-query-count"]) == EMERGENCY_MISS_STATEMENTS
+
+    hit = client.get(url)
+    assert int(hit.headers["x-query-count"]) == EMERGENCY_HIT_STATEMENTS
+
+
+def test_statement_count_does_not_grow_with_contacts(client):
+    for count in (1, 3):
+        response = client.get(f"/api/emergency/{_patient_with_contacts(count)}")
+        assert len(response.json()["emergency_contacts"]) == count
+        assert int(response.headers["x-query-count"]) == EMERGENCY_MISS_STATEMENTS
+
+
+def test_counter_counts_statements_while_active():
+    with engine.connect() as conn:
+        with QueryCounter() as counter:
+            conn.exec_driver_sql("SELECT 1")
+            conn.exec_driver_sql("SELECT 2")
+        conn.exec_driver_sql("SELECT 3")
+    assert counter.count == 2
@@ -0,0 +1,11 @@
+import pytest
+
+from app.database import engine
+from scripts.check_query_plans import HOT_PATH_QUERIES, full_scans
+
+
+@pytest.mark.parametrize("name", list(HOT_PATH_QUERIES))
+def test_hot_path_query_uses_an_index(database, name):
+    # The session fixture has migrated the test database to head
+    with engine.connect() as conn, conn.begin():
+        assert full_scans(conn, HOT_PATH_QUERIES[name]) == []
@@ -0,0 +1,124 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, update
+
+from app.database import engine
+from app.models import ReferenceData
+from app.services.reference_index import ReferenceIndex, ReferenceSearch, USAGE_STATEMENT, normalize, prefix_edit_distance
+
+VOCABULARY = [
+    (1, "Allergies", "Foods", "Peanuts", 5),
+    (2, "Allergies", "Foods", "Tree Nuts", 2),
+    (3, "Allergies", "Drugs", "Penicillin", 10),
+    (4, "Medications", "Antibiotics", "Amoxicillin", 1),
+    (5, "Conditions", "Respiratory", "Asthma", 3),
+    (6, "Allergies", "Foods", "Peanut Oil", 0),
+    (7, "Conditions", None, "Heart Failure", None),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ReferenceIndex(
+        SimpleNamespace(id=id, category=category, subcategory=subcategory, name=name, usage_count=usage)
+        for id, category, subcategory, name, usage in VOCABULARY
+    )
+
+
+def _names(results) -> list:
+    return [item["name"] for item in results]
+
+
+@pytest.mark.parametrize("query, expected", [
+    # Exact name first, then a one-typo prefix of another name
+    ("peanuts", ["Peanuts", "Peanut Oil"]),
+    # Name prefixes: more popular first
+    ("pea", ["Peanuts", "Peanut Oil"]),
+    # A later word's prefix ranks above a substring
+    ("nuts", ["Tree Nuts", "Peanuts"]),
+    ("cillin", ["Penicillin", "Amoxicillin"]),
+    # Subcategory matches
+    ("food", ["Peanuts", "Tree Nuts", "Peanut Oil"]),
+    # Accents, case and punctuation are ignored
+    ("  PÉNICILLIN!", ["Penicillin"]),
+    ("heart-fail", ["Heart Failure"]),
+    # Typos: a dropped letter, a swap, two edits in a long query
+    ("astma", ["Asthma"]),
+    ("atshma", ["Asthma"]),
+    ("penicilinn", ["Penicillin"]),
+    # Short queries only match prefixes
+    ("nu", ["Tree Nuts"]),
+    ("xyz", []),
+])
+def test_search_ranks_by_tier_then_popularity(index, query, expected):
+    assert _names(index.search(query)) == expected
+
+
+def test_exact_match_outranks_more_popular_prefixes():
+    results = ReferenceIndex([
+        SimpleNamespace(id=1, category="Allergies", subcategory=None, name="Soy", usage_count=0),
+        SimpleNamespace(id=2, category="Allergies", subcategory=None, name="Soybean Oil", usage_count=50),
+    ]).search("soy")
+    assert _names(results) == ["Soy", "Soybean Oil"]
+
+
+def test_empty_query_lists_by_popularity(index):
+    assert _names(index.search("")) == ["Penicillin", "Peanuts", "Asthma", "Tree Nuts", "Amoxicillin", "Heart Failure", "Peanut Oil"]
+    assert _names(index.search("", category="Conditions")) == ["Asthma", "Heart Failure"]
+
+
+def test_category_filter_and_limit(index):
+    assert _names(index.search("pe", category="Conditions")) == []
+    assert _names(index.search("pe", category="Allergies", limit=2)) == ["Penicillin", "Peanuts"]
+    assert index.search("cillin", category="Medications") == [
+        {"id": 4, "category": "Medications", "subcategory": "Antibiotics", "name": "Amoxicillin"}
+    ]
+
+
+@pytest.mark.parametrize("query, target, limit, expected", [
+    ("abc", "abcdef", 1, 0),
+    ("abd", "abcdef", 1, 1),
+    ("abxc", "abcdef", 1, 1),
+    ("acb", "abcdef", 1, 1),
+    ("penicilin", "penicillin", 2, 1),
+    ("pencilin", "penicillin", 2, 2),
+    ("xyz", "abcdef", 1, 2),
+    ("abc", "", 1, 2),
+    ("", "abc", 1, 0),
+])
+def test_prefix_edit_distance(query, target, limit, expected):
+    assert prefix_edit_distance(query, target, limit) == expected
+
+
+def test_normalize():
+    assert normalize(" Crème  Brûlée/ALLERGY ") == "creme brulee allergy"
+    assert normalize(None) == ""
+
+
+def test_reload_follows_edits_and_usage(database):
+    name = f"Testium {uuid.uuid4().hex[:6]}"
+    with engine.begin() as conn:
+        reference_id = conn.execute(insert(ReferenceData).values(category="Medications", name=name)).inserted_primary_key[0]
+
+    search = ReferenceSearch(refresh_seconds=0)
+    assert search.search("testium") is None
+    assert search.reload()
+    assert name in _names(search.search(name))
+    assert not search.reload()
+
+    # Renames change the stamp
+    renamed = f"Renamium {uuid.uuid4().hex[:6]}"
+    with engine.begin() as conn:
+        conn.execute(update(ReferenceData).where(ReferenceData.id == reference_id).values(name=renamed))
+    assert search.reload()
+    assert _names(search.search(renamed)) == [renamed]
+
+    # Popularity changes rebuild the ranking without touching the edit marker
+    version = search.index.version
+    with engine.begin() as conn:
+        conn.execute(USAGE_STATEMENT, {"term": renamed, "delta": 3})
+    assert search.reload()
+    assert search.index.version[2] == version[2]
+    assert search.index.version[3] == version[3] + 3
@@ -0,0 +1,114 @@
+import asyncio
+import sqlite3
+import time
+
+from app.config import settings
+from app.database import ReplicaRouter
+
+
+PRIMARY_PATH = settings.DATABASE_URL.removeprefix("sqlite:///")
+
+
+def _replicate(path) -> None:
+    """Copy the primary database file to path: a replica fully caught up"""
+    with sqlite3.connect(PRIMARY_PATH) as primary, sqlite3.connect(path) as replica:
+        primary.backup(replica)
+
+
+def _router(*paths, max_lag_seconds=0.5, check_interval_seconds=60) -> ReplicaRouter:
+    return ReplicaRouter(
+        urls=[f"sqlite:///{path}" for path in paths],
+        max_lag_seconds=max_lag_seconds,
+        check_interval_seconds=check_interval_seconds
+    )
+
+
+def test_lagging_replica_leaves_rotation_and_reads_fall_back_to_primary(database, tmp_path):
+    replica_path = tmp_path / "replica.db"
+
+    async def scenario():
+        router = _router(replica_path)
+        replica = router.replicas[0]
+        try:
+            # Nothing replicated yet: not trusted
+            _replicate(replica_path)
+            await router.check()
+            assert not replica.in_rotation
+            assert replica.last_error == "no heartbeat replicated yet"
+            assert router.pick() is None
+
+            # Caught up with the latest heartbeat
+            _replicate(replica_path)
+            await router.check()
+            assert replica.in_rotation
+            assert replica.lag_seconds <= router.max_lag_seconds
+            assert router.pick() is replica
+
+            # Replication stops while the primary keeps beating
+            await asyncio.sleep(router.max_lag_seconds + 0.1)
+            await router.check()
+            assert not replica.in_rotation
+            assert replica.lag_seconds > router.max_lag_seconds
+            primary_reads = router.primary_reads
+            assert router.pick() is None
+            assert router.primary_reads == primary_reads + 1
+        finally:
+            await router.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_replica_stays_out_of_rotation(database, tmp_path):
+    async def scenario():
+        router = _router(tmp_path / "missing" / "replica.db", tmp_path / "healthy.db")
+        missing, healthy = router.replicas
+        try:
+            await router.check()
+            _replicate(tmp_path / "healthy.db")
+            await router.check()
+
+            assert not missing.in_rotation
+            assert missing.last_error
+            assert healthy.in_rotation
+            assert {router.pick() for _ in range(4)} == {healthy}
+            assert router.stats()["replicas"]["replica_2"]["reads"] == 4
+        finally:
+            await router.stop()
+
+    asyncio.run(scenario())
+
+
+def test_round_robin_over_replicas_in_rotation():
+    router = _router("a.db", "b.db")
+    for replica in router.replicas:
+        replica.in_rotation = True
+
+    picks = [router.pick() for _ in range(4)]
+    assert picks == router.replicas * 2
+    asyncio.run(router.stop())
+
+
+def test_written_keys_are_pinned_to_primary_until_replicas_catch_up():
+    router = _router("a.db", max_lag_seconds=0.05, check_interval_seconds=0.05)
+    replica = router.replicas[0]
+    replica.in_rotation = True
+
+    router.mark_written("user-1", "alice")
+    assert router.pick(["alice"]) is None
+    assert router.pick([None, "user-1"]) is None
+    assert router.pinned_reads == 2
+    assert router.pick(["bob"]) is replica
+
+    # Longer than any replica in rotation can trail the primary
+    time.sleep(0.15)
+    assert router.pick(["alice"]) is replica
+    asyncio.run(router.stop())
+
+
+def test_without_replicas_everything_reads_the_primary():
+    router = _router()
+    router.mark_written("alice")
+
+    assert router.pick(["alice"]) is None
+    assert router.pinned_reads == 0
+    assert router.stats()["replicas"] == {}
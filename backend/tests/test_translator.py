@@ -0,0 +1,28 @@
+import asyncio
+import uuid
+
+from sqlalchemy import insert, select
+
+from app.database import engine
+from app.models import ReferenceData, TranslationMemory
+from app.services import translator
+
+
+def test_only_reference_vocabulary_is_persisted(monkeypatch):
+    term = f"Vocabularium {uuid.uuid4().hex[:6]}"
+    instructions = f"Keep away from cats {uuid.uuid4().hex[:6]}"
+    with engine.begin() as conn:
+        conn.execute(insert(ReferenceData).values(category="Allergies", name=term))
+
+    async def fake_translate(text, target_language):
+        return f"{text} [{target_language}]"
+
+    monkeypatch.setattr(translator, "_translate_one", fake_translate)
+    translations, complete = asyncio.run(translator.translate_batch_checked([term, instructions], "de"))
+
+    assert translations == [f"{term} [de]", f"{instructions} [de]"]
+    assert complete
+    with engine.connect() as conn:
+        stored = conn.scalars(select(TranslationMemory.source_text).where(TranslationMemory.target_language == "de")).all()
+    assert term in stored
+    assert instructions not in stored
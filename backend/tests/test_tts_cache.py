@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from app.services import tts_cache
+from app.services.http_clients import http_clients
+from app.services.tts_cache import AudioCache, tts_audio_cache
+
+AUDIO = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def tts_server():
+    """Stand-in TTS API; returns the requests it received"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=AUDIO, headers={"Content-Type": "audio/mpeg"})
+
+    http_clients.set_client("tts", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    yield requests
+    http_clients.set_client("tts", None)
+
+
+def test_audio_is_synthesized_once_per_profile_version(client, make_patient, tts_server):
+    patient = make_patient(allergies=["Latex"])
+    url = f"/api/emergency/{patient['username']}/voice/audio"
+    before = client.get("/metrics").json()["tts_cache"]
+
+    first = client.get(url)
+    second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content == AUDIO
+    assert len(tts_server) == 1
+    assert b"Latex" in tts_server[0].content
+
+    after = client.get("/metrics").json()["tts_cache"]
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+    # Another language is another recording
+    client.get(url, params={"language": "pt"})
+    assert len(tts_server) == 2
+
+
+def test_audio_supports_range_requests(client, make_patient, tts_server):
+    patient = make_patient()
+    response = client.get(f"/api/emergency/{patient['username']}/voice/audio", headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(AUDIO)}"
+    assert response.content == AUDIO[100:200]
+
+
+def test_concurrent_misses_share_one_synthesis(tmp_path, monkeypatch):
+    calls = []
+
+    async def slow_tts(text, language):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return AUDIO
+
+    monkeypatch.setattr(tts_cache, "text_to_speech", slow_tts)
+    cache = AudioCache(str(tmp_path), max_bytes=10 * len(AUDIO))
+
+    async def scenario():
+        first = [asyncio.create_task(cache.get_or_synthesize("v1", "en", "text")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # Arrives while the others are still waiting on the lock
+        late = asyncio.create_task(cache.get_or_synthesize("v1", "en", "text"))
+        return await asyncio.gather(*first, late)
+
+    paths = asyncio.run(scenario())
+    assert len(set(paths)) == 1
+    assert calls == ["text"]
+    assert (cache.misses, cache.hits) == (1, 3)
+    assert cache.stats()["synthesizing"] == 0
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=2 * len(AUDIO))
+    for age, key in enumerate(["a", "b"], 1):
+        os.utime(cache.put(key, AUDIO), (1000 * age, 1000 * age))
+    cache.get("a")  # a was written first but used last
+    cache.put("c", AUDIO)
+
+    assert cache.get("a") and cache.get("c")
+    assert cache.get("b") is None
@@ -0,0 +1,46 @@
+import json
+
+
+def _all_pages(client, limit):
+    users, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/auth/users", params=params).json()
+        users.extend(body["users"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return users
+
+
+def test_pages_and_stream_list_every_user_once_in_id_order(client, make_patient):
+    for _ in range(3):
+        make_patient()
+
+    paged = _all_pages(client, limit=2)
+    ids = [user["user_id"] for user in paged]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+    streamed = client.get("/api/auth/users", params={"format": "ndjson"})
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["user_id"] for line in streamed.text.splitlines()] == ids
+
+
+def test_stream_resumes_from_a_page_cursor(client, make_patient):
+    for _ in range(3):
+        make_patient()
+
+    first = client.get("/api/auth/users", params={"limit": 2}).json()
+    rest = client.get("/api/auth/users", params={"format": "ndjson", "cursor": first["next_cursor"]})
+    rest_ids = [json.loads(line)["user_id"] for line in rest.text.splitlines()]
+
+    assert rest_ids and all(user_id > first["users"][-1]["user_id"] for user_id in rest_ids)
+    assert len(first["users"]) + len(rest_ids) == len(_all_pages(client, limit=500))
+
+
+def test_limit_is_clamped(client, make_patient):
+    make_patient()
+    body = client.get("/api/auth/users", params={"limit": 0}).json()
+    assert len(body["users"]) == 1
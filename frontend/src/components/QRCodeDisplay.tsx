@@ -16,6 +16,7 @@ export default function QRCodeDisplay({ username }: QRCodeDisplayProps) {
     try {
       const token = localStorage.getItem('token')
       const response = await fetch(`http://localhost:8000/api/qr/generate/${username}`, {
+        method: 'POST',
         headers: token ? { 'Authorization': `Bearer ${token}` } : {}
       })
       